@@ -87,6 +87,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': 20,  # Worker processes write job state concurrently
+        },
     }
 }
 
@@ -120,6 +123,29 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Largest frame range returned by one /api/videos/<pk>/tracks/ request
+TRACKS_API_MAX_FRAMES = 1500
+
+# Video processing job queue (run workers with `python manage.py run_video_workers`)
+VIDEO_WORKER_COUNT = int(os.environ.get('VIDEO_WORKER_COUNT', 1))
+VIDEO_WORKER_POLL_SECONDS = 2
+VIDEO_JOB_MAX_ATTEMPTS = 3
+VIDEO_JOB_RETRY_BACKOFF_SECONDS = 30
+VIDEO_JOB_RETRY_BACKOFF_MAX_SECONDS = 1800
+VIDEO_JOB_HEARTBEAT_SECONDS = 30
+VIDEO_JOB_STALE_SECONDS = 300  # A running job without a heartbeat for this long is requeued
+# Raw model outputs keyed by video content, model and resolution; reprocessing skips cached frames (None disables)
+DETECTION_CACHE_DIR = os.path.join(MEDIA_ROOT, 'cache', 'detections')
+# 'adaptive' runs the player model on keyframes only and propagates boxes in between (compare with
+# `python manage.py compare_detection_schedules` first)
+VIDEO_DETECTION_SCHEDULE = os.environ.get('VIDEO_DETECTION_SCHEDULE', 'every_frame')
+# 'incremental' carries the pitch homography over by the estimated camera motion while the camera is
+# nearly static instead of solving it from the keypoints of every frame
+VIDEO_HOMOGRAPHY_MODE = os.environ.get('VIDEO_HOMOGRAPHY_MODE', 'full')
+# 'adaptive' runs keypoint detection on every few frames only and propagates the keypoints by the
+# camera motion in between
+VIDEO_KEYPOINT_SCHEDULE = os.environ.get('VIDEO_KEYPOINT_SCHEDULE', 'every_frame')
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 # OR you can use File Email Backend to save emails to files
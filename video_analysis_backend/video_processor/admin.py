@@ -1,6 +1,8 @@
 from django.contrib import admin
-from .models import ContactSubmission, Video, EventFrame
+from .models import ContactSubmission, Video, EventFrame, ProcessingJob, TeamKitProfile
 # Register your models here.
 admin.site.register(ContactSubmission)
 admin.site.register(Video)
 admin.site.register(EventFrame)
+admin.site.register(ProcessingJob)
+admin.site.register(TeamKitProfile)
@@ -0,0 +1,123 @@
+# video_analysis_backend/video_processor/dedupe.py
+import hashlib
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import transaction
+from .models import Video, EventFrame, VIDEO_OUTPUT_CHOICES
+
+# Bump when a pipeline change makes the artifacts of earlier runs stale, so uploads stop reusing them
+PIPELINE_VERSION = '1'
+
+ALL_OUTPUTS = [kind for kind, _ in VIDEO_OUTPUT_CHOICES]
+
+class ContentHashUploadHandler(FileUploadHandler):
+    """
+    Hash uploaded files while they stream to disk.
+
+    Installed in front of Django's upload handlers, it passes every chunk on unchanged and
+    records the SHA-256 of each file field in ``hashes``.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.hashes = {}
+        self._digest = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._digest.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.hashes[self.field_name] = self._digest.hexdigest()
+        return None  # The following handler builds the uploaded file
+
+def hash_uploaded_file(uploaded_file):
+    """SHA-256 of an uploaded file, for uploads that did not pass the hashing handler."""
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+def _pending_outputs(video):
+    """Outputs requested from the latest processing job of an in-flight video."""
+    job = video.jobs.filter(job_type='process').order_by('-created_at').first()
+    return (job.options.get('outputs') if job else None) or ALL_OUTPUTS
+
+def find_reusable_video(content_hash, outputs):
+    """
+    Find an original video with the same content whose results cover the requested outputs.
+
+    Completed videos are preferred; otherwise a pending or processing one is returned, so the
+    upload can attach to its job. Must run inside a transaction: the candidate rows stay locked
+    until it commits, so the worker of an in-flight video cannot complete it unnoticed.
+
+    Args:
+        content_hash: SHA-256 of the uploaded file
+        outputs: Requested output kinds
+
+    Returns:
+        Video or None: The video to reuse
+    """
+    candidates = Video.objects.select_for_update().filter(
+        content_hash=content_hash, pipeline_version=PIPELINE_VERSION, source_video__isnull=True
+    )
+    for video in candidates.filter(status='completed').order_by('-uploaded_at'):
+        if set(outputs) <= set(video.produced_outputs):
+            return video
+    in_flight = candidates.filter(status__in=['pending', 'processing']).first()
+    if in_flight is not None and set(outputs) <= set(_pending_outputs(in_flight)):
+        return in_flight
+    return None
+
+def copy_artifacts(video, source):
+    """Point a video at the artifacts and event frames of a completed source video, mark it completed and save it."""
+    video.output_video.name = source.output_video.name
+    video.summary_json.name = source.summary_json.name
+    video.object_tracks_json.name = source.object_tracks_json.name
+    video.keypoint_tracks_json.name = source.keypoint_tracks_json.name
+    video.track_store = source.track_store
+    video.produced_outputs = list(source.produced_outputs)
+    video.status = 'completed'
+    video.save()
+    video.event_frames.all().delete()
+    EventFrame.objects.bulk_create([
+        EventFrame(video=video, frame_image=frame.frame_image.name, frame_number=frame.frame_number)
+        for frame in source.event_frames.all()
+    ])
+
+def link_duplicate(video, source):
+    """
+    Make a video a duplicate of an original with the same content.
+
+    A completed source lends its artifacts right away; an in-flight one hands them over when
+    its job completes (see link_pending_duplicates).
+    """
+    video.source_video = source
+    if source.status == 'completed':
+        copy_artifacts(video, source)
+        return
+    video.status = source.status
+    video.save()
+    # The source may have finished after it was read, before its worker could see this duplicate
+    source.refresh_from_db()
+    if source.status == 'completed':
+        copy_artifacts(video, source)
+    elif source.status != video.status:
+        video.status = source.status
+        video.save(update_fields=['status'])
+
+def link_pending_duplicates(video):
+    """
+    Complete the duplicates that attached to a video while it was processing.
+
+    Takes the row lock of find_reusable_video, so a concurrent upload has either committed its
+    duplicate by the time they are read, or reads the video as completed.
+    """
+    with transaction.atomic():
+        Video.objects.select_for_update().filter(pk=video.pk).first()
+        for duplicate in video.duplicates.filter(status__in=['pending', 'processing']):
+            copy_artifacts(duplicate, video)
@@ -0,0 +1,217 @@
+# video_analysis_backend/video_processor/jobs.py
+import os
+import time
+import socket
+import logging
+import threading
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import ProcessingJob, Video
+
+logger = logging.getLogger(__name__)
+
+def _setting(name, default):
+    """Read a job queue setting, falling back to its default."""
+    return getattr(settings, name, default)
+
+def _handlers():
+    """Job type -> callable(video, **options). Imported lazily so the web process never loads the pipeline."""
+    from .processing import process_video, render_video
+    return {
+        'process': process_video,
+        'render': render_video,
+    }
+
+def enqueue_job(video, job_type='process', options=None, delay_seconds=0):
+    """
+    Persist a job for a video so that a worker process picks it up.
+
+    Args:
+        video: Video instance the job operates on
+        job_type: Key of the handler to run
+        options: Keyword arguments passed to the handler
+        delay_seconds: Earliest start, relative to now
+
+    Returns:
+        ProcessingJob: The queued job
+    """
+    return ProcessingJob.objects.create(
+        video=video,
+        job_type=job_type,
+        options=options or {},
+        max_attempts=_setting('VIDEO_JOB_MAX_ATTEMPTS', 3),
+        available_at=timezone.now() + timedelta(seconds=delay_seconds)
+    )
+
+def claim_next_job(worker_id):
+    """
+    Atomically claim the oldest runnable job.
+
+    The claim is a conditional UPDATE on the queued status, so when several workers race
+    for the same row exactly one of them updates it.
+
+    Returns:
+        ProcessingJob or None: The claimed job, or None when the queue is empty
+    """
+    now = timezone.now()
+    candidates = ProcessingJob.objects.filter(
+        status='queued', available_at__lte=now
+    ).order_by('available_at', 'created_at').values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        claimed = ProcessingJob.objects.filter(pk=pk, status='queued').update(
+            status='running',
+            worker_id=worker_id,
+            heartbeat_at=now,
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+            return ProcessingJob.objects.select_related('video').get(pk=pk)
+    return None
+
+def _retry_delay(attempts):
+    """Exponential backoff: base, 2 x base, 4 x base, ... capped."""
+    base = _setting('VIDEO_JOB_RETRY_BACKOFF_SECONDS', 30)
+    return min(base * (2 ** max(0, attempts - 1)), _setting('VIDEO_JOB_RETRY_BACKOFF_MAX_SECONDS', 1800))
+
+def _video_and_attached(video_id):
+    """A video and the in-flight duplicate uploads waiting for its processing job."""
+    return Video.objects.filter(
+        Q(pk=video_id) | Q(source_video_id=video_id, status__in=['pending', 'processing'])
+    )
+
+def fail_job(job, error):
+    """
+    Record a failed attempt and either requeue the job with backoff or mark it failed.
+
+    Args:
+        job: The running job
+        error: Error message or traceback of the attempt
+    """
+    job.refresh_from_db()
+    job.last_error = error
+    job.worker_id = ''
+    # Only processing jobs own the video status; a failed re-render leaves the analysis intact
+    owns_video_status = job.job_type == 'process'
+    if job.attempts < job.max_attempts:
+        delay = _retry_delay(job.attempts)
+        job.status = 'queued'
+        job.available_at = timezone.now() + timedelta(seconds=delay)
+        if owns_video_status:
+            _video_and_attached(job.video_id).update(status='pending')
+        logger.warning(f"Job {job.id} attempt {job.attempts}/{job.max_attempts} failed, retrying in {delay}s")
+    else:
+        job.status = 'failed'
+        if owns_video_status:
+            _video_and_attached(job.video_id).update(status='failed')
+        logger.error(f"Job {job.id} failed after {job.attempts} attempts")
+    job.save()
+
+def complete_job(job):
+    """Mark a job as completed."""
+    ProcessingJob.objects.filter(pk=job.pk).update(status='completed', worker_id='', last_error='')
+
+def recover_orphaned_jobs(stale_after_seconds=None):
+    """
+    Requeue work that was lost when a worker or the server died.
+
+    Running jobs whose heartbeat is older than ``stale_after_seconds`` count as a failed
+    attempt. Videos left in 'pending' or 'processing' without any open job (for instance
+    uploads from before the queue existed) get a new job.
+
+    Returns:
+        int: Number of jobs requeued or created
+    """
+    stale_after_seconds = stale_after_seconds or _setting('VIDEO_JOB_STALE_SECONDS', 300)
+    cutoff = timezone.now() - timedelta(seconds=stale_after_seconds)
+    recovered = 0
+    stale_jobs = ProcessingJob.objects.filter(status='running').filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True)
+    )
+    for job in stale_jobs:
+        logger.warning(f"Recovering job {job.id} orphaned by worker '{job.worker_id}'")
+        fail_job(job, f"Worker '{job.worker_id}' stopped sending heartbeats")
+        recovered += 1
+
+    open_statuses = ['queued', 'running']
+    # Duplicate uploads have no job of their own; they wait for their source video
+    orphaned_videos = Video.objects.filter(
+        status__in=['pending', 'processing'], source_video__isnull=True
+    ).exclude(jobs__status__in=open_statuses)
+    for video in orphaned_videos:
+        logger.warning(f"Requeueing video {video.id} left in '{video.status}' without a job")
+        video.status = 'pending'
+        video.save(update_fields=['status'])
+        enqueue_job(video)
+        recovered += 1
+    return recovered
+
+class _Heartbeat(threading.Thread):
+    """Keeps a running job's heartbeat fresh while the handler blocks the worker."""
+
+    def __init__(self, job_id, interval):
+        super().__init__(daemon=True)
+        self.job_id = job_id
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stop_event.wait(self.interval):
+                ProcessingJob.objects.filter(pk=self.job_id, status='running').update(heartbeat_at=timezone.now())
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def run_job(job):
+    """Run a claimed job's handler and record the outcome."""
+    handler = _handlers().get(job.job_type)
+    if handler is None:
+        job.attempts = job.max_attempts
+        job.save(update_fields=['attempts'])
+        fail_job(job, f"Unknown job type '{job.job_type}'")
+        return
+
+    heartbeat = _Heartbeat(job.id, _setting('VIDEO_JOB_HEARTBEAT_SECONDS', 30))
+    heartbeat.start()
+    started = time.monotonic()
+    try:
+        handler(job.video, **job.options)
+    except Exception as e:
+        logger.exception(f"Job {job.id} raised: {e}")
+        fail_job(job, traceback.format_exc())
+    else:
+        complete_job(job)
+        logger.info(f"Job {job.id} completed in {time.monotonic() - started:.1f}s")
+    finally:
+        heartbeat.stop()
+
+def run_worker(worker_index=0, poll_interval=None, stop_event=None):
+    """
+    Worker loop: claim and run jobs until ``stop_event`` is set.
+
+    The worker is a long-lived process, so models loaded by the pipeline stay cached
+    between jobs.
+    """
+    poll_interval = poll_interval or _setting('VIDEO_WORKER_POLL_SECONDS', 2)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{worker_index}"
+    logger.info(f"Worker {worker_id} started")
+    while stop_event is None or not stop_event.is_set():
+        close_old_connections()
+        try:
+            job = claim_next_job(worker_id)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} could not claim a job: {e}")
+            job = None
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        logger.info(f"Worker {worker_id} claimed job {job.id} ({job.job_type}) for video {job.video_id}")
+        run_job(job)
+    logger.info(f"Worker {worker_id} stopped")
@@ -0,0 +1,67 @@
+import time
+import cv2
+import torch
+from django.core.management.base import BaseCommand, CommandError
+from video_processor.scripts.model_registry import model_registry
+from video_processor.scripts.keypoints_detection import KeypointsTracker
+from video_processor.scripts.tracking_detection import detect_players_and_ball_batch
+
+class Command(BaseCommand):
+    help = 'Measure player and keypoint model throughput (frames/sec) against inference batch size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('video', help='Path to a sample video')
+        parser.add_argument('--player-model', default='models/od.pt')
+        parser.add_argument('--keypoints-model', default='models/kd.pt')
+        parser.add_argument('--batch-sizes', default='1,2,4,8,16', help='Comma-separated batch sizes')
+        parser.add_argument('--frames', type=int, default=128, help='Number of frames decoded and benchmarked')
+        parser.add_argument('--precision', default='fp32', choices=['fp32', 'fp16'])
+
+    def handle(self, *args, **options):
+        target_resolution = (1920, 1280)
+        player_detection_resolution = (1280, 736)
+        keypoint_detection_resolution = (1280, 1280)
+        batch_sizes = [int(b) for b in options['batch_sizes'].split(',') if b.strip()]
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+        # Decode once up front so only inference is measured
+        cap = cv2.VideoCapture(options['video'])
+        player_inputs, keypoint_inputs = [], []
+        while len(player_inputs) < options['frames']:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame = cv2.resize(frame, target_resolution, interpolation=cv2.INTER_AREA)
+            player_inputs.append(cv2.resize(frame, player_detection_resolution, interpolation=cv2.INTER_AREA))
+            keypoint_inputs.append(cv2.resize(frame, keypoint_detection_resolution, interpolation=cv2.INTER_AREA))
+        cap.release()
+        if not player_inputs:
+            raise CommandError(f"Could not read frames from {options['video']}")
+
+        player_model = model_registry.acquire(options['player_model'], device, options['precision'],
+                                              warmup_imgsz=player_detection_resolution)
+        keypoints_model = model_registry.acquire(options['keypoints_model'], device, options['precision'],
+                                                 warmup_imgsz=keypoint_detection_resolution)
+        kp_tracker = KeypointsTracker(model=keypoints_model, conf=0.3, kp_conf=0.7)
+
+        num_frames = len(player_inputs)
+        self.stdout.write(f"{num_frames} frames on {device} ({options['precision']})")
+        self.stdout.write(f"{'batch':>6} {'player fps':>11} {'keypoint fps':>13} {'combined fps':>13}")
+        for batch_size in batch_sizes:
+            started = time.perf_counter()
+            for i in range(0, num_frames, batch_size):
+                detect_players_and_ball_batch(player_inputs[i:i + batch_size], player_model, 0.4, 0)
+            player_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for i in range(0, num_frames, batch_size):
+                kp_tracker.detect_batch(keypoint_inputs[i:i + batch_size])
+            keypoint_seconds = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{batch_size:>6} {num_frames / player_seconds:>11.2f} {num_frames / keypoint_seconds:>13.2f} "
+                f"{num_frames / (player_seconds + keypoint_seconds):>13.2f}"
+            )
+
+        model_registry.release(options['player_model'], device, options['precision'])
+        model_registry.release(options['keypoints_model'], device, options['precision'])
@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+import time
+from django.core.management.base import BaseCommand, CommandError
+from video_processor.scripts.main import main_processing
+from video_processor.scripts.analysis import compare_summaries
+
+class Command(BaseCommand):
+    help = ('Process a video with player detection on every frame and on adaptive keyframes, '
+            'and report the speedup and how far the match metrics moved')
+
+    def add_arguments(self, parser):
+        parser.add_argument('video', help='Path to a sample video')
+        parser.add_argument('--player-model', default='models/od.pt')
+        parser.add_argument('--keypoints-model', default='models/kd.pt')
+        parser.add_argument('--field-image', default='media/input_videos/field_2d_v2.png')
+        parser.add_argument('--max-stride', type=int, default=3, help='Largest number of frames between keyframes')
+        parser.add_argument('--motion-threshold', type=float, default=8.0,
+                            help='Per-frame motion in pixels that forces a keyframe')
+        parser.add_argument('--min-iou', type=float, default=0.6,
+                            help='Keyframe IoU with the propagated boxes below which keyframes become more frequent')
+        parser.add_argument('--tolerance', type=float, default=0.05,
+                            help='Largest accepted deviation of any metric from the every-frame run')
+
+    def run(self, options, work_dir, schedule):
+        run_dir = os.path.join(work_dir, schedule)
+        summary_path = os.path.join(run_dir, 'match_summary.json')
+        run_stats = {}
+        started = time.perf_counter()
+        main_processing(
+            input_video_path=options['video'],
+            output_dir=run_dir,
+            output_video_path=os.path.join(run_dir, 'annotated.mp4'),
+            summary_json_path=summary_path,
+            object_tracks_path=os.path.join(run_dir, 'tracks', 'object_tracks.json'),
+            keypoint_tracks_path=os.path.join(run_dir, 'tracks', 'keypoint_tracks.json'),
+            team_samples_dir=os.path.join(run_dir, 'team_samples'),
+            field_image_path=options['field_image'],
+            player_model_path=options['player_model'],
+            keypoints_model_path=options['keypoints_model'],
+            outputs=('summary',),
+            detection_schedule=schedule,
+            detection_max_stride=options['max_stride'],
+            detection_motion_threshold=options['motion_threshold'],
+            detection_min_iou=options['min_iou'],
+            run_stats=run_stats
+        )
+        seconds = time.perf_counter() - started
+        with open(summary_path) as f:
+            return json.load(f), run_stats, seconds
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['video']):
+            raise CommandError(f"Video not found: {options['video']}")
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            reference, reference_stats, reference_seconds = self.run(options, work_dir, 'every_frame')
+            candidate, candidate_stats, candidate_seconds = self.run(options, work_dir, 'adaptive')
+
+        frames = reference_stats['pipeline']['infer']['items']
+        schedule = candidate_stats['detection_schedule']
+        reference_infer = reference_stats['pipeline']['infer']['busy_seconds']
+        candidate_infer = candidate_stats['pipeline']['infer']['busy_seconds']
+        self.stdout.write(f"{frames} frames, player model on {schedule['keyframes']} keyframes "
+                          f"({schedule['keyframes'] / max(frames, 1):.0%}), final stride {schedule['stride']}, "
+                          f"mean keyframe IoU {schedule['keyframe_iou']}")
+        self.stdout.write(f"{'':<14} {'every frame':>12} {'adaptive':>10} {'speedup':>8}")
+        self.stdout.write(f"{'infer stage s':<14} {reference_infer:>12.2f} {candidate_infer:>10.2f} "
+                          f"{reference_infer / max(candidate_infer, 1e-9):>7.2f}x")
+        self.stdout.write(f"{'total s':<14} {reference_seconds:>12.2f} {candidate_seconds:>10.2f} "
+                          f"{reference_seconds / max(candidate_seconds, 1e-9):>7.2f}x")
+
+        comparison = compare_summaries(reference, candidate)
+        self.stdout.write(f"\n{'metric':<22} {'every frame':>12} {'adaptive':>10} {'deviation':>10}")
+        exceeded = []
+        for name, values in comparison.items():
+            marker = ''
+            if values['deviation'] > options['tolerance']:
+                exceeded.append(name)
+                marker = '  <- above tolerance'
+            self.stdout.write(f"{name:<22} {values['reference']:>12} {values['candidate']:>10} {values['deviation']:>10.2%}{marker}")
+        if exceeded:
+            raise CommandError(f"{len(exceeded)} metrics deviate more than {options['tolerance']:.0%}: {', '.join(exceeded)}")
+        self.stdout.write(self.style.SUCCESS(f"All metrics within {options['tolerance']:.0%} of detection on every frame"))
@@ -0,0 +1,84 @@
+import time
+import signal
+import logging
+import multiprocessing
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+def _worker_process(worker_index, poll_interval, stop_event):
+    """Entry point of a worker process; sets up Django before touching any model."""
+    import django
+    django.setup()
+    from video_processor.jobs import run_worker
+    # Ctrl+C reaches the whole process group; let the supervisor decide when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_worker(worker_index=worker_index, poll_interval=poll_interval, stop_event=stop_event)
+
+class Command(BaseCommand):
+    help = 'Run a pool of video processing worker processes that consume the job queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'VIDEO_WORKER_COUNT', 1),
+                            help='Number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=getattr(settings, 'VIDEO_WORKER_POLL_SECONDS', 2),
+                            help='Seconds between queue polls when idle')
+
+    def handle(self, *args, **options):
+        from video_processor.jobs import recover_orphaned_jobs
+
+        num_workers = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+        recovery_interval = getattr(settings, 'VIDEO_JOB_STALE_SECONDS', 300) / 2
+
+        recovered = recover_orphaned_jobs()
+        self.stdout.write(f"Recovered {recovered} orphaned jobs")
+
+        # Children get their own database connections
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        stop_event = context.Event()
+        workers = {}
+
+        def start_worker(index):
+            process = context.Process(target=_worker_process, args=(index, poll_interval, stop_event),
+                                      name=f'video-worker-{index}')
+            process.start()
+            workers[index] = process
+            self.stdout.write(f"Started worker {index} (pid {process.pid})")
+
+        def request_stop(signum, frame):
+            if stop_event.is_set():
+                self.stdout.write("Terminating workers")
+                for process in workers.values():
+                    process.terminate()
+            else:
+                self.stdout.write("Stopping after the current jobs finish (signal again to terminate)")
+                stop_event.set()
+
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+
+        for index in range(num_workers):
+            start_worker(index)
+
+        last_recovery = time.monotonic()
+        while not stop_event.is_set():
+            time.sleep(1)
+            for index, process in list(workers.items()):
+                if not process.is_alive() and not stop_event.is_set():
+                    logger.warning(f"Worker {index} exited with code {process.exitcode}, restarting")
+                    start_worker(index)
+            if time.monotonic() - last_recovery > recovery_interval:
+                try:
+                    recover_orphaned_jobs()
+                except Exception as e:
+                    logger.error(f"Job recovery failed: {e}")
+                connections.close_all()
+                last_recovery = time.monotonic()
+
+        for process in workers.values():
+            process.join()
+        self.stdout.write("All workers stopped")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_processor', '0005_contactsubmission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='track_store',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
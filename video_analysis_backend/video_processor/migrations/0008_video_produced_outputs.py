@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:45
+
+from django.db import migrations, models
+
+
+def mark_completed_videos(apps, schema_editor):
+    # Runs before this field existed always produced every artifact
+    Video = apps.get_model('video_processor', 'Video')
+    Video.objects.filter(status='completed').update(produced_outputs=['summary', 'tracks', 'video'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_processor', '0007_processingjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='produced_outputs',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(mark_completed_videos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_processor', '0009_processingjob_render'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamKitProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('team_a', models.CharField(max_length=100)),
+                ('team_b', models.CharField(blank=True, max_length=100)),
+                ('profile', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('source_video', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='kit_profiles', to='video_processor.video')),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+    ]
@@ -2,6 +2,9 @@
 from django.db import models
 from django.utils import timezone
 
+# Artifacts a processing run can produce
+VIDEO_OUTPUT_CHOICES = [('summary', 'Match summary'), ('tracks', 'Track files'), ('video', 'Annotated video')]
+
 class Video(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     video_file = models.FileField(upload_to='input_videos/')
@@ -9,6 +12,12 @@ class Video(models.Model):
     summary_json = models.FileField(upload_to='output/', null=True, blank=True)
     object_tracks_json = models.FileField(upload_to='output/tracks/', null=True, blank=True)
     keypoint_tracks_json = models.FileField(upload_to='output/tracks/', null=True, blank=True)
+    track_store = models.CharField(max_length=255, blank=True)  # Columnar track store directory, relative to MEDIA_ROOT
+    produced_outputs = models.JSONField(default=list, blank=True)  # Output kinds produced by the last processing run
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # SHA-256 of the uploaded file
+    pipeline_version = models.CharField(max_length=20, blank=True)  # Set on uploads that later uploads may reuse
+    # Original upload of the same content whose artifacts this video links to
+    source_video = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates')
     status = models.CharField(
         max_length=20, 
         choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')],
@@ -18,6 +27,61 @@ class Video(models.Model):
     def __str__(self):
         return f"{self.uploaded_at}"
 
+    class Meta:
+        constraints = [
+            # At most one in-flight original per content, so concurrent duplicate uploads share its job
+            models.UniqueConstraint(
+                fields=['content_hash', 'pipeline_version'],
+                condition=models.Q(status__in=['pending', 'processing'], source_video__isnull=True) & ~models.Q(pipeline_version=''),
+                name='unique_in_flight_content'
+            )
+        ]
+
+class ProcessingJob(models.Model):
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='jobs')
+    job_type = models.CharField(
+        max_length=20,
+        choices=[('process', 'Process'), ('render', 'Render')],
+        default='process'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')],
+        default='queued',
+        db_index=True
+    )
+    options = models.JSONField(default=dict, blank=True)  # Extra keyword arguments for the job handler
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    available_at = models.DateTimeField(default=timezone.now)  # Not claimable before this time (retry backoff)
+    worker_id = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.job_type} job {self.id} for video {self.video_id} ({self.status})"
+
+    class Meta:
+        ordering = ['created_at']
+
+class TeamKitProfile(models.Model):
+    """Fitted team classifier state for a pair of teams, reused when the same kits play again."""
+    name = models.CharField(max_length=100, unique=True)
+    team_a = models.CharField(max_length=100)
+    team_b = models.CharField(max_length=100, blank=True)
+    profile = models.JSONField()  # TeamClassifier.to_profile(): feature config, cluster centers, team colors
+    source_video = models.ForeignKey(Video, on_delete=models.SET_NULL, null=True, blank=True, related_name='kit_profiles')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.team_a} vs {self.team_b})" if self.team_b else f"{self.name} ({self.team_a})"
+
+    class Meta:
+        ordering = ['name']
+
 class EventFrame(models.Model):
     video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='event_frames')
     frame_image = models.FileField(upload_to='output/events/', null=True, blank=True)
@@ -0,0 +1,139 @@
+# video_analysis_backend/video_processor/processing.py
+import os
+import json
+import logging
+from django.conf import settings
+from .models import EventFrame, TeamKitProfile
+from .dedupe import link_pending_duplicates
+from .scripts.main import main_processing, rerender_video, OUTPUT_KINDS
+
+logger = logging.getLogger(__name__)
+
+def process_video(video_instance, outputs=None, kit_profile=None, kit_profile_mode='reuse', save_kit_profile=None):
+    """
+    Run the analysis pipeline for a video and attach the produced artifacts.
+
+    Args:
+        video_instance: Video to process
+        outputs: Artifacts to produce ('summary', 'tracks', 'video'); defaults to all
+        kit_profile: Name of a stored TeamKitProfile to classify teams with
+        kit_profile_mode: 'reuse' skips fitting the team classifier; 'seed' starts fitting from the profile
+        save_kit_profile: {'name', 'team_a', 'team_b'} to store the fitted classifier as a kit profile
+
+    Exceptions are propagated so the job queue can retry or fail the job.
+    """
+    outputs = [kind for kind in OUTPUT_KINDS if kind in (outputs or OUTPUT_KINDS)]
+    video_instance.status = 'processing'
+    video_instance.save()
+    video_instance.duplicates.filter(status='pending').update(status='processing')
+
+    input_video_path = video_instance.video_file.path
+    output_dir = os.path.join(settings.MEDIA_ROOT, 'output')
+    events_dir = os.path.join(output_dir, 'events', str(video_instance.id))
+    output_video_path = os.path.join(output_dir, f'annotated_output_{video_instance.id}.mp4')
+    summary_json_path = os.path.join(output_dir, f'match_summary_{video_instance.id}.json')
+    object_tracks_path = os.path.join(output_dir, 'tracks', f'object_tracks_{video_instance.id}.json')
+    keypoint_tracks_path = os.path.join(output_dir, 'tracks', f'keypoint_tracks_{video_instance.id}.json')
+    track_store_dir = os.path.join(output_dir, 'tracks', f'track_store_{video_instance.id}')
+    team_samples_dir = os.path.join(output_dir, 'team_samples', str(video_instance.id))
+    team_profile_path = os.path.join(output_dir, f'team_profile_{video_instance.id}.json')
+    team_profile = TeamKitProfile.objects.get(name=kit_profile).profile if kit_profile else None
+    # A profile left by an earlier attempt must not be mistaken for this run's
+    if save_kit_profile and os.path.exists(team_profile_path):
+        os.remove(team_profile_path)
+
+    main_processing(
+        input_video_path=input_video_path,
+        output_dir=output_dir,
+        output_video_path=output_video_path,
+        summary_json_path=summary_json_path,
+        object_tracks_path=object_tracks_path,
+        keypoint_tracks_path=keypoint_tracks_path,
+        team_samples_dir=team_samples_dir,
+        track_store_dir=track_store_dir,
+        events_dir=events_dir,
+        outputs=outputs,
+        team_profile=team_profile,
+        team_profile_mode=kit_profile_mode,
+        team_profile_path=team_profile_path if save_kit_profile else None,
+        detection_cache_dir=getattr(settings, 'DETECTION_CACHE_DIR', None),
+        detection_schedule=getattr(settings, 'VIDEO_DETECTION_SCHEDULE', 'every_frame'),
+        homography_mode=getattr(settings, 'VIDEO_HOMOGRAPHY_MODE', 'full'),
+        keypoint_schedule=getattr(settings, 'VIDEO_KEYPOINT_SCHEDULE', 'every_frame'),
+        video_hash=video_instance.content_hash or None
+    )
+
+    if save_kit_profile and not os.path.exists(team_profile_path):
+        # The profile is only written when the team classifier could be fitted
+        logger.warning(f"Team classifier was not fitted for video {video_instance.id}; kit profile '{save_kit_profile['name']}' not saved")
+    elif save_kit_profile:
+        with open(team_profile_path) as f:
+            profile = json.load(f)
+        TeamKitProfile.objects.update_or_create(
+            name=save_kit_profile['name'],
+            defaults={
+                'team_a': save_kit_profile['team_a'],
+                'team_b': save_kit_profile.get('team_b', ''),
+                'profile': profile,
+                'source_video': video_instance
+            }
+        )
+
+    # Artifacts that were not requested are detached, so the fields match produced_outputs
+    def relative_if(kind, path):
+        return os.path.relpath(path, settings.MEDIA_ROOT) if kind in outputs else None
+
+    video_instance.output_video.name = relative_if('video', output_video_path)
+    video_instance.summary_json.name = relative_if('summary', summary_json_path)
+    video_instance.object_tracks_json.name = relative_if('tracks', object_tracks_path)
+    video_instance.keypoint_tracks_json.name = relative_if('tracks', keypoint_tracks_path)
+    video_instance.track_store = relative_if('tracks', track_store_dir) or ''
+    video_instance.produced_outputs = outputs
+
+    # A retried job must not duplicate the event frames of an earlier attempt
+    video_instance.event_frames.all().delete()
+    if 'summary' in outputs and os.path.exists(events_dir):
+        for filename in os.listdir(events_dir):
+            if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+                frame_path = os.path.join(events_dir, filename)
+                relative_path = os.path.relpath(frame_path, settings.MEDIA_ROOT)
+                try:
+                    frame_number = int(filename.split('_')[-1].split('.')[0])  # e.g., goal_Team A_164.jpg -> 164
+                except ValueError:
+                    frame_number = None
+                EventFrame.objects.create(
+                    video=video_instance,
+                    frame_image=relative_path,
+                    frame_number=frame_number
+                )
+
+    video_instance.status = 'completed'
+    video_instance.save()
+    link_pending_duplicates(video_instance)
+
+def render_video(video_instance, team_colors=None, show_voronoi=True):
+    """
+    Rebuild the annotated video of a processed video from its stored tracks and summary.
+
+    Args:
+        video_instance: Video with a track store and a match summary
+        team_colors: Colors for Team A and Team B; defaults to the colors found during processing
+        show_voronoi: Shade the Voronoi regions in the projection view
+    """
+    if not video_instance.track_store or not video_instance.summary_json:
+        raise ValueError(f"Video {video_instance.id} has no stored tracks and summary to render from")
+
+    output_video_path = os.path.join(settings.MEDIA_ROOT, 'output', f'annotated_output_{video_instance.id}.mp4')
+    rerender_video(
+        input_video_path=video_instance.video_file.path,
+        track_store_dir=os.path.join(settings.MEDIA_ROOT, video_instance.track_store),
+        summary_json_path=video_instance.summary_json.path,
+        output_video_path=output_video_path,
+        team_colors=team_colors,
+        show_voronoi=show_voronoi
+    )
+
+    video_instance.output_video.name = os.path.relpath(output_video_path, settings.MEDIA_ROOT)
+    if 'video' not in video_instance.produced_outputs:
+        video_instance.produced_outputs = video_instance.produced_outputs + ['video']
+    video_instance.save(update_fields=['output_video', 'produced_outputs'])
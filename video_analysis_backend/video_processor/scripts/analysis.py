@@ -0,0 +1,908 @@
+import numpy as np
+from collections import deque, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from .ball_state import BallStateEstimator, estimate_ball_states
+from .proximity import box_centers, nearest_neighbors
+from .scene_gate import non_pitch_frames
+from .track_store import TrackStoreReader, BALL_TRACKER_ID
+
+# Class IDs of the player detection model
+BALL_CLASS_ID = 0
+GOALKEEPER_ID = 1
+PLAYER_ID = 2
+REFEREE_ID = 3
+
+# Tunable thresholds of the event and statistics logic
+DEFAULT_ANALYSIS_PARAMS: Dict[str, float] = {
+    'pixels_per_meter': 10,  # Conversion ratio from frame pixels to meters
+    'max_speed_kmph': 50.0,  # Player speeds are capped to avoid tracking outliers
+    'possession_distance_threshold': 50,  # Maximum ball to player distance in pixels for possession
+    'max_exit_frames': 5,  # Frames outside the goal before another goal can be detected
+    'shot_min_velocity': 3,  # Minimum ball displacement per frame on the field image
+    'shot_min_dx': 2,  # Minimum displacement toward the goal per frame
+    'shot_max_goal_distance': 150,  # Maximum ball distance to the goal center
+    'shot_max_angle_ratio': 0.8,  # Maximum |dy| / |dx| of the ball direction
+    'shot_dedupe_frames': 30,  # A shot within this many frames of the previous one is a duplicate
+    'shot_cooldown_frames': 30,  # Frames after a shot during which no shot is checked
+    'shot_on_target_window': 150,  # A goal marks the team's last shot within this many frames as on target
+    'ball_accel_std': 3.0,  # Ball filter process noise: acceleration per frame in frame pixels
+    'ball_measurement_std': 2.0,  # Ball filter measurement noise in frame pixels
+    'ball_projection_accel_std': 1.0,  # The same on the field image, for shot detection
+    'ball_projection_measurement_std': 1.0,
+    'ball_gate_sigma': 4.0,  # Ball detections further from the prediction (Mahalanobis distance) are outliers
+    'ball_max_gap_frames': 10,  # Frames without ball detection that are filled with the prediction
+    'possession_switch_margin': 0.0,  # Pixels a challenger must be nearer the ball than its holder to take it; 0 disables
+}
+
+# Goal geometry on the top-down field image
+LEFT_GOAL_X = 32
+RIGHT_GOAL_X = 495
+GOAL_Y_RANGE = (122, 229)
+GOAL_CENTER_Y = 176
+
+
+def resolve_params(overrides: Optional[Dict[str, Any]] = None) -> Dict[str, float]:
+    """
+    Merge parameter overrides into the default analysis parameters.
+
+    Args:
+        overrides (Optional[Dict[str, Any]]): Parameters to change.
+
+    Returns:
+        Dict[str, float]: Complete parameter set.
+
+    Raises:
+        ValueError: On unknown parameter names or values that are not non-negative numbers.
+    """
+    params = dict(DEFAULT_ANALYSIS_PARAMS)
+    for name, value in (overrides or {}).items():
+        if name not in DEFAULT_ANALYSIS_PARAMS:
+            raise ValueError(f"Unknown analysis parameter '{name}'")
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"Analysis parameter '{name}' must be a non-negative number")
+        params[name] = value
+    if params['pixels_per_meter'] <= 0:
+        raise ValueError("Analysis parameter 'pixels_per_meter' must be positive")
+    return params
+
+
+def is_goal_scored(ball_projection, frame_idx):
+    """
+    Check if a goal is scored based on ball position
+
+    Args:
+        ball_projection: The projected ball position
+        frame_idx: The current frame index
+
+    Returns:
+        Tuple[bool, str]: (goal detected, scoring team)
+    """
+    if ball_projection is None:
+        return False, None
+    x, y = ball_projection
+    print(f"Frame {frame_idx}: Ball projection = ({x:.2f}, {y:.2f})")
+    # Left goal (Team B scores): beyond [32, 122], [32, 229]
+    if x < LEFT_GOAL_X and GOAL_Y_RANGE[0] <= y <= GOAL_Y_RANGE[1]:
+        print(f"Frame {frame_idx}: Goal detected for Team B (Left goal)")
+        return True, "Team B"
+    # Right goal (Team A scores): beyond [495, 122], [495, 229]
+    if x > RIGHT_GOAL_X and GOAL_Y_RANGE[0] <= y <= GOAL_Y_RANGE[1]:
+        print(f"Frame {frame_idx}: Goal detected for Team A (Right goal)")
+        return True, "Team A"
+    return False, None
+
+
+def is_shot_taken(ball_projection, prev_ball_projection, player_team, frame_idx, params=None):
+    """
+    Check if a shot is taken based on ball trajectory toward goal
+
+    Args:
+        ball_projection: Current ball position
+        prev_ball_projection: Ball position one frame earlier (the current position minus the estimated velocity)
+        player_team: Team of the player closest to the ball
+        frame_idx: Current frame index
+        params: Analysis parameters (defaults to DEFAULT_ANALYSIS_PARAMS)
+
+    Returns:
+        bool: True if shot detected
+    """
+    if ball_projection is None or prev_ball_projection is None:
+        return False
+    params = params or DEFAULT_ANALYSIS_PARAMS
+    min_dx = params['shot_min_dx']
+    max_goal_distance = params['shot_max_goal_distance']
+    max_angle_ratio = params['shot_max_angle_ratio']
+
+    x, y = ball_projection
+    prev_x, prev_y = prev_ball_projection
+
+    # Calculate direction vector and velocity
+    dx = x - prev_x
+    dy = y - prev_y
+    velocity = np.sqrt(dx*dx + dy*dy)
+
+    # Check if ball is moving toward goals with sufficient velocity
+    if velocity < params['shot_min_velocity']:  # Minimum velocity threshold
+        return False
+
+    # Left goal (Team B defends)
+    if player_team == "Team A" and dx < -min_dx:  # Moving toward left goal
+        # Distance to left goal center
+        distance_to_goal = np.sqrt((x - LEFT_GOAL_X)**2 + (y - GOAL_CENTER_Y)**2)
+        # Check if ball is heading toward goal within a reasonable angle and distance
+        if distance_to_goal < max_goal_distance and abs(dy) < abs(dx) * max_angle_ratio:  # Angle constraint
+            print(f"Frame {frame_idx}: Shot detected from Team A toward left goal")
+            return True
+
+    # Right goal (Team A defends)
+    if player_team == "Team B" and dx > min_dx:  # Moving toward right goal
+        # Distance to right goal center
+        distance_to_goal = np.sqrt((x - RIGHT_GOAL_X)**2 + (y - GOAL_CENTER_Y)**2)
+        # Check if ball is heading toward goal within a reasonable angle and distance
+        if distance_to_goal < max_goal_distance and abs(dy) < abs(dx) * max_angle_ratio:  # Angle constraint
+            print(f"Frame {frame_idx}: Shot detected from Team B toward right goal")
+            return True
+
+    return False
+
+
+def _team_name(team_id) -> str:
+    """Map a team ID to the team name used in the summary."""
+    return 'Team A' if team_id == 0 else 'Team B' if team_id == 1 else 'Referee'
+
+
+class MatchAnalyzer:
+    """
+    Incremental match analysis: possession, passes, shots, goals and player statistics.
+
+    ``update`` is called once per frame, in frame order, with the tracked detections of
+    that frame, and ``summary`` returns the match summary at the end. The analyzer keeps
+    only rolling state, so frames can be fed straight from the processing pipeline.
+    """
+
+    def __init__(
+        self,
+        fps: float,
+        params: Optional[Dict[str, Any]] = None,
+        max_history: int = 30,
+        goal_overlay_duration: int = 30
+    ) -> None:
+        """
+        Initializes the MatchAnalyzer.
+
+        Args:
+            fps (float): Frame rate of the video; 0 falls back to 30.
+            params (Optional[Dict[str, Any]]): Overrides of DEFAULT_ANALYSIS_PARAMS.
+            max_history (int): Number of frames of the ball trail and of player positions kept.
+            goal_overlay_duration (int): Duration of the goal overlay in frames.
+        """
+        self.params = resolve_params(params)
+        self.time_per_frame = 1 / fps if fps > 0 else 1 / 30
+        self.pixels_per_meter = self.params['pixels_per_meter']
+        self.goal_overlay_duration = goal_overlay_duration
+
+        self.ball_position = None  # Detected ball center of the latest frame
+        self.ball_state = BallStateEstimator(**_ball_filter_args(self.params), trail_length=max_history)
+        self.ball_projection_state = BallStateEstimator(**_ball_filter_args(self.params, projection=True), trail_length=1)
+        self.player_positions = defaultdict(lambda: deque(maxlen=max_history))
+        self.player_distances = defaultdict(float)
+        self.player_speeds = defaultdict(float)
+        self.team_map = {}
+        self._speed_sums = defaultdict(float)
+        self.summary_data = {
+            "passes": [],
+            "shots": [],  # Add shots array to track shots
+            "possessions": [],
+            "player_stats": {},
+            "team_stats": {
+                "Team A": {"possession": 0, "passes": 0, "shots": 0, "possession_percentage": 0},
+                "Team B": {"possession": 0, "passes": 0, "shots": 0, "possession_percentage": 0}
+            },
+            "goals": []
+        }
+
+        self.closest_player = None
+        self.last_closest_player = None
+        self.current_possession_team = None
+        self.pass_count = 0
+
+        # Goal state machine
+        self.goal_in_progress = False
+        self.exit_counter = 0
+        self.goal_overlay_frames = 0
+        self.display_goal_overlay = False
+        self.goal_frame_counter = 0
+
+        # Shot detection
+        self.last_shot_frame = -100  # To avoid detecting multiple shots for the same action
+        self.shot_cooldown = 0
+
+    def update(
+        self,
+        frame_idx: int,
+        tracker_ids: np.ndarray,
+        class_ids: np.ndarray,
+        team_ids: np.ndarray,
+        xyxy: np.ndarray,
+        ball_position: Optional[Tuple[int, int]],
+        ball_projection: Optional[Tuple[float, float]]
+    ) -> Dict:
+        """
+        Process one frame.
+
+        Args:
+            frame_idx (int): Frame index.
+            tracker_ids (np.ndarray): Tracker IDs of the tracked detections.
+            class_ids (np.ndarray): Class IDs of the tracked detections.
+            team_ids (np.ndarray): Team IDs of the tracked detections (0, 1 or 2 for referees).
+            xyxy (np.ndarray): Bounding boxes of the tracked detections at processing resolution.
+            ball_position (Optional[Tuple[int, int]]): Ball center in the frame, None without a ball.
+            ball_projection (Optional[Tuple[float, float]]): Ball position on the top-down field.
+
+        Returns:
+            Dict: Frame result with 'closest_player' (nearest player or goalkeeper to the ball),
+                'possessor' (closest player when within the possession threshold), 'goal' and
+                'shot' (team of a goal or shot recorded in this frame, else None).
+        """
+        summary_data = self.summary_data
+        self.update_motion(tracker_ids, class_ids, xyxy, ball_position)
+        result = {'closest_player': None, 'possessor': None, 'goal': None, 'shot': None}
+
+        # Goal detection with state machine
+        if ball_projection is not None:
+            goal_detected, scoring_team = is_goal_scored(ball_projection, frame_idx)
+            if goal_detected:
+                if not self.goal_in_progress:
+                    print(f"Goal scored at frame {frame_idx} for {scoring_team}!")
+                    summary_data["goals"].append({
+                        "frame": frame_idx,
+                        "team": scoring_team,
+                        "player_id": int(self.closest_player) if self.closest_player is not None else None
+                    })
+                    result['goal'] = scoring_team
+
+                    _mark_shot_on_target(summary_data["shots"], scoring_team, frame_idx, self.params['shot_on_target_window'])
+
+                    self.goal_in_progress = True
+                    self.display_goal_overlay = True
+                    self.goal_overlay_frames = self.goal_overlay_duration
+                    self.goal_frame_counter = 0
+
+                self.exit_counter = 0
+            else:
+                if self.goal_in_progress:
+                    self.exit_counter += 1
+                    if self.exit_counter > self.params['max_exit_frames']:
+                        self.goal_in_progress = False
+                        self.exit_counter = 0
+
+        # Shot detection
+        if self.shot_cooldown > 0:
+            self.shot_cooldown -= 1
+
+        # Shots are tested on the filtered field position and velocity, in frames with an accepted detection
+        projection_state = self.ball_projection_state
+        projection_state.update(ball_projection)
+        projection_velocity = projection_state.velocity
+        if projection_state.measured and projection_velocity is not None and self.shot_cooldown == 0:
+            possession_team = self.current_possession_team
+            if possession_team in ["Team A", "Team B"] and self.closest_player is not None:
+                # Check if this is a shot
+                position = projection_state.position
+                if is_shot_taken(tuple(position), tuple(position - projection_velocity), possession_team, frame_idx, self.params):
+                    ball_speed_kmph = projection_state.speed(self.pixels_per_meter, self.time_per_frame)
+
+                    # Record shot
+                    if frame_idx - self.last_shot_frame > self.params['shot_dedupe_frames']:  # Avoid duplicate detections
+                        summary_data["shots"].append({
+                            "frame": frame_idx,
+                            "player_id": int(self.closest_player),
+                            "team": possession_team,
+                            "ball_speed_kmph": round(ball_speed_kmph, 2),
+                            "on_target": False
+                        })
+                        summary_data["team_stats"][possession_team]["shots"] += 1
+                        result['shot'] = possession_team
+
+                        self.last_shot_frame = frame_idx
+                        self.shot_cooldown = self.params['shot_cooldown_frames']  # Prevent multiple detections of the same shot
+
+        # Assign teams for player stats and possession; the ball is not a player
+        for i, tracker_id in enumerate(tracker_ids):
+            if class_ids[i] == BALL_CLASS_ID:
+                continue
+            team = _team_name(team_ids[i])
+            self.team_map[tracker_id] = team
+
+            if team != 'Referee':
+                player_id = str(tracker_id)
+                if player_id not in summary_data["player_stats"]:
+                    summary_data["player_stats"][player_id] = {
+                        "team": team,
+                        "total_distance_m": 0,
+                        "max_speed_kmph": 0,
+                        "avg_speed_kmph": 0,
+                        "speed_history": []
+                    }
+                player_stat = summary_data["player_stats"][player_id]
+                speed = round(self.player_speeds[tracker_id], 2)
+                player_stat["total_distance_m"] = round(self.player_distances[tracker_id], 2)
+                player_stat["max_speed_kmph"] = max(player_stat["max_speed_kmph"], speed)
+                player_stat["speed_history"].append(speed)
+                self._speed_sums[player_id] += speed
+                player_stat["avg_speed_kmph"] = round(self._speed_sums[player_id] / len(player_stat["speed_history"]), 2)
+
+        # Detect passes and calculate possession
+        current_possession_team = None
+        closest_player, min_distance, candidates = self.closest_to_ball(tracker_ids, class_ids, xyxy)
+
+        if self.ball_position is not None:
+            if closest_player is not None and min_distance < self.params['possession_distance_threshold']:
+                possessor = self._select_possessor(candidates)
+                current_possession_team = self.team_map.get(possessor, "Unknown")
+                result['possessor'] = possessor
+
+                # Update possession stats
+                if current_possession_team in ["Team A", "Team B"]:
+                    summary_data["team_stats"][current_possession_team]["possession"] += 1
+
+                # Detect pass if there's a change in possession
+                last_closest_player = self.last_closest_player
+                if last_closest_player is not None and possessor != last_closest_player:
+                    from_team = self.team_map.get(last_closest_player, "Unknown")
+                    to_team = self.team_map.get(possessor, "Unknown")
+
+                    # Only count as a pass if both players are from the same team
+                    if from_team == to_team and from_team in ["Team A", "Team B"]:
+                        self.pass_count += 1
+
+                        # Ball speed of the pass from the filtered ball velocity
+                        ball_speed_kmph = self.ball_state.speed(self.pixels_per_meter, self.time_per_frame) or 0
+
+                        summary_data["passes"].append({
+                            "frame": frame_idx,
+                            "from_player": int(last_closest_player),
+                            "to_player": int(possessor),
+                            "from_team": from_team,
+                            "to_team": to_team,
+                            "ball_speed_kmph": round(ball_speed_kmph, 2)
+                        })
+                        summary_data["team_stats"][from_team]["passes"] += 1
+
+                        print(f"Frame {frame_idx}: Pass #{self.pass_count} from Player {last_closest_player} to Player {possessor}")
+
+                self.last_closest_player = possessor
+            else:
+                # No player close enough to the ball
+                current_possession_team = None
+                self.last_closest_player = None
+        else:
+            # No ball detected
+            self.last_closest_player = None
+
+        self.closest_player = closest_player
+        self.current_possession_team = current_possession_team
+        result['closest_player'] = closest_player
+
+        # Record possession for this frame
+        if current_possession_team in ["Team A", "Team B"]:
+            summary_data["possessions"].append({
+                "frame": frame_idx,
+                "team": current_possession_team
+            })
+
+        # Manage goal overlay display
+        if self.display_goal_overlay and self.goal_overlay_frames > 0:
+            self.goal_overlay_frames -= 1
+            self.goal_frame_counter += 1
+            if self.goal_overlay_frames == 0:
+                self.display_goal_overlay = False
+                self.goal_frame_counter = 0
+
+        self._update_possession_percentages()
+        return result
+
+    def reset_continuity(self) -> None:
+        """
+        Break the play at a cut, e.g. when the scene gate starts skipping frames.
+
+        Possession, the pass chain, the shot cooldown and the ball filters restart with the
+        next analyzed frame, so nothing is linked across a replay or close-up. Player motion
+        and the goal state carry over.
+        """
+        self.ball_position = None
+        self.ball_state.reset()
+        self.ball_projection_state.reset()
+        self.closest_player = None
+        self.last_closest_player = None
+        self.current_possession_team = None
+        self.last_shot_frame = -100
+        self.shot_cooldown = 0
+
+    def update_motion(
+        self,
+        tracker_ids: np.ndarray,
+        class_ids: np.ndarray,
+        xyxy: np.ndarray,
+        ball_position: Optional[Tuple[int, int]]
+    ) -> None:
+        """
+        Advance the ball filter with the ball position and update player speeds and distances.
+
+        Args:
+            tracker_ids (np.ndarray): Tracker IDs of the tracked detections.
+            class_ids (np.ndarray): Class IDs of the tracked detections.
+            xyxy (np.ndarray): Bounding boxes of the tracked detections at processing resolution.
+            ball_position (Optional[Tuple[int, int]]): Ball center in the frame, None without a ball.
+        """
+        self.ball_position = ball_position
+        self.ball_state.update(ball_position)
+        for i, tracker_id in enumerate(tracker_ids):
+            if class_ids[i] in [BALL_CLASS_ID, REFEREE_ID]:
+                continue
+            x1, y1, x2, y2 = xyxy[i]
+            cx = int((x1 + x2) / 2)
+            cy = int((y1 + y2) / 2)
+            positions = self.player_positions[tracker_id]
+            positions.append((cx, cy))
+            if len(positions) >= 2:
+                pos_current = positions[-1]
+                pos_prev = positions[-2]
+                dx = pos_current[0] - pos_prev[0]
+                dy = pos_current[1] - pos_prev[1]
+                distance_pixels = np.sqrt(dx**2 + dy**2)
+                distance_meters = distance_pixels / self.pixels_per_meter
+                self.player_distances[tracker_id] += distance_meters
+                speed_mps = distance_meters / self.time_per_frame
+                self.player_speeds[tracker_id] = min(speed_mps * 3.6, self.params['max_speed_kmph'])  # Cap to avoid outliers
+            else:
+                self.player_speeds[tracker_id] = 0
+
+    def closest_to_ball(
+        self,
+        tracker_ids: np.ndarray,
+        class_ids: np.ndarray,
+        xyxy: np.ndarray
+    ) -> Tuple[Optional[int], float, List[Tuple[int, float]]]:
+        """
+        Rank the players and goalkeepers by the distance of their box center to the ball detected in the latest frame.
+
+        Returns:
+            Tuple[Optional[int], float, List[Tuple[int, float]]]: Tracker ID and distance in pixels of the
+                closest one, and all of them as (tracker ID, distance) nearest first; (None, inf, []) without a ball.
+        """
+        if self.ball_position is None:
+            return None, float('inf'), []
+        keep = ~np.isin(class_ids, [BALL_CLASS_ID, REFEREE_ID])
+        if not keep.any():
+            return None, float('inf'), []
+
+        centers = box_centers(xyxy[keep]).astype(np.float32)
+        ball_point = np.array([self.ball_position], dtype=np.float32)
+        distances, order = nearest_neighbors(centers, ball_point, k=len(centers))
+        ranked_ids = tracker_ids[keep][order[0]]
+        candidates = list(zip(ranked_ids.tolist(), distances[0].tolist()))
+        return ranked_ids[0], distances[0, 0], candidates
+
+    def _select_possessor(self, candidates: List[Tuple[int, float]]) -> int:
+        """
+        Pick the player in possession from the ranked candidates of a frame where the nearest one is in reach.
+
+        The previous possessor keeps the ball while in reach and within possession_switch_margin of the
+        nearest candidate, so possession does not flicker between players contesting the ball.
+        """
+        nearest_id, nearest_distance = candidates[0]
+        margin = self.params['possession_switch_margin']
+        if margin > 0 and self.last_closest_player is not None:
+            for tracker_id, distance in candidates:
+                if distance > nearest_distance + margin or distance >= self.params['possession_distance_threshold']:
+                    break
+                if tracker_id == self.last_closest_player:
+                    return tracker_id
+        return nearest_id
+
+    def _update_possession_percentages(self) -> None:
+        """Recompute the possession percentages of both teams."""
+        team_stats = self.summary_data["team_stats"]
+        total_possession = sum(team_stats[team]["possession"] for team in ["Team A", "Team B"])
+        if total_possession > 0:
+            for team in ["Team A", "Team B"]:
+                team_stats[team]["possession_percentage"] = round(100 * team_stats[team]["possession"] / total_possession, 1)
+
+    def ball_trail(self) -> Tuple[List[Tuple[int, int]], Optional[float]]:
+        """
+        Returns the filtered recent ball path, with missed detections filled in, and the ball speed.
+
+        Returns:
+            Tuple[List[Tuple[int, int]], Optional[float]]: Ball path points and speed in km/h
+                (None while the filter has no velocity).
+        """
+        speed = self.ball_state.speed(self.pixels_per_meter, self.time_per_frame)
+        return self.ball_state.trail_points(), min(speed, 50.0) if speed is not None else None
+
+    def overlay_state(self) -> Dict:
+        """
+        Returns a snapshot of the state drawn on the current frame, safe to hand to another thread.
+
+        Returns:
+            Dict: 'closest_player', 'ball_trail', 'ball_speed_kmph', 'team_stats' and
+                'goal_frame_counter' (None when the goal overlay is hidden).
+        """
+        trail, speed = self.ball_trail()
+        return {
+            'closest_player': self.closest_player,
+            'ball_trail': trail,
+            'ball_speed_kmph': speed,
+            'team_stats': {team: dict(stats) for team, stats in self.summary_data["team_stats"].items()},
+            'goal_frame_counter': self.goal_frame_counter if self.display_goal_overlay else None
+        }
+
+    def summary(self) -> Dict:
+        """
+        Finalize possession percentages and player rankings.
+
+        Returns:
+            Dict: The match summary.
+        """
+        return finalize_summary(self.summary_data)
+
+
+def _mark_shot_on_target(shots: List[Dict], scoring_team: str, frame_idx: int, window: float) -> None:
+    """Mark the scoring team's most recent shot within ``window`` frames before a goal as on target."""
+    recent_shots = [shot for shot in shots if shot["team"] == scoring_team and frame_idx - shot["frame"] < window]
+    if recent_shots:
+        recent_shots[-1]["on_target"] = True
+
+
+def finalize_summary(summary_data: Dict) -> Dict:
+    """
+    Compute final possession percentages and player rankings of a match summary in place.
+
+    Args:
+        summary_data (Dict): Summary with passes, shots, possessions, player_stats, team_stats and goals.
+
+    Returns:
+        Dict: The same summary.
+    """
+    team_stats = summary_data["team_stats"]
+    total_possession = sum(team_stats[team]["possession"] for team in ["Team A", "Team B"])
+    if total_possession > 0:
+        for team in ["Team A", "Team B"]:
+            team_stats[team]["possession_percentage"] = round(100 * team_stats[team]["possession"] / total_possession, 1)
+
+    # Player ranking statistics
+    player_stats = summary_data["player_stats"]
+    if player_stats:
+        player_stats_filtered = {pid: stat for pid, stat in player_stats.items() if stat["team"] != "Referee"}
+        # Ties are broken by tracker ID, so live and offline analysis rank players identically
+        top_distance = sorted(player_stats_filtered.items(), key=lambda x: (-x[1]["total_distance_m"], int(x[0])))[:5]
+        top_speed = sorted(player_stats_filtered.items(), key=lambda x: (-x[1]["max_speed_kmph"], int(x[0])))[:5]
+        top_avg_speed = sorted(player_stats_filtered.items(), key=lambda x: (-x[1]["avg_speed_kmph"], int(x[0])))[:5]
+
+        # Add shots to rankings
+        shots_by_player = defaultdict(list)
+        for shot in summary_data["shots"]:
+            shots_by_player[str(shot["player_id"])].append(shot)
+        top_shooters = []
+        for player_id, stat in player_stats_filtered.items():
+            player_shots = shots_by_player.get(player_id)
+            if player_shots:
+                on_target = len([shot for shot in player_shots if shot.get("on_target", False)])
+                top_shooters.append((player_id, len(player_shots), on_target, stat["team"]))
+
+        top_shooters.sort(key=lambda x: (-x[1], int(x[0])))
+        top_shooters = top_shooters[:5]
+
+        summary_data["rankings"] = {
+            "distance": [{"player_id": int(pid), "distance_m": stat["total_distance_m"], "team": stat["team"]} for pid, stat in top_distance],
+            "max_speed": [{"player_id": int(pid), "speed_kmph": stat["max_speed_kmph"], "team": stat["team"]} for pid, stat in top_speed],
+            "avg_speed": [{"player_id": int(pid), "speed_kmph": stat["avg_speed_kmph"], "team": stat["team"]} for pid, stat in top_avg_speed],
+            "top_shooters": [{"player_id": int(pid), "shots": shots, "on_target": on_target, "team": team} for pid, shots, on_target, team in top_shooters]
+        }
+    return summary_data
+
+
+def compare_summaries(reference: Dict, candidate: Dict) -> Dict[str, Dict[str, float]]:
+    """
+    Deviation of a match summary's headline metrics from a reference summary.
+
+    Possession deviations are in shares (percentage points / 100); counts and the total
+    distance run are relative to the reference (counts of zero are compared to one).
+
+    Args:
+        reference (Dict): Summary of the reference run, e.g. with detection on every frame.
+        candidate (Dict): Summary to check against it.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Per metric, 'reference', 'candidate' and 'deviation'.
+    """
+    def metrics(summary: Dict) -> Dict[str, float]:
+        team_stats = summary["team_stats"]
+        values = {}
+        for team in ("Team A", "Team B"):
+            values[f"{team} possession %"] = team_stats[team]["possession_percentage"]
+            values[f"{team} passes"] = team_stats[team]["passes"]
+            values[f"{team} shots"] = team_stats[team]["shots"]
+        values["goals"] = len(summary["goals"])
+        values["total distance m"] = round(sum(stat["total_distance_m"] for stat in summary["player_stats"].values()), 2)
+        return values
+
+    reference_values, candidate_values = metrics(reference), metrics(candidate)
+    comparison = {}
+    for name, reference_value in reference_values.items():
+        candidate_value = candidate_values[name]
+        if name.endswith("possession %"):
+            deviation = abs(candidate_value - reference_value) / 100
+        else:
+            deviation = abs(candidate_value - reference_value) / max(abs(reference_value), 1)
+        comparison[name] = {"reference": reference_value, "candidate": candidate_value, "deviation": round(deviation, 4)}
+    return comparison
+
+
+def _ball_filter_args(params: Dict[str, float], projection: bool = False) -> Dict[str, float]:
+    """BallStateEstimator arguments of the frame or field-image ball filter."""
+    prefix = 'ball_projection_' if projection else 'ball_'
+    return {
+        'accel_std': params[f'{prefix}accel_std'],
+        'measurement_std': params[f'{prefix}measurement_std'],
+        'gate_sigma': params['ball_gate_sigma'],
+        'max_gap': int(params['ball_max_gap_frames']),
+    }
+
+
+def _empty_summary() -> Dict:
+    """Returns a summary without events, in the layout produced by MatchAnalyzer."""
+    return {
+        "passes": [],
+        "shots": [],
+        "possessions": [],
+        "player_stats": {},
+        "team_stats": {
+            "Team A": {"possession": 0, "passes": 0, "shots": 0, "possession_percentage": 0},
+            "Team B": {"possession": 0, "passes": 0, "shots": 0, "possession_percentage": 0}
+        },
+        "goals": []
+    }
+
+
+def _box_centers(bbox: np.ndarray) -> np.ndarray:
+    """Integer box centers, truncated like the per-frame analysis does."""
+    centers = np.stack([(bbox[:, 0] + bbox[:, 2]) / 2, (bbox[:, 1] + bbox[:, 3]) / 2], axis=1)
+    return np.trunc(centers).astype(np.int64)
+
+
+def analyze_track_store(track_store_dir: str, params: Optional[Dict[str, Any]] = None) -> Dict:
+    """
+    Recompute the match summary from a track store without running any model.
+
+    Produces the same events and statistics as feeding the stored frames through
+    MatchAnalyzer, but with whole-match array operations: player motion is a grouped
+    cumulative sum, possession a per-frame arg-min, and shot and goal candidates are
+    tested for all frames at once. Only the order-dependent rules (shot cooldown, goal
+    re-arming) loop, and only over candidate frames.
+
+    Args:
+        track_store_dir (str): Directory of the video's columnar track store.
+        params (Optional[Dict[str, Any]]): Overrides applied on top of the parameters the
+            store was produced with (or DEFAULT_ANALYSIS_PARAMS for older stores).
+
+    Returns:
+        Dict: The match summary, with the scene segments of the store when the scene gate ran.
+
+    Raises:
+        FileNotFoundError: If there is no track store in the directory.
+        ValueError: On unknown or invalid parameters.
+    """
+    reader = TrackStoreReader(track_store_dir)
+    params = resolve_params({**reader.attrs.get('analysis_params', {}), **(params or {})})
+    fps = reader.attrs.get('fps') or 30
+    time_per_frame = 1 / fps if fps > 0 else 1 / 30
+    pixels_per_meter = params['pixels_per_meter']
+    summary_data = _empty_summary()
+    if 'scene_segments' in reader.attrs:
+        summary_data["scene_segments"] = reader.attrs['scene_segments']
+    num_frames = reader.num_frames
+    if num_frames == 0 or reader.num_rows == 0:
+        return finalize_summary(summary_data)
+
+    columns = {name: np.asarray(column) for name, column in reader.read(columns=['frame', 'tracker_id', 'class_id', 'team_id', 'bbox', 'projection']).items()}
+    frames = columns['frame'].astype(np.int64)
+    tracker_ids = columns['tracker_id'].astype(np.int64)
+    class_ids = columns['class_id']
+    team_ids = columns['team_id']
+    bbox = columns['bbox']
+    centers = _box_centers(bbox)
+
+    # Ball: the selected ball of a frame is stored under BALL_TRACKER_ID
+    is_ball = class_ids == BALL_CLASS_ID
+    ball_rows = np.flatnonzero(is_ball & (tracker_ids == BALL_TRACKER_ID))
+    has_ball = np.zeros(num_frames, dtype=bool)
+    ball_pos = np.zeros((num_frames, 2), dtype=np.int64)
+    ball_proj = np.full((num_frames, 2), np.nan)
+    has_ball[frames[ball_rows]] = True
+    ball_pos[frames[ball_rows]] = centers[ball_rows]
+    ball_proj[frames[ball_rows]] = columns['projection'][ball_rows]
+    has_proj = ~np.isnan(ball_proj).any(axis=1)
+    # The ball filters only advance on frames the analyzer saw, as during processing
+    analyzed = ~non_pitch_frames(reader.attrs.get('scene_segments', []), num_frames)
+    _, ball_vel, _ = estimate_ball_states(ball_pos, has_ball, analyzed, **_ball_filter_args(params))
+    proj_pos, proj_vel, proj_measured = estimate_ball_states(ball_proj, has_proj, analyzed, **_ball_filter_args(params, projection=True))
+
+    # Player motion, grouped by tracker in frame order
+    motion_rows = np.flatnonzero(~is_ball & (class_ids != REFEREE_ID))
+    motion_rows = motion_rows[np.lexsort((frames[motion_rows], tracker_ids[motion_rows]))]
+    motion_tids = tracker_ids[motion_rows]
+    same_track = np.zeros(len(motion_rows), dtype=bool)
+    same_track[1:] = motion_tids[1:] == motion_tids[:-1]
+    step = np.zeros(len(motion_rows))
+    delta = np.diff(centers[motion_rows], axis=0)
+    step[1:] = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2) / pixels_per_meter
+    step[~same_track] = 0.0
+    speed = np.where(same_track, np.minimum(step / time_per_frame * 3.6, params['max_speed_kmph']), 0.0)
+    distance = np.empty(len(motion_rows))
+    track_bounds = np.append(np.flatnonzero(~same_track), len(motion_rows))
+    for lo, hi in zip(track_bounds[:-1], track_bounds[1:]):
+        distance[lo:hi] = np.cumsum(step[lo:hi])  # Sequential sums, as accumulated frame by frame
+
+    # Player statistics, keyed in order of first appearance
+    is_team_row = (team_ids[motion_rows] == 0) | (team_ids[motion_rows] == 1)
+    stat_rows = motion_rows[is_team_row]
+    stat_speed = np.array([round(value, 2) for value in speed[is_team_row].tolist()])
+    stat_distance = distance[is_team_row]
+    stat_tids = tracker_ids[stat_rows]
+    unique_tids, first_idx = np.unique(stat_tids, return_index=True)
+    order = np.argsort(stat_rows[first_idx], kind='stable')
+    bounds = np.flatnonzero(np.r_[True, stat_tids[1:] != stat_tids[:-1], True])
+    for group in order:
+        lo, hi = bounds[group], bounds[group + 1]
+        speeds = stat_speed[lo:hi]
+        summary_data["player_stats"][str(unique_tids[group])] = {
+            "team": _team_name(team_ids[stat_rows[lo]]),
+            "total_distance_m": round(float(stat_distance[hi - 1]), 2),
+            "max_speed_kmph": float(speeds.max()),
+            "avg_speed_kmph": round(float(np.cumsum(speeds)[-1]) / len(speeds), 2),
+            "speed_history": speeds.tolist()
+        }
+
+    # Closest player to the ball per frame
+    candidate_rows = np.flatnonzero(~is_ball & (class_ids != REFEREE_ID) & has_ball[frames])
+    candidate_centers = box_centers(bbox[candidate_rows]).astype(np.float32)
+    offsets = ball_pos[frames[candidate_rows]].astype(np.float32) - candidate_centers
+    candidate_dist = np.sqrt((offsets ** 2).sum(axis=1))
+    ranked = np.lexsort((candidate_dist, frames[candidate_rows]))
+    nearest = ranked[np.r_[True, np.diff(frames[candidate_rows][ranked]) != 0]] if len(ranked) else ranked
+    closest = np.full(num_frames, -1, dtype=np.int64)
+    closest_team = np.full(num_frames, -1, dtype=np.int64)
+    possessor = np.full(num_frames, -1, dtype=np.int64)
+    nearest_frames = frames[candidate_rows[nearest]]
+    closest[nearest_frames] = tracker_ids[candidate_rows[nearest]]
+    closest_team[nearest_frames] = team_ids[candidate_rows[nearest]]
+    in_reach = candidate_dist[nearest] < params['possession_distance_threshold']
+    possessor[nearest_frames[in_reach]] = closest[nearest_frames[in_reach]]
+    possessor_team = closest_team.copy()
+    if params['possession_switch_margin'] > 0:
+        # Hysteresis depends on the previous frame's possessor, so this part walks the frames
+        group_starts = np.flatnonzero(np.r_[True, np.diff(frames[candidate_rows][ranked]) != 0])
+        group_ends = np.r_[group_starts[1:], len(ranked)]
+        for group in np.flatnonzero(in_reach):
+            frame_idx = nearest_frames[group]
+            previous = possessor[frame_idx - 1] if frame_idx > 0 else -1
+            if previous < 0:
+                continue
+            group_ranked = ranked[group_starts[group]:group_ends[group]]
+            group_dist = candidate_dist[group_ranked]
+            contested = (group_dist <= group_dist[0] + params['possession_switch_margin']) & \
+                (group_dist < params['possession_distance_threshold'])
+            # Candidates are ranked, so the contested ones are a prefix
+            contested_rows = candidate_rows[group_ranked[:np.count_nonzero(contested)]]
+            kept = contested_rows[tracker_ids[contested_rows] == previous]
+            if len(kept):
+                possessor[frame_idx] = previous
+                possessor_team[frame_idx] = team_ids[kept[0]]
+    has_possessor = possessor >= 0
+    possession_team = np.where(has_possessor & np.isin(possessor_team, (0, 1)), possessor_team, -1)
+
+    team_stats = summary_data["team_stats"]
+    for team_id, team in enumerate(["Team A", "Team B"]):
+        team_stats[team]["possession"] = int((possession_team == team_id).sum())
+    summary_data["possessions"] = [
+        {"frame": int(frame_idx), "team": _team_name(possession_team[frame_idx])}
+        for frame_idx in np.flatnonzero(possession_team >= 0)
+    ]
+
+    # Passes: possession changes between two players of the same team
+    changes = np.flatnonzero(has_possessor[1:] & has_possessor[:-1] & (possessor[1:] != possessor[:-1])) + 1
+    for frame_idx in changes:
+        from_player, to_player = possessor[frame_idx - 1], possessor[frame_idx]
+        from_team = _latest_team(reader, columns, from_player, frame_idx)
+        to_team = _team_name(possessor_team[frame_idx])
+        if from_team != to_team or from_team not in ["Team A", "Team B"]:
+            continue
+        ball_speed_kmph = 0
+        if not np.isnan(ball_vel[frame_idx, 0]):
+            ball_speed_kmph = np.hypot(ball_vel[frame_idx, 0], ball_vel[frame_idx, 1]) / pixels_per_meter / time_per_frame * 3.6
+        summary_data["passes"].append({
+            "frame": int(frame_idx),
+            "from_player": int(from_player),
+            "to_player": int(to_player),
+            "from_team": from_team,
+            "to_team": to_team,
+            "ball_speed_kmph": round(float(ball_speed_kmph), 2)
+        })
+        team_stats[from_team]["passes"] += 1
+
+    # Shots: filtered ball moving toward a goal right after a team had possession
+    dx, dy = proj_vel[:, 0], proj_vel[:, 1]
+    prev_team = np.roll(possession_team, 1)
+    with np.errstate(invalid='ignore'):
+        aimed = (np.sqrt(dx * dx + dy * dy) >= params['shot_min_velocity']) & (np.abs(dy) < np.abs(dx) * params['shot_max_angle_ratio'])
+        toward_left = (prev_team == 0) & (dx < -params['shot_min_dx']) & \
+            (np.hypot(proj_pos[:, 0] - LEFT_GOAL_X, proj_pos[:, 1] - GOAL_CENTER_Y) < params['shot_max_goal_distance'])
+        toward_right = (prev_team == 1) & (dx > params['shot_min_dx']) & \
+            (np.hypot(proj_pos[:, 0] - RIGHT_GOAL_X, proj_pos[:, 1] - GOAL_CENTER_Y) < params['shot_max_goal_distance'])
+    shot_candidates = proj_measured & ~np.isnan(dx) & aimed & (toward_left | toward_right)
+    shot_candidates[0] = False
+    # Latest frame at or before each frame that follows skipped frames; the cooldown restarts there
+    resumed = analyzed.copy()
+    resumed[1:] &= ~analyzed[:-1]
+    resumed_at = np.maximum.accumulate(np.where(resumed, np.arange(num_frames), 0))
+    last_shot_frame = -100
+    cooldown_until = 0
+    for frame_idx in np.flatnonzero(shot_candidates):
+        if resumed_at[frame_idx] > last_shot_frame >= 0:
+            last_shot_frame = -100
+            cooldown_until = 0
+        if frame_idx < cooldown_until or frame_idx - last_shot_frame <= params['shot_dedupe_frames']:
+            continue
+        team = _team_name(prev_team[frame_idx])
+        ball_speed_kmph = np.hypot(dx[frame_idx], dy[frame_idx]) / time_per_frame / pixels_per_meter * 3.6
+        summary_data["shots"].append({
+            "frame": int(frame_idx),
+            "player_id": int(closest[frame_idx - 1]),
+            "team": team,
+            "ball_speed_kmph": round(float(ball_speed_kmph), 2),
+            "on_target": False
+        })
+        team_stats[team]["shots"] += 1
+        last_shot_frame = frame_idx
+        cooldown_until = frame_idx + params['shot_cooldown_frames']
+
+    # Goals: ball inside a goal, re-armed after it has been out for max_exit_frames
+    with np.errstate(invalid='ignore'):
+        in_goal_y = (ball_proj[:, 1] >= GOAL_Y_RANGE[0]) & (ball_proj[:, 1] <= GOAL_Y_RANGE[1])
+        left_goal = in_goal_y & (ball_proj[:, 0] < LEFT_GOAL_X)
+        right_goal = in_goal_y & (ball_proj[:, 0] > RIGHT_GOAL_X)
+    goal_in_progress = False
+    exit_counter = 0
+    for frame_idx in np.flatnonzero(has_proj):
+        if left_goal[frame_idx] or right_goal[frame_idx]:
+            if not goal_in_progress:
+                scoring_team = "Team B" if left_goal[frame_idx] else "Team A"
+                scorer = closest[frame_idx - 1] if frame_idx > 0 else -1
+                summary_data["goals"].append({
+                    "frame": int(frame_idx),
+                    "team": scoring_team,
+                    "player_id": int(scorer) if scorer >= 0 else None
+                })
+                earlier_shots = [shot for shot in summary_data["shots"] if shot["frame"] < frame_idx]
+                _mark_shot_on_target(earlier_shots, scoring_team, frame_idx, params['shot_on_target_window'])
+                goal_in_progress = True
+            exit_counter = 0
+        elif goal_in_progress:
+            exit_counter += 1
+            if exit_counter > params['max_exit_frames']:
+                goal_in_progress = False
+                exit_counter = 0
+
+    return finalize_summary(summary_data)
+
+
+def _latest_team(reader: TrackStoreReader, columns: Dict[str, np.ndarray], tracker_id: int, frame_idx: int) -> str:
+    """Team of a tracker in the given frame, or in the previous frame when it is not detected there."""
+    for idx in (frame_idx, frame_idx - 1):
+        first_row, count = (int(v) for v in reader.frame_index[idx])
+        rows = slice(first_row, first_row + count)
+        match = np.flatnonzero((columns['tracker_id'][rows] == tracker_id) & (columns['class_id'][rows] != BALL_CLASS_ID))
+        if len(match):
+            return _team_name(columns['team_id'][rows][match[0]])
+    return "Unknown"
@@ -0,0 +1,199 @@
+import numpy as np
+from collections import deque
+from typing import List, Optional, Tuple
+
+
+class BallStateEstimator:
+    """
+    Incremental constant-velocity Kalman filter of the ball position.
+
+    ``update`` is called once per analyzed frame with the detected ball position, or None.
+    A detection whose Mahalanobis distance to the prediction exceeds ``gate_sigma`` is
+    rejected as an outlier; ``max_rejections`` consecutive rejections restart the track at
+    the new position, since the ball was then most likely kicked or a different ball was
+    picked. Frames without an accepted detection are filled with the prediction for up to
+    ``max_gap`` frames, after which the track is dropped until the next detection.
+
+    Each update costs a few 4x4 matrix operations. Positions are in the units of the
+    measurements (frame or top-down pixels) and velocities in those units per frame.
+    """
+
+    def __init__(
+        self,
+        accel_std: float = 3.0,
+        measurement_std: float = 2.0,
+        gate_sigma: float = 4.0,
+        max_gap: int = 10,
+        max_rejections: int = 2,
+        trail_length: int = 30
+    ) -> None:
+        """
+        Initializes the BallStateEstimator.
+
+        Args:
+            accel_std (float): Standard deviation of the ball's acceleration per frame (process noise).
+            measurement_std (float): Standard deviation of a detected position.
+            gate_sigma (float): Largest Mahalanobis distance of an accepted detection.
+            max_gap (int): Frames without accepted detection for which the position is estimated.
+            max_rejections (int): Consecutive rejected detections after which the track restarts.
+            trail_length (int): Number of frames kept in the trail.
+        """
+        self.gate_sigma = gate_sigma
+        self.max_gap = max_gap
+        self.max_rejections = max_rejections
+        self._F = np.array([[1, 0, 1, 0], [0, 1, 0, 1], [0, 0, 1, 0], [0, 0, 0, 1]], dtype=np.float64)
+        self._H = np.array([[1, 0, 0, 0], [0, 1, 0, 0]], dtype=np.float64)
+        # Piecewise-constant acceleration between frames
+        G = np.array([[0.5, 0], [0, 0.5], [1, 0], [0, 1]])
+        self._Q = G @ G.T * accel_std ** 2
+        self._R = np.eye(2) * measurement_std ** 2
+        self._x = None
+        self._P = None
+        self._frames_since_measurement = 0
+        self._rejections = 0
+        self._measurements = 0
+        self.measured = False  # Whether the last update accepted a detection
+        self.trail = deque(maxlen=trail_length)  # Estimated position per frame, None without a track
+
+    def reset(self) -> None:
+        """Drop the track and the trail."""
+        self._x = None
+        self._P = None
+        self._rejections = 0
+        self._measurements = 0
+        self.measured = False
+        self.trail.clear()
+
+    def _start(self, measurement: np.ndarray) -> None:
+        self._x = np.array([measurement[0], measurement[1], 0.0, 0.0])
+        # The velocity is unknown until the second detection
+        self._P = np.diag([self._R[0, 0], self._R[1, 1], 1e4, 1e4])
+        self._frames_since_measurement = 0
+        self._rejections = 0
+        self._measurements = 1
+        self.measured = True
+
+    def update(self, measurement: Optional[Tuple[float, float]]) -> None:
+        """
+        Advance the filter by one frame.
+
+        Args:
+            measurement (Optional[Tuple[float, float]]): Detected ball position, None without a detection.
+        """
+        self.measured = False
+        if self._x is None:
+            if measurement is not None:
+                self._start(np.asarray(measurement, dtype=np.float64))
+            self.trail.append(self.position_tuple())
+            return
+
+        # Predict
+        self._x = self._F @ self._x
+        self._P = self._F @ self._P @ self._F.T + self._Q
+
+        if measurement is not None:
+            z = np.asarray(measurement, dtype=np.float64)
+            innovation = z - self._H @ self._x
+            S = self._H @ self._P @ self._H.T + self._R
+            if innovation @ np.linalg.solve(S, innovation) <= self.gate_sigma ** 2:
+                K = self._P @ self._H.T @ np.linalg.inv(S)
+                self._x = self._x + K @ innovation
+                self._P = (np.eye(4) - K @ self._H) @ self._P
+                self._frames_since_measurement = 0
+                self._rejections = 0
+                self._measurements += 1
+                self.measured = True
+            else:
+                self._rejections += 1
+                if self._rejections >= self.max_rejections:
+                    self._start(z)
+                    self.trail.append(self.position_tuple())
+                    return
+
+        if not self.measured:
+            self._frames_since_measurement += 1
+            if self._frames_since_measurement > self.max_gap:
+                self._x = None
+                self._P = None
+                self._measurements = 0
+        self.trail.append(self.position_tuple())
+
+    @property
+    def position(self) -> Optional[np.ndarray]:
+        """Estimated position, None without a track."""
+        return None if self._x is None else self._x[:2].copy()
+
+    @property
+    def velocity(self) -> Optional[np.ndarray]:
+        """Estimated velocity per frame, None until the track has two detections."""
+        return None if self._x is None or self._measurements < 2 else self._x[2:].copy()
+
+    @property
+    def position_std(self) -> Optional[float]:
+        """Root-mean-square standard deviation of the position estimate, None without a track."""
+        return None if self._P is None else float(np.sqrt((self._P[0, 0] + self._P[1, 1]) / 2))
+
+    def position_tuple(self) -> Optional[Tuple[int, int]]:
+        """Estimated position rounded to integer pixels, None without a track."""
+        return None if self._x is None else (int(self._x[0]), int(self._x[1]))
+
+    def speed(self, pixels_per_meter: float, time_per_frame: float) -> Optional[float]:
+        """
+        Estimated ball speed.
+
+        Args:
+            pixels_per_meter (float): Conversion ratio from pixels to meters.
+            time_per_frame (float): Seconds per frame.
+
+        Returns:
+            Optional[float]: Speed in km/h, None while the velocity is unknown.
+        """
+        velocity = self.velocity
+        if velocity is None:
+            return None
+        return float(np.hypot(velocity[0], velocity[1])) / pixels_per_meter / time_per_frame * 3.6
+
+    def trail_points(self) -> List[Tuple[int, int]]:
+        """Estimated positions of the recent frames that had a track, oldest first."""
+        return [point for point in self.trail if point is not None]
+
+
+def estimate_ball_states(
+    positions: np.ndarray,
+    present: np.ndarray,
+    analyzed: Optional[np.ndarray] = None,
+    **kwargs
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Run a BallStateEstimator over a whole match.
+
+    Args:
+        positions (np.ndarray): Array of shape (n, 2) with the detected position per frame.
+        present (np.ndarray): Whether each frame has a detection.
+        analyzed (Optional[np.ndarray]): Frames the filter is fed, e.g. without the frames the
+            scene gate skipped; all frames when None. The filter restarts after skipped frames.
+        **kwargs: Arguments of BallStateEstimator.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Estimated positions and velocities, shape (n, 2)
+            and NaN where unknown, and whether each frame's detection was accepted.
+    """
+    estimator = BallStateEstimator(**kwargs)
+    num_frames = len(positions)
+    estimated = np.full((num_frames, 2), np.nan)
+    velocities = np.full((num_frames, 2), np.nan)
+    measured = np.zeros(num_frames, dtype=bool)
+    frame_indices = np.flatnonzero(analyzed) if analyzed is not None else range(num_frames)
+    previous = None
+    for frame_idx in frame_indices:
+        if previous is not None and frame_idx != previous + 1:
+            estimator.reset()  # The track does not continue across skipped frames
+        previous = frame_idx
+        estimator.update(tuple(positions[frame_idx]) if present[frame_idx] else None)
+        position, velocity = estimator.position, estimator.velocity
+        if position is not None:
+            estimated[frame_idx] = position
+        if velocity is not None:
+            velocities[frame_idx] = velocity
+        measured[frame_idx] = estimator.measured
+    return estimated, velocities, measured
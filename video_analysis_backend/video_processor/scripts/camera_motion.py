@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+from typing import Optional
+
+
+class CameraMotionEstimator:
+    """
+    Estimates the camera motion between consecutive frames from sparse optical flow.
+
+    Corners are tracked with pyramidal Lucas-Kanade on a downscaled grey frame and a
+    similarity transform (rotation, uniform scale, translation) is fitted to them with RANSAC,
+    so players moving against the pitch are rejected as outliers. Corners are only re-detected
+    when too few survive tracking.
+    """
+
+    def __init__(self, scale: float = 0.25, max_corners: int = 150, min_tracked: int = 20) -> None:
+        """
+        Initializes the CameraMotionEstimator.
+
+        Args:
+            scale (float): Downscaling factor applied to frames before tracking.
+            max_corners (int): Maximum number of corners to track.
+            min_tracked (int): Fewest tracked corners a motion estimate is accepted from.
+        """
+        self.scale = scale
+        self.max_corners = max_corners
+        self.min_tracked = min_tracked
+        self.magnitude = None  # Median corner displacement of the last estimate, in full-frame pixels
+        self._prev_grey = None
+        self._prev_points = None
+
+    def reset(self) -> None:
+        """Forget the previous frame, e.g. after frames were skipped."""
+        self.magnitude = None
+        self._prev_grey = None
+        self._prev_points = None
+
+    def _detect(self, grey: np.ndarray) -> Optional[np.ndarray]:
+        return cv2.goodFeaturesToTrack(grey, maxCorners=self.max_corners, qualityLevel=0.01, minDistance=8)
+
+    def update(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Estimate the motion from the previous frame to this one.
+
+        Args:
+            frame (np.ndarray): BGR frame; consecutive calls must receive consecutive frames.
+
+        Returns:
+            Optional[np.ndarray]: 3x3 matrix mapping previous-frame pixel coordinates to this
+                frame's, or None for the first frame or when tracking failed.
+        """
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        grey = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        prev_grey, prev_points = self._prev_grey, self._prev_points
+        self._prev_grey = grey
+        self.magnitude = None
+        if prev_grey is None:
+            self._prev_points = self._detect(grey)
+            return None
+        if prev_points is None or len(prev_points) < self.min_tracked:
+            prev_points = self._detect(prev_grey)
+            if prev_points is None:
+                self._prev_points = self._detect(grey)
+                return None
+
+        points, status, _ = cv2.calcOpticalFlowPyrLK(prev_grey, grey, prev_points, None, winSize=(15, 15), maxLevel=2)
+        tracked = status.ravel() == 1
+        if tracked.sum() < self.min_tracked:
+            self._prev_points = self._detect(grey)
+            return None
+        src, dst = prev_points[tracked].reshape(-1, 2), points[tracked].reshape(-1, 2)
+        affine, inliers = cv2.estimateAffinePartial2D(src, dst, method=cv2.RANSAC, ransacReprojThreshold=1.0)
+        if affine is None:
+            self._prev_points = self._detect(grey)
+            return None
+        inliers = inliers.ravel() == 1
+        self._prev_points = dst[inliers].reshape(-1, 1, 2)
+        self.magnitude = float(np.median(np.linalg.norm(dst[inliers] - src[inliers], axis=1))) / self.scale
+
+        # The linear part is scale invariant; the translation is converted to full-frame pixels
+        motion = np.eye(3)
+        motion[:2, :2] = affine[:, :2]
+        motion[:2, 2] = affine[:, 2] / self.scale
+        return motion
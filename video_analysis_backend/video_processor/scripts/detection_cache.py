@@ -0,0 +1,251 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+import supervision as sv
+from typing import Dict, List, Optional, Tuple
+
+CACHE_FORMAT_VERSION = 1
+
+_digest_memo = {}
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    SHA-256 of a file's content.
+
+    Digests are remembered per (path, size, modification time), so a model file shared by
+    many jobs of one worker is only read once.
+
+    Args:
+        path (str): File to hash.
+        chunk_size (int): Bytes read at a time.
+
+    Returns:
+        str: Hex digest.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _digest_memo:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(chunk_size), b''):
+                digest.update(block)
+        _digest_memo[memo_key] = digest.hexdigest()
+    return _digest_memo[memo_key]
+
+
+def detections_to_arrays(detections: sv.Detections) -> Dict[str, np.ndarray]:
+    """Raw detection columns of one frame, in the compact dtypes the cache stores."""
+    count = len(detections)
+    return {
+        'xyxy': np.asarray(detections.xyxy, dtype=np.float32).reshape(count, 4),
+        'confidence': (np.asarray(detections.confidence, dtype=np.float32) if detections.confidence is not None
+                       else np.ones(count, dtype=np.float32)),
+        'class_id': np.asarray(detections.class_id, dtype=np.int16).reshape(count),
+    }
+
+
+def arrays_to_detections(arrays: Dict[str, np.ndarray]) -> sv.Detections:
+    """Inverse of detections_to_arrays."""
+    if len(arrays['xyxy']) == 0:
+        return sv.Detections.empty()
+    return sv.Detections(
+        xyxy=arrays['xyxy'].astype(np.float32),
+        confidence=arrays['confidence'].astype(np.float32),
+        class_id=arrays['class_id'].astype(int),
+    )
+
+
+def keypoints_to_arrays(keypoints: List[Dict]) -> Dict[str, np.ndarray]:
+    """Keypoint dictionaries of one frame as cache columns."""
+    return {
+        'id': np.array([kp['id'] for kp in keypoints], dtype=np.int16),
+        'coords': np.array([kp['coords'] for kp in keypoints], dtype=np.float32).reshape(len(keypoints), 2),
+        'confidence': np.array([kp['confidence'] for kp in keypoints], dtype=np.float32),
+    }
+
+
+def arrays_to_keypoints(arrays: Dict[str, np.ndarray]) -> List[Dict]:
+    """Inverse of keypoints_to_arrays."""
+    return [
+        {'id': int(kp_id), 'coords': (float(x), float(y)), 'confidence': float(conf)}
+        for kp_id, (x, y), conf in zip(arrays['id'], arrays['coords'], arrays['confidence'])
+    ]
+
+
+class DetectionCache:
+    """
+    On-disk cache of raw per-frame model outputs, keyed by frame index.
+
+    A cache lives in a directory named after the hash of its key parts (video content hash,
+    model file hash, detection resolution and thresholds, see ``key_parts``), so a changed
+    video, model or configuration never reads stale entries. Each frame holds a few
+    equal-length columns (e.g. xyxy, confidence, class_id). Frames are grouped into chunks
+    of ``chunk_frames`` consecutive indices stored as one ``.npz`` file with the columns
+    concatenated and a row offset per frame.
+
+    A chunk is written, atomically and merged with what is already on disk, as soon as all
+    of its frames are known, so a job that crashes keeps everything up to its last complete
+    chunk. Sparse writes (sampled frames) are written on ``flush``.
+    """
+
+    def __init__(self, cache_dir: str, key_parts: Dict, chunk_frames: int = 256) -> None:
+        """
+        Initializes the DetectionCache.
+
+        Args:
+            cache_dir (str): Root directory shared by all caches.
+            key_parts (Dict): JSON-serializable description of everything the outputs depend on.
+            chunk_frames (int): Number of consecutive frames per chunk file.
+        """
+        key_parts = {'format': CACHE_FORMAT_VERSION, **key_parts}
+        key = hashlib.sha256(json.dumps(key_parts, sort_keys=True).encode()).hexdigest()[:24]
+        self.directory = os.path.join(cache_dir, key)
+        self.chunk_frames = chunk_frames
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path = os.path.join(self.directory, 'meta.json')
+        if not os.path.exists(meta_path):
+            with open(meta_path, 'w') as f:
+                json.dump({**key_parts, 'chunk_frames': chunk_frames}, f)
+        self._loaded = {}  # chunk index -> {frame: columns}
+        self._pending = {}  # chunk index -> {frame: columns} not yet on disk
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'chunks_written': 0}
+
+    def _chunk_path(self, chunk_idx: int) -> str:
+        return os.path.join(self.directory, f"chunk_{chunk_idx:06d}.npz")
+
+    def _load_chunk(self, chunk_idx: int) -> Dict[int, Dict[str, np.ndarray]]:
+        if chunk_idx not in self._loaded:
+            frames = {}
+            path = self._chunk_path(chunk_idx)
+            if os.path.exists(path):
+                with np.load(path) as data:
+                    offsets = data['offsets']
+                    columns = {name[len('col_'):]: data[name] for name in data.files if name.startswith('col_')}
+                    for i, frame_idx in enumerate(data['frames']):
+                        frames[int(frame_idx)] = {name: values[offsets[i]:offsets[i + 1]] for name, values in columns.items()}
+            # Reads move forward through the video; a few chunks cover a micro-batch on a boundary
+            if len(self._loaded) >= 4:
+                self._loaded.pop(next(iter(self._loaded)))
+            self._loaded[chunk_idx] = frames
+        return self._loaded[chunk_idx]
+
+    def get(self, frame_idx: int) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Columns cached for a frame.
+
+        Args:
+            frame_idx (int): Frame index.
+
+        Returns:
+            Optional[Dict[str, np.ndarray]]: The columns, or None when the frame is not cached.
+        """
+        chunk_idx = frame_idx // self.chunk_frames
+        with self._lock:
+            columns = self._pending.get(chunk_idx, {}).get(frame_idx)
+            if columns is None:
+                columns = self._load_chunk(chunk_idx).get(frame_idx)
+            self.stats['hits' if columns is not None else 'misses'] += 1
+            return columns
+
+    def put(self, frame_idx: int, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Store the columns of a frame.
+
+        Args:
+            frame_idx (int): Frame index.
+            columns (Dict[str, np.ndarray]): Equal-length columns, e.g. from detections_to_arrays.
+        """
+        chunk_idx = frame_idx // self.chunk_frames
+        with self._lock:
+            pending = self._pending.setdefault(chunk_idx, {})
+            pending[frame_idx] = columns
+            if len(pending) + len(self._load_chunk(chunk_idx).keys() - pending.keys()) >= self.chunk_frames:
+                self._write_chunk(chunk_idx)
+
+    def flush(self) -> None:
+        """Write all pending frames to disk."""
+        with self._lock:
+            for chunk_idx in list(self._pending):
+                self._write_chunk(chunk_idx)
+
+    def _write_chunk(self, chunk_idx: int) -> None:
+        frames = dict(self._load_chunk(chunk_idx))
+        frames.update(self._pending.pop(chunk_idx, {}))
+        if not frames:
+            return
+        order = sorted(frames)
+        names = sorted(frames[order[0]])
+        counts = [len(frames[frame_idx][names[0]]) for frame_idx in order]
+        arrays = {
+            'frames': np.array(order, dtype=np.int64),
+            'offsets': np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        }
+        for name in names:
+            arrays[f'col_{name}'] = np.concatenate([frames[frame_idx][name] for frame_idx in order])
+        path = self._chunk_path(chunk_idx)
+        tmp_path = f"{path[:-len('.npz')]}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        self._loaded[chunk_idx] = frames
+        self.stats['chunks_written'] += 1
+
+    def summary(self) -> Dict:
+        """Returns the hit/miss statistics."""
+        return dict(self.stats)
+
+
+def open_detection_caches(
+    cache_dir: str,
+    video_hash: str,
+    player_model_path: str,
+    keypoints_model_path: str,
+    target_resolution: Tuple[int, int],
+    player_detection_resolution: Tuple[int, int],
+    keypoint_detection_resolution: Tuple[int, int],
+    conf_threshold: float,
+    keypoint_conf: float,
+    keypoint_point_conf: float
+) -> Tuple[DetectionCache, DetectionCache]:
+    """
+    Open the object and keypoint caches of a video for a model configuration.
+
+    Frames are resized to the processing resolution before the detection resolution, so
+    both resolutions are part of the keys.
+
+    Args:
+        cache_dir (str): Root directory of the detection caches.
+        video_hash (str): Content hash of the input video.
+        player_model_path (str): Path of the player model.
+        keypoints_model_path (str): Path of the keypoint model.
+        target_resolution (Tuple[int, int]): Processing resolution.
+        player_detection_resolution (Tuple[int, int]): Input resolution of the player model.
+        keypoint_detection_resolution (Tuple[int, int]): Input resolution of the keypoint model.
+        conf_threshold (float): Confidence threshold of the player model.
+        keypoint_conf (float): Detection confidence threshold of the keypoint model.
+        keypoint_point_conf (float): Per-keypoint confidence threshold.
+
+    Returns:
+        Tuple[DetectionCache, DetectionCache]: Object detection cache and keypoint cache.
+    """
+    object_cache = DetectionCache(cache_dir, {
+        'kind': 'objects',
+        'video': video_hash,
+        'model': file_digest(player_model_path),
+        'resolution': list(target_resolution),
+        'detection_resolution': list(player_detection_resolution),
+        'conf': conf_threshold,
+    })
+    keypoint_cache = DetectionCache(cache_dir, {
+        'kind': 'keypoints',
+        'video': video_hash,
+        'model': file_digest(keypoints_model_path),
+        'resolution': list(target_resolution),
+        'detection_resolution': list(keypoint_detection_resolution),
+        'conf': keypoint_conf,
+        'kp_conf': keypoint_point_conf,
+    })
+    return object_cache, keypoint_cache
@@ -0,0 +1,156 @@
+import time
+import cv2
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SAMPLER_MODES = ('auto', 'grab', 'seek')
+
+
+def coarse_to_fine_order(count: int) -> List[int]:
+    """
+    Order ``range(count)`` so that every prefix is spread evenly over the whole range.
+
+    The order is the van der Corput sequence: indices sorted by their bit-reversed value,
+    i.e. 0, 1/2, 1/4, 3/4, 1/8, ... of the range.
+
+    Args:
+        count (int): Number of indices.
+
+    Returns:
+        List[int]: The indices in coarse-to-fine order.
+    """
+    if count <= 0:
+        return []
+    bits = max(1, int(count - 1).bit_length())
+    reversed_keys = [int(format(i, f'0{bits}b')[::-1], 2) for i in range(count)]
+    return [int(i) for i in np.argsort(reversed_keys, kind='stable')]
+
+
+class FrameSampler:
+    """
+    Yields every ``stride``-th frame of a video without decoding the frames in between into images.
+
+    Two access strategies:
+
+    - 'grab': read sequentially, calling ``cap.grab()`` on skipped frames, which advances
+      the stream without the color conversion and copy of ``cap.read()``. Samples come in
+      frame order.
+    - 'seek': jump to each sampled timestamp with ``CAP_PROP_POS_MSEC``. Only the frames
+      between the preceding keyframe and the target are decoded, so it wins when the
+      stride is longer than the keyframe interval. Samples come in coarse-to-fine order
+      (start, middle, quarters, ...), so stopping early still covers the whole video.
+
+    'auto' seeks when the stride is at least ``seek_min_stride`` frames and grabs otherwise.
+    Iteration ends at the end of the video (or ``end_frame``), after ``max_samples`` samples,
+    once ``time_budget`` seconds have passed, or when ``stop`` is called.
+    """
+
+    def __init__(
+        self,
+        video_path: str,
+        stride: int,
+        mode: str = 'auto',
+        time_budget: Optional[float] = None,
+        max_samples: Optional[int] = None,
+        seek_min_stride: int = 250,
+        end_frame: Optional[int] = None
+    ) -> None:
+        """
+        Initializes the FrameSampler.
+
+        Args:
+            video_path (str): Path of the video.
+            stride (int): Distance between sampled frames.
+            mode (str): 'auto', 'grab' or 'seek'.
+            time_budget (Optional[float]): Seconds after which sampling stops; None for no limit.
+            max_samples (Optional[int]): Maximum number of frames to yield; None for no limit.
+            seek_min_stride (int): Smallest stride at which 'auto' seeks instead of grabbing.
+            end_frame (Optional[int]): Frame to stop before; None for the whole video.
+        """
+        if mode not in SAMPLER_MODES:
+            raise ValueError(f"Unknown sampler mode '{mode}' (expected one of {SAMPLER_MODES})")
+        self.video_path = video_path
+        self.stride = max(1, int(stride))
+        self.mode = mode
+        self.time_budget = time_budget
+        self.max_samples = max_samples
+        self.seek_min_stride = seek_min_stride
+        self.end_frame = end_frame
+        self._stopped = False
+        self.stats = {'mode': None, 'sampled': 0, 'skipped': 0, 'seeks': 0, 'elapsed_seconds': 0.0, 'stop_reason': None}
+
+    def stop(self) -> None:
+        """Stop the iteration before the next sample."""
+        self._stopped = True
+
+    def _should_stop(self, started: float) -> bool:
+        if self._stopped:
+            self.stats['stop_reason'] = 'stopped'
+        elif self.max_samples is not None and self.stats['sampled'] >= self.max_samples:
+            self.stats['stop_reason'] = 'max_samples'
+        elif self.time_budget is not None and time.perf_counter() - started > self.time_budget:
+            self.stats['stop_reason'] = 'time_budget'
+        return self.stats['stop_reason'] is not None
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yields:
+            Tuple[int, np.ndarray]: Frame index and the decoded BGR frame.
+        """
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            raise RuntimeError(f"Failed to open video {self.video_path}")
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if self.end_frame is not None and frame_count > 0:
+            frame_count = min(frame_count, self.end_frame)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        use_seek = self.mode == 'seek' or (self.mode == 'auto' and self.stride >= self.seek_min_stride)
+        # Seeking needs a known length and frame rate to compute timestamps
+        if use_seek and (frame_count <= 0 or fps <= 0):
+            use_seek = False
+        self.stats['mode'] = 'seek' if use_seek else 'grab'
+        started = time.perf_counter()
+        try:
+            samples = self._seek(cap, frame_count, fps, started) if use_seek else self._grab(cap, started)
+            for frame_idx, frame in samples:
+                self.stats['sampled'] += 1
+                self.stats['elapsed_seconds'] = time.perf_counter() - started
+                yield frame_idx, frame
+        finally:
+            cap.release()
+            self.stats['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+
+    def _grab(self, cap: cv2.VideoCapture, started: float) -> Iterator[Tuple[int, np.ndarray]]:
+        frame_idx = 0
+        while not self._should_stop(started):
+            if self.end_frame is not None and frame_idx >= self.end_frame:
+                break
+            if frame_idx % self.stride == 0:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                yield frame_idx, frame
+            else:
+                if not cap.grab():
+                    break
+                self.stats['skipped'] += 1
+            frame_idx += 1
+
+    def _seek(self, cap: cv2.VideoCapture, frame_count: int, fps: float, started: float) -> Iterator[Tuple[int, np.ndarray]]:
+        positions = list(range(0, frame_count, self.stride))
+        for position_idx in coarse_to_fine_order(len(positions)):
+            if self._should_stop(started):
+                break
+            target = positions[position_idx]
+            cap.set(cv2.CAP_PROP_POS_MSEC, target * 1000.0 / fps)
+            self.stats['seeks'] += 1
+            ret, frame = cap.read()
+            if not ret:
+                continue
+            # Timestamp seeks land on the nearest decodable frame; report the frame actually read
+            frame_idx = int(cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1
+            yield frame_idx if frame_idx >= 0 else target, frame
+
+    def summary(self) -> Dict:
+        """Returns the sampling statistics."""
+        return dict(self.stats)
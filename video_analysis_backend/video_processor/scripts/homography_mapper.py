@@ -1,7 +1,8 @@
 import numpy as np
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Optional
 from abc import ABC, abstractmethod
 import cv2
+from .camera_motion import CameraMotionEstimator
 
 class AbstractMapper(ABC):
     """Abstract base class for mappers."""
@@ -93,22 +94,166 @@ def apply_homography(pos: Tuple[float, float], H: np.ndarray) -> Tuple[float, fl
     projected_pos /= projected_pos[2] if projected_pos[2] != 0 else 1
     return projected_pos[0], projected_pos[1]
 
+def apply_homography_batch(points: np.ndarray, H: np.ndarray) -> np.ndarray:
+    """
+    Apply a homography transformation to many 2D points at once.
+
+    Args:
+        points (np.ndarray): Array of shape (n, 2) with the (x, y) coordinates to project.
+        H (np.ndarray): The homography matrix of shape (3, 3).
+
+    Returns:
+        np.ndarray: Array of shape (n, 2) with the projected coordinates, as apply_homography
+            computes them point by point.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    projected = points @ H[:, :2].T.astype(np.float64) + H[:, 2].astype(np.float64)
+    w = projected[:, 2:3]
+    return projected[:, :2] / np.where(w != 0, w, 1)
+
+def feet_positions(xyxy: np.ndarray) -> np.ndarray:
+    """
+    Feet positions of many bounding boxes, as get_feet_pos computes them box by box.
+
+    Args:
+        xyxy (np.ndarray): Array of shape (n, 4) with (x1, y1, x2, y2) boxes.
+
+    Returns:
+        np.ndarray: Array of shape (n, 2) with (feet_x, feet_y); feet_y is truncated to an integer.
+    """
+    xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+    return np.stack([(xyxy[:, 0] + xyxy[:, 2]) / 2, np.trunc(xyxy[:, 3])], axis=1)
+
 class ObjectPositionMapper(AbstractMapper):
     """
     A class to map object positions from detected keypoints to a top-down view.
+
+    With a ``motion_estimator`` the mapper works incrementally: while the camera moves less
+    than ``motion_threshold`` pixels per frame, the last solved homography is carried over by
+    the estimated camera motion instead of being re-solved from the keypoints. A full re-solve
+    runs on larger motion, when motion tracking fails, and at least every ``max_reuse_frames``
+    frames so errors of the motion estimates cannot accumulate. ``stats`` counts both cases.
     """
-    def __init__(self, top_down_keypoints: np.ndarray, alpha: float = 0.9) -> None:
+    def __init__(
+        self,
+        top_down_keypoints: np.ndarray,
+        alpha: float = 0.9,
+        motion_estimator: Optional[CameraMotionEstimator] = None,
+        motion_threshold: float = 1.5,
+        max_reuse_frames: int = 10
+    ) -> None:
         """
         Initializes the ObjectPositionMapper.
 
         Args:
             top_down_keypoints (np.ndarray): An array of shape (n, 2) containing the top-down keypoints.
             alpha (float): Smoothing factor for homography smoothing.
+            motion_estimator (Optional[CameraMotionEstimator]): Camera motion estimator enabling
+                incremental homographies; project must then receive every frame.
+            motion_threshold (float): Largest per-frame camera motion, in frame pixels, for which
+                the homography is carried over instead of re-solved.
+            max_reuse_frames (int): Maximum number of consecutive frames without a re-solve.
         """
         super().__init__()
         self.top_down_keypoints = top_down_keypoints
         self.homography_smoother = HomographySmoother(alpha=alpha)
         self.last_valid_H = None
+        self.motion_estimator = motion_estimator
+        self.motion_threshold = motion_threshold
+        self.max_reuse_frames = max_reuse_frames
+        self.stats = {'frames': 0, 'resolves': 0, 'propagated': 0}
+        self._solved_H = None  # Unsmoothed homography of the last frame, when it came from enough keypoints
+        self._motion_since_solved = None  # Camera motion from that frame to the current one
+        self._frames_since_resolve = 0
+
+    def reset(self) -> None:
+        """
+        Start over after frames were skipped: the smoothed and carried-over homographies belong
+        to a view that may have changed. The last valid homography stays as the fallback.
+        """
+        self.homography_smoother.smoothed_H = None
+        self._solved_H = None
+        self._motion_since_solved = None
+        self._frames_since_resolve = 0
+        if self.motion_estimator is not None:
+            self.motion_estimator.reset()
+
+    def _observe_motion(self, frame: Optional[np.ndarray], camera_motion: Optional[Tuple]) -> None:
+        """Accumulate the camera motion since the frame of the last homography."""
+        if self.motion_estimator is None:
+            return
+        if camera_motion is not None:
+            motion, magnitude = camera_motion
+        elif frame is not None:
+            motion, magnitude = self.motion_estimator.update(frame), self.motion_estimator.magnitude
+        else:
+            return
+        small_motion = motion is not None and magnitude < self.motion_threshold
+        if small_motion and self._motion_since_solved is not None:
+            self._motion_since_solved = motion @ self._motion_since_solved
+            self._frames_since_resolve += 1
+        else:
+            self._motion_since_solved = None
+
+    def _frame_homography(self, keypoints: Dict) -> Optional[np.ndarray]:
+        """Compute the homography of a frame and advance the smoother; None when there is none."""
+        self.stats['frames'] += 1
+        if (self._solved_H is not None and self._motion_since_solved is not None
+                and self._frames_since_resolve <= self.max_reuse_frames):
+            # A point of this frame maps back to the solved frame by the inverse camera motion
+            H = self._solved_H @ np.linalg.inv(self._motion_since_solved)
+            self._solved_H = H
+            self._motion_since_solved = np.eye(3)
+            self.stats['propagated'] += 1
+            return self.homography_smoother.smooth(H)
+
+        self.stats['resolves'] += 1
+        self._frames_since_resolve = 0
+        try:
+            H = get_homography(keypoints, self.top_down_keypoints)
+            self.last_valid_H = H
+        except Exception as e:
+            print(f"Error computing homography: {e}")
+            if self.last_valid_H is None:
+                return None
+            H = self.last_valid_H
+        enough_keypoints = sum(1 for key in keypoints if key < len(self.top_down_keypoints)) >= 4
+        self._solved_H = H if enough_keypoints and self.motion_estimator is not None else None
+        self._motion_since_solved = np.eye(3) if self._solved_H is not None else None
+        return self.homography_smoother.smooth(H)
+
+    def project(
+        self,
+        keypoints: Dict,
+        xyxy: np.ndarray,
+        frame: Optional[np.ndarray] = None,
+        camera_motion: Optional[Tuple] = None
+    ) -> np.ndarray:
+        """
+        Project the feet of all boxes of a frame to the top-down view.
+
+        The homography is computed and smoothed once per call, so call it once per frame
+        with every box to project (players, referees and the ball).
+
+        Args:
+            keypoints (Dict): Keypoints of the frame, keyed by keypoint ID with 'coords' values.
+            xyxy (np.ndarray): Array of shape (n, 4) with the boxes to project.
+            frame (Optional[np.ndarray]): The frame itself, needed by the motion estimator.
+            camera_motion (Optional[Tuple]): (motion, magnitude) already estimated for this frame,
+                e.g. by the keypoint scheduler; used instead of running the motion estimator.
+
+        Returns:
+            np.ndarray: Array of shape (n, 2) aligned with ``xyxy``; rows are NaN when the frame
+                has no keypoints or no homography could be computed.
+        """
+        self._observe_motion(frame, camera_motion)
+        projections = np.full((len(xyxy), 2), np.nan)
+        if not keypoints or len(xyxy) == 0:
+            return projections
+        smoothed_H = self._frame_homography(keypoints)
+        if smoothed_H is not None:
+            projections[:] = apply_homography_batch(feet_positions(xyxy), smoothed_H)
+        return projections
 
     def map(self, detection: Dict) -> Dict:
         """
@@ -125,32 +270,15 @@ class ObjectPositionMapper(AbstractMapper):
             keypoints = detection.get('keypoints', {})
             object_data = detection.get('object', {})
 
-            if not keypoints or not object_data:
+            tracks = [(track_id, track_info) for track_id, track_info in object_data.items()
+                      if isinstance(track_info, dict) and 'bbox' in track_info]
+            if not keypoints or not tracks:
                 return detection
 
-            try:
-                H = get_homography(keypoints, self.top_down_keypoints)
-                self.last_valid_H = H
-            except Exception as e:
-                print(f"Error computing homography: {e}")
-                if self.last_valid_H is not None:
-                    H = self.last_valid_H
-                else:
-                    return detection
-
-            smoothed_H = self.homography_smoother.smooth(H)
-
-            for track_id, track_info in object_data.items():
-                if not isinstance(track_info, dict) or 'bbox' not in track_info:
-                    continue
-                from .utils import get_feet_pos
-                bbox = track_info['bbox']
-                feet_pos = get_feet_pos(bbox)
-                try:
-                    projected_pos = apply_homography(feet_pos, smoothed_H)
-                    track_info['projection'] = projected_pos
-                except Exception as e:
-                    print(f"Error applying homography to object {track_id}: {e}")
+            projections = self.project(keypoints, np.array([track_info['bbox'] for _, track_info in tracks]))
+            for (track_id, track_info), projected_pos in zip(tracks, projections):
+                if not np.isnan(projected_pos[0]):
+                    track_info['projection'] = (projected_pos[0], projected_pos[1])
 
             return detection
         except Exception as e:
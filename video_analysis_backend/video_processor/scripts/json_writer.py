@@ -1,9 +1,20 @@
 import os
 import json
+import struct
 import numpy as np
-from typing import Any, List
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
 from abc import ABC, abstractmethod
 
+INDEX_ENTRY = struct.Struct('<Q')  # One little-endian uint64 byte offset per record
+
+def stream_path_for(json_path: str) -> str:
+    """Returns the newline-delimited stream path that backs a legacy track JSON path."""
+    return f"{os.path.splitext(json_path)[0]}.ndjson"
+
+def index_path_for(json_path: str) -> str:
+    """Returns the record offset index path that belongs to a legacy track JSON path."""
+    return f"{os.path.splitext(json_path)[0]}.idx"
+
 class AbstractWriter(ABC):
     """Abstract base class for writers."""
     @abstractmethod
@@ -16,6 +27,11 @@ class JsonWriter(AbstractWriter):
 
     This class manages writing object tracks, keypoint tracks, and match summary data to
     separate JSON files, ensuring all data is serialized properly.
+
+    In streaming mode each track record is appended as one line to a ``.ndjson`` file
+    through a buffered handle, and its byte offset is appended to a ``.idx`` file, so the
+    cost of a write does not depend on how many frames were written before it. The
+    legacy JSON array can be produced from the stream once in ``close``.
     """
 
     def __init__(
@@ -24,7 +40,10 @@ class JsonWriter(AbstractWriter):
         summary_dir: str = 'output',
         object_fname: str = 'object_tracks',
         keypoints_fname: str = 'keypoint_tracks',
-        summary_fname: str = 'match_summary'
+        summary_fname: str = 'match_summary',
+        stream: bool = False,
+        flush_every: int = 250,
+        buffer_size: int = 1 << 20
     ) -> None:
         """
         Initializes the JsonWriter.
@@ -35,6 +54,10 @@ class JsonWriter(AbstractWriter):
             object_fname (str): Filename for object tracks (without extension).
             keypoints_fname (str): Filename for keypoint tracks (without extension).
             summary_fname (str): Filename for match summary (without extension).
+            stream (bool): Append track records to newline-delimited files instead of
+                rewriting the JSON array on every write.
+            flush_every (int): Number of records between explicit flushes in streaming mode.
+            buffer_size (int): Write buffer size in bytes for the streaming file handles.
         """
         super().__init__()
         self.save_dir = save_dir
@@ -42,10 +65,18 @@ class JsonWriter(AbstractWriter):
         self.obj_path = os.path.join(self.save_dir, f'{object_fname}.json')
         self.kp_path = os.path.join(self.save_dir, f'{keypoints_fname}.json')
         self.summary_path = os.path.join(self.summary_dir, f'{summary_fname}.json')
+        self.stream = stream
+        self.flush_every = max(1, flush_every)
+        self.buffer_size = buffer_size
+        self._streams: Dict[str, Dict[str, Any]] = {}
 
         # Ensure directories exist and remove existing files
         self._initialize_directories()
 
+        if self.stream:
+            for path in [self.obj_path, self.kp_path]:
+                self._streams[path] = self._open_stream(path)
+
     def _initialize_directories(self) -> None:
         """
         Initialize directories and remove existing JSON files if they exist.
@@ -56,8 +87,33 @@ class JsonWriter(AbstractWriter):
                 os.makedirs(directory)
                 print(f"Created directory: {directory}")
 
-        # Remove existing JSON files
-        self._remove_existing_files(files=[self.obj_path, self.kp_path, self.summary_path])
+        # Remove existing JSON files and any streams left behind by a previous run
+        self._remove_existing_files(files=[
+            self.obj_path, self.kp_path, self.summary_path,
+            stream_path_for(self.obj_path), index_path_for(self.obj_path),
+            stream_path_for(self.kp_path), index_path_for(self.kp_path)
+        ])
+
+    def _open_stream(self, json_path: str) -> Dict[str, Any]:
+        """
+        Open the buffered data and index handles for a track file in streaming mode.
+
+        Args:
+            json_path (str): Legacy JSON path of the track file.
+
+        Returns:
+            Dict[str, Any]: Handles, paths and counters for the stream.
+        """
+        data_path = stream_path_for(json_path)
+        idx_path = index_path_for(json_path)
+        return {
+            'data_path': data_path,
+            'index_path': idx_path,
+            'data': open(data_path, 'wb', buffering=self.buffer_size),
+            'index': open(idx_path, 'wb', buffering=self.buffer_size),
+            'offset': 0,
+            'records': 0
+        }
 
     def _remove_existing_files(self, files: List[str]) -> None:
         """
@@ -107,6 +163,7 @@ class JsonWriter(AbstractWriter):
         Write data to a JSON file.
 
         If the file already exists, new data is appended for tracks; for summaries, it overwrites.
+        In streaming mode track data is appended to the track stream instead.
 
         Args:
             filename (str): The name of the file to save data.
@@ -116,6 +173,10 @@ class JsonWriter(AbstractWriter):
             # Convert data to a serializable format
             serializable_data = self._make_serializable(data)
 
+            if filename in self._streams:
+                self._append_record(self._streams[filename], serializable_data)
+                return
+
             if filename in [self.obj_path, self.kp_path] and os.path.exists(filename):
                 # Append for track files
                 with open(filename, 'r') as f:
@@ -133,6 +194,115 @@ class JsonWriter(AbstractWriter):
         except Exception as e:
             print(f"Error writing to {filename}: {e}")
 
+    def _append_record(self, stream: Dict[str, Any], record: Any) -> None:
+        """
+        Append one serialized record and its byte offset to a track stream.
+
+        Args:
+            stream (Dict[str, Any]): Stream state returned by _open_stream.
+            record (Any): JSON-serializable record.
+        """
+        line = json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+        stream['index'].write(INDEX_ENTRY.pack(stream['offset']))
+        stream['data'].write(line)
+        stream['offset'] += len(line)
+        stream['records'] += 1
+        if stream['records'] % self.flush_every == 0:
+            stream['data'].flush()
+            stream['index'].flush()
+
+    def close(self, legacy_json: bool = True, object_record_fn: Optional[Callable[[Any], Any]] = None) -> None:
+        """
+        Finish the track streams.
+
+        Writes the end-of-data offset as the index footer, so record ``i`` spans
+        ``offsets[i]:offsets[i + 1]``, and optionally converts each stream into the
+        legacy JSON array at the original track path.
+
+        Args:
+            legacy_json (bool): Also write the legacy JSON array files.
+            object_record_fn (Optional[Callable[[Any], Any]]): Applied to every object tracks
+                record before the legacy array is written, to correct records already streamed.
+        """
+        for json_path, stream in list(self._streams.items()):
+            try:
+                stream['index'].write(INDEX_ENTRY.pack(stream['offset']))
+                stream['data'].close()
+                stream['index'].close()
+                print(f"Wrote {stream['records']} records to {stream['data_path']}")
+                if object_record_fn is not None and json_path == self.obj_path:
+                    self._rewrite_stream(stream['data_path'], stream['index_path'], object_record_fn)
+                if legacy_json:
+                    self._write_legacy_array(stream['data_path'], json_path)
+            except Exception as e:
+                print(f"Error closing stream for {json_path}: {e}")
+            finally:
+                del self._streams[json_path]
+
+    def abort(self) -> None:
+        """
+        Close the track streams without finishing them and remove the track files written
+        so far, so a failed run does not leave records behind that look like finished tracks.
+        """
+        for stream in self._streams.values():
+            stream['data'].close()
+            stream['index'].close()
+        self._streams.clear()
+        paths = []
+        for json_path in [self.obj_path, self.kp_path]:
+            data_path, idx_path = stream_path_for(json_path), index_path_for(json_path)
+            paths += [json_path, data_path, idx_path, f"{data_path}.tmp", f"{idx_path}.tmp"]
+        self._remove_existing_files(files=paths)
+
+    def _rewrite_stream(self, data_path: str, index_path: str, record_fn: Callable[[Any], Any]) -> None:
+        """
+        Pass every record of a finished stream through ``record_fn`` and rebuild its index.
+
+        Args:
+            data_path (str): Path of the ``.ndjson`` stream.
+            index_path (str): Path of the stream's offset index.
+            record_fn (Callable[[Any], Any]): Returns the record to store in place of the given one.
+        """
+        tmp_data_path, tmp_index_path = f"{data_path}.tmp", f"{index_path}.tmp"
+        offset = 0
+        with open(data_path, 'rb') as src, \
+                open(tmp_data_path, 'wb', buffering=self.buffer_size) as dst, \
+                open(tmp_index_path, 'wb', buffering=self.buffer_size) as index:
+            for line in src:
+                if not line.strip():
+                    continue
+                record = record_fn(json.loads(line))
+                new_line = json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+                index.write(INDEX_ENTRY.pack(offset))
+                dst.write(new_line)
+                offset += len(new_line)
+            index.write(INDEX_ENTRY.pack(offset))
+        os.replace(tmp_data_path, data_path)
+        os.replace(tmp_index_path, index_path)
+        print(f"Rewrote records of {data_path}")
+
+    def _write_legacy_array(self, data_path: str, json_path: str) -> None:
+        """
+        Convert a newline-delimited track stream into a JSON array without loading it.
+
+        Args:
+            data_path (str): Path of the ``.ndjson`` stream.
+            json_path (str): Path of the JSON array to write.
+        """
+        with open(data_path, 'rb') as src, open(json_path, 'wb', buffering=self.buffer_size) as dst:
+            dst.write(b'[')
+            first = True
+            for line in src:
+                line = line.rstrip(b'\n')
+                if not line:
+                    continue
+                if not first:
+                    dst.write(b',\n')
+                dst.write(line)
+                first = False
+            dst.write(b']')
+        print(f"Wrote legacy JSON array to {json_path}")
+
     def _make_serializable(self, obj: Any) -> Any:
         """
         Recursively convert objects to a JSON-serializable format.
@@ -175,4 +345,69 @@ class JsonWriter(AbstractWriter):
 
     def get_summary_path(self) -> str:
         """Returns the path for the match summary JSON file."""
-        return self.summary_path
\ No newline at end of file
+        return self.summary_path
+
+
+class TrackStreamReader:
+    """
+    Random-access reader for track streams written by JsonWriter in streaming mode.
+
+    Record ``i`` (the frame index for per-frame tracks) is located through the ``.idx``
+    file, so reading a range only touches the index entries and bytes of that range.
+    """
+
+    def __init__(self, json_path: str) -> None:
+        """
+        Initializes the TrackStreamReader.
+
+        Args:
+            json_path (str): Legacy JSON path of the track file.
+        """
+        self.data_path = stream_path_for(json_path)
+        self.index_path = index_path_for(json_path)
+        if not os.path.exists(self.data_path) or not os.path.exists(self.index_path):
+            raise FileNotFoundError(f"No track stream found for {json_path}")
+        # The index holds one offset per record plus the end-of-data footer
+        self.num_records = max(0, os.path.getsize(self.index_path) // INDEX_ENTRY.size - 1)
+
+    def _read_offsets(self, index_file: BinaryIO, start: int, count: int) -> List[int]:
+        """Read ``count`` consecutive offsets from the index, starting at record ``start``."""
+        index_file.seek(start * INDEX_ENTRY.size)
+        raw = index_file.read(count * INDEX_ENTRY.size)
+        return [entry[0] for entry in INDEX_ENTRY.iter_unpack(raw)]
+
+    def read_raw(self, start: int, end: Optional[int] = None) -> List[bytes]:
+        """
+        Read the serialized records in ``[start, end)`` without decoding them.
+
+        Args:
+            start (int): First record index.
+            end (Optional[int]): Record index to stop before; defaults to the end.
+
+        Returns:
+            List[bytes]: One JSON document per record.
+        """
+        end = self.num_records if end is None else min(end, self.num_records)
+        start = max(0, start)
+        if start >= end:
+            return []
+        with open(self.index_path, 'rb') as index_file:
+            offsets = self._read_offsets(index_file, start, end - start + 1)
+        with open(self.data_path, 'rb') as data_file:
+            data_file.seek(offsets[0])
+            blob = data_file.read(offsets[-1] - offsets[0])
+        base = offsets[0]
+        return [blob[offsets[i] - base:offsets[i + 1] - base].rstrip(b'\n') for i in range(len(offsets) - 1)]
+
+    def read(self, start: int, end: Optional[int] = None) -> List[Any]:
+        """
+        Read and decode the records in ``[start, end)``.
+
+        Args:
+            start (int): First record index.
+            end (Optional[int]): Record index to stop before; defaults to the end.
+
+        Returns:
+            List[Any]: Decoded records.
+        """
+        return [json.loads(raw) for raw in self.read_raw(start, end)]
\ No newline at end of file
@@ -1,24 +1,53 @@
 from ultralytics import YOLO
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+from .camera_motion import CameraMotionEstimator
 
 keypoint_history = {}  # Global dictionary to store keypoint history
 
 class KeypointsTracker:
-    def __init__(self, model_path: str, conf: float = 0.3, kp_conf: float = 0.7):
+    def __init__(self, model_path: Optional[str] = None, conf: float = 0.3, kp_conf: float = 0.7, model: Optional[YOLO] = None):
         """
         Initializes the KeypointsTracker.
 
         Args:
-            model_path (str): Path to the YOLO model for keypoint detection.
+            model_path (Optional[str]): Path to the YOLO model for keypoint detection, used when no model is given.
             conf (float): Confidence threshold for detections.
             kp_conf (float): Confidence threshold for keypoints.
+            model (Optional[YOLO]): Already loaded keypoint model, e.g. shared through the model registry.
         """
-        self.model = YOLO(model_path)
+        if model is None:
+            if model_path is None:
+                raise ValueError("KeypointsTracker needs either a model or a model_path")
+            model = YOLO(model_path)
+        self.model = model
         self.conf = conf
         self.kp_conf = kp_conf
         self.tracker_id = 0
 
+    def _parse_result(self, result) -> List[Dict]:
+        """
+        Convert one YOLO pose result into the keypoint dictionaries used downstream.
+
+        Args:
+            result: Ultralytics result for one frame.
+
+        Returns:
+            List[Dict]: Keypoints above the keypoint confidence threshold.
+        """
+        keypoints = []
+        if result.keypoints is not None:
+            xy = result.keypoints.xy.cpu().numpy()
+            conf = result.keypoints.conf.cpu().numpy()
+            for set_idx, kp_set in enumerate(xy):
+                for i in np.flatnonzero(conf[set_idx] >= self.kp_conf):
+                    keypoints.append({
+                        'id': int(i),
+                        'coords': (float(kp_set[i][0]), float(kp_set[i][1])),
+                        'confidence': float(conf[set_idx][i])
+                    })
+        return keypoints
+
     def detect(self, frame: np.ndarray) -> List[Dict]:
         """
         Detect keypoints in a frame.
@@ -31,21 +60,34 @@ class KeypointsTracker:
         """
         try:
             results = self.model(frame, conf=self.conf)
-            keypoints = []
-            if results[0].keypoints is not None:
-                for kp_set in results[0].keypoints.xy:
-                    for i, kp in enumerate(kp_set):
-                        if results[0].keypoints.conf[0][i] >= self.kp_conf:
-                            keypoints.append({
-                                'id': i,
-                                'coords': (float(kp[0]), float(kp[1])),
-                                'confidence': float(results[0].keypoints.conf[0][i])
-                            })
-            return keypoints
+            return self._parse_result(results[0])
         except Exception as e:
             print(f"Error in KeypointsTracker.detect: {e}")
             return []
 
+    def detect_batch(self, frames: List[np.ndarray], raise_errors: bool = False) -> List[List[Dict]]:
+        """
+        Detect keypoints in a micro-batch of frames with one model call.
+
+        Args:
+            frames (List[np.ndarray]): Input frames, all at the same resolution.
+            raise_errors (bool): Raise model errors instead of returning no keypoints, e.g. so
+                that a failed call is not cached as a frame without keypoints.
+
+        Returns:
+            List[List[Dict]]: Detected keypoints per frame, in input order.
+        """
+        if not frames:
+            return []
+        try:
+            results = self.model(list(frames), conf=self.conf)
+            return [self._parse_result(result) for result in results]
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"Error in KeypointsTracker.detect_batch: {e}")
+            return [[] for _ in frames]
+
     def track(self, detections: List[Dict], frame_idx: int) -> List[Dict]:
         """
         Track keypoints across frames (simple ID assignment for now).
@@ -63,9 +105,150 @@ class KeypointsTracker:
                 kp_id = kp['id']
                 keypoint_history[frame_idx][kp_id] = {
                     'coords': kp['coords'],
-                    'confidence': kp['confidence']
+                    'confidence': kp['confidence'],
+                    'source': kp.get('source', 'detected')
                 }
             return detections
         except Exception as e:
             print(f"Error in KeypointsTracker.track: {e}")
-            return []
\ No newline at end of file
+            return []
+
+class KeypointScheduler:
+    """
+    Decides per frame whether to run keypoint detection or to propagate the last detected
+    keypoints by the estimated camera motion.
+
+    Detection runs at least every ``interval`` frames, and immediately when the camera moves
+    faster than ``motion_threshold`` pixels per frame or motion tracking fails. Each detection
+    is compared with the keypoints propagated to the same frame: a reprojection error above
+    ``error_threshold`` halves the interval, a smaller one lets it grow by one frame up to
+    ``max_interval``.
+
+    Frames are planned a micro-batch at a time: ``plan`` estimates the motion of each frame and
+    returns which frames to detect, ``resolve`` takes the detections of those frames and returns
+    the keypoints of every frame, each marked with 'source' 'detected' or 'propagated'.
+    """
+
+    def __init__(
+        self,
+        motion_estimator: CameraMotionEstimator,
+        coord_scale: Tuple[float, float] = (1.0, 1.0),
+        max_interval: int = 10,
+        motion_threshold: float = 4.0,
+        error_threshold: float = 3.0
+    ) -> None:
+        """
+        Initializes the KeypointScheduler.
+
+        Args:
+            motion_estimator (CameraMotionEstimator): Estimator fed with the frames at the processing resolution.
+            coord_scale (Tuple[float, float]): Keypoint-model coordinates per processing-resolution pixel.
+            max_interval (int): Largest number of frames between detections.
+            motion_threshold (float): Per-frame camera motion, in processing pixels, that forces a detection.
+            error_threshold (float): Reprojection error, in processing pixels, above which the interval shrinks.
+        """
+        self.motion_estimator = motion_estimator
+        self.scale = np.diag([coord_scale[0], coord_scale[1], 1.0])
+        self.pixel_scale = (coord_scale[0] + coord_scale[1]) / 2
+        self.max_interval = max_interval
+        self.motion_threshold = motion_threshold
+        self.error_threshold = error_threshold
+        self.interval = max_interval
+        self.stats = {'detected': 0, 'propagated': 0, 'forced_by_motion': 0, 'interval_shrinks': 0}
+        self.frame_motions = []  # (motion, magnitude) of each frame of the last planned batch
+        self._planned = []  # (detect, motion since the last detection in keypoint-model coordinates) per frame
+        self._frames_since_detection = None
+        self._motion_since_detection = None
+        self._last_keypoints = None
+
+    def reset(self) -> None:
+        """Forget the last detection and the previous frame, e.g. after frames were skipped."""
+        self.motion_estimator.reset()
+        self._frames_since_detection = None
+        self._motion_since_detection = None
+        self._last_keypoints = None
+
+    def plan(self, frames: List[np.ndarray]) -> List[bool]:
+        """
+        Estimate the camera motion of the next frames and choose the frames to detect.
+
+        Args:
+            frames (List[np.ndarray]): Consecutive frames at the processing resolution.
+
+        Returns:
+            List[bool]: Whether to run keypoint detection, per frame.
+        """
+        self.frame_motions = []
+        self._planned = []
+        detect_flags = []
+        for frame in frames:
+            motion = self.motion_estimator.update(frame)
+            magnitude = self.motion_estimator.magnitude
+            self.frame_motions.append((motion, magnitude))
+            if motion is not None and self._motion_since_detection is not None:
+                self._motion_since_detection = self.scale @ motion @ np.linalg.inv(self.scale) @ self._motion_since_detection
+            else:
+                self._motion_since_detection = None
+            fast = magnitude is not None and magnitude > self.motion_threshold
+            detect = (self._frames_since_detection is None or self._motion_since_detection is None or fast
+                      or self._frames_since_detection + 1 >= self.interval)
+            if detect and fast:
+                self.stats['forced_by_motion'] += 1
+            self._planned.append((detect, self._motion_since_detection))
+            if detect:
+                self._frames_since_detection = 0
+                self._motion_since_detection = np.eye(3)
+            else:
+                self._frames_since_detection += 1
+            detect_flags.append(detect)
+        return detect_flags
+
+    def _propagate(self, motion: np.ndarray) -> List[Dict]:
+        coords = np.array([kp['coords'] for kp in self._last_keypoints], dtype=np.float64).reshape(-1, 2)
+        moved = coords @ motion[:2, :2].T + motion[:2, 2]
+        return [
+            {'id': kp['id'], 'coords': (float(x), float(y)), 'confidence': kp['confidence'], 'source': 'propagated'}
+            for kp, (x, y) in zip(self._last_keypoints, moved)
+        ]
+
+    def _update_interval(self, detected: List[Dict], predicted: List[Dict]) -> None:
+        predicted_by_id = {kp['id']: kp['coords'] for kp in predicted}
+        errors = [np.hypot(kp['coords'][0] - predicted_by_id[kp['id']][0], kp['coords'][1] - predicted_by_id[kp['id']][1])
+                  for kp in detected if kp['id'] in predicted_by_id]
+        if len(errors) < 2:
+            return
+        if np.median(errors) / self.pixel_scale > self.error_threshold:
+            self.interval = max(1, self.interval // 2)
+            self.stats['interval_shrinks'] += 1
+        else:
+            self.interval = min(self.max_interval, self.interval + 1)
+
+    def resolve(self, detections: List[List[Dict]]) -> List[List[Dict]]:
+        """
+        Combine the detections of the planned frames with propagated keypoints for the others.
+
+        Args:
+            detections (List[List[Dict]]): Keypoints of the frames plan chose to detect, in order.
+
+        Returns:
+            List[List[Dict]]: Keypoints of every planned frame, in keypoint-model coordinates.
+        """
+        detections = iter(detections)
+        keypoints_per_frame = []
+        for detect, motion in self._planned:
+            if detect:
+                keypoints = [dict(kp, source='detected') for kp in next(detections)]
+                if self._last_keypoints is not None and motion is not None:
+                    self._update_interval(keypoints, self._propagate(motion))
+                self._last_keypoints = keypoints
+                self.stats['detected'] += 1
+            else:
+                keypoints = self._propagate(motion)
+                self.stats['propagated'] += 1
+            keypoints_per_frame.append(keypoints)
+        self._planned = []
+        return keypoints_per_frame
+
+    def summary(self) -> Dict:
+        """Returns the detection statistics and the current interval."""
+        return {**self.stats, 'interval': self.interval}
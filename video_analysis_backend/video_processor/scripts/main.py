@@ -1,69 +1,335 @@
 import os
+import json
 import cv2
 import torch
 import supervision as sv
-from ultralytics import YOLO
 import numpy as np
-from collections import deque, defaultdict
 from tqdm import tqdm
-import gc
 import shutil
-from .team_classification import TeamClassifier
-from .annotation import draw_player_stats, draw_possession_bar, draw_goal_overlay
-from .tracking_detection import detect_players_and_ball, track_and_assign_teams, resolve_goalkeepers_team_id, track_history
-from .keypoints_detection import KeypointsTracker, keypoint_history
+import tempfile
+from .team_classification import TeamClassifier, TrackTeamCache
+from .tracking_detection import (detect_players_and_ball_batch, track_and_assign_teams, track_history, DetectionScheduler,
+                                 BallRoiDetector)
+from .keypoints_detection import KeypointsTracker, KeypointScheduler, keypoint_history
 from .homography_mapper import ObjectPositionMapper
+from .camera_motion import CameraMotionEstimator
+from .scene_gate import SceneGate, non_pitch_frames
 from .projection import ProjectionAnnotator
-from .utils import clean_ball_path, smooth_positions, get_feet_pos
 from .json_writer import JsonWriter
+from .model_registry import model_registry
+from .track_store import TrackStoreWriter, TrackStoreReader, rows_from_frame_tracks, reconcile_track_teams, BALL_TRACKER_ID, CLASS_ID_TO_NAME
+from .analysis import MatchAnalyzer, analyze_track_store, BALL_CLASS_ID, GOALKEEPER_ID, PLAYER_ID, REFEREE_ID
+from .rendering import render_frame, render_passthrough
+from .pipeline import Pipeline, PipelineStage, format_pipeline_report
+from .frame_sampler import FrameSampler
+from .detection_cache import (open_detection_caches, file_digest, detections_to_arrays, arrays_to_detections,
+                              keypoints_to_arrays, arrays_to_keypoints)
 
-def is_shot_taken(ball_projection, prev_ball_projection, player_team, frame_idx):
+OUTPUT_KINDS = ('summary', 'tracks', 'video')  # Artifacts main_processing can produce
+
+def decode_frames(cap, target_resolution, keep_source=False):
     """
-    Check if a shot is taken based on ball trajectory toward goal
-    
+    Read frames from a capture and resize them to the processing resolution.
+
+    Args:
+        cap: Opened cv2.VideoCapture
+        target_resolution: Resolution frames are processed at
+        keep_source: Also pass the native-resolution frame on as 'source_frame'
+
+    Yields:
+        Dict: Pipeline payload with 'frame_idx' and 'frame'
+    """
+    frame_idx = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            print(f"Reached end of video at frame {frame_idx}")
+            return
+        item = {'frame_idx': frame_idx, 'frame': cv2.resize(frame, target_resolution, interpolation=cv2.INTER_AREA)}
+        if keep_source:
+            item['source_frame'] = frame
+        yield item
+        frame_idx += 1
+
+def save_event_frames(summary, events_dir, staged_dir, input_video_path, target_resolution):
+    """
+    Write one frame per goal and shot of the final summary, named after the event, team and frame.
+
+    Frames staged during the main pass are copied into place; events that only the final
+    analysis found (after track teams were reconciled) are read back from the input video.
+
     Args:
-        ball_projection: Current ball position
-        prev_ball_projection: Previous ball position
-        player_team: Team of the player closest to the ball
-        frame_idx: Current frame index
-        
+        summary: Final match summary
+        events_dir: Directory for the event frames
+        staged_dir: Directory with the frames staged as '<frame_idx>.jpg'; removed afterwards
+        input_video_path: Path to the input video
+        target_resolution: Resolution frames were processed at
+    """
+    events = [('goal', event) for event in summary.get('goals', [])] + [('shot', event) for event in summary.get('shots', [])]
+    cap = None
+    try:
+        for kind, event in sorted(events, key=lambda entry: entry[1]['frame']):
+            frame_idx = event['frame']
+            event_filename = os.path.join(events_dir, f"{kind}_{event['team']}_{frame_idx}.jpg")
+            staged_filename = os.path.join(staged_dir, f"{frame_idx}.jpg")
+            if os.path.exists(staged_filename):
+                shutil.copyfile(staged_filename, event_filename)
+                continue
+            if cap is None:
+                cap = cv2.VideoCapture(input_video_path)
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = cap.read()
+            if not ret:
+                print(f"⚠️ Could not read frame {frame_idx} for the {kind} event frame")
+                continue
+            cv2.imwrite(event_filename, cv2.resize(frame, target_resolution, interpolation=cv2.INTER_AREA))
+    finally:
+        if cap is not None:
+            cap.release()
+        shutil.rmtree(staged_dir, ignore_errors=True)
+
+def detect_keypoints(frames, kp_tracker, keypoint_detection_resolution, frame_indices=None, keypoint_cache=None):
+    """
+    Run the keypoint model once on a micro-batch of frames, reading through the keypoint cache.
+
+    Args:
+        frames: Frames at the processing resolution
+        kp_tracker: KeypointsTracker for pitch keypoints
+        keypoint_detection_resolution: Input resolution of the keypoint model
+        frame_indices: Frame index of each frame, required with a cache
+        keypoint_cache: DetectionCache of keypoint model outputs; failed model calls are not cached
+
     Returns:
-        bool: True if shot detected
+        List[List[Dict]]: Keypoints per frame in keypoint-model coordinates
     """
-    if ball_projection is None or prev_ball_projection is None:
-        return False
-    
-    x, y = ball_projection
-    prev_x, prev_y = prev_ball_projection
-    
-    # Calculate direction vector and velocity
-    dx = x - prev_x
-    dy = y - prev_y
-    velocity = np.sqrt(dx*dx + dy*dy)
-    
-    # Check if ball is moving toward goals with sufficient velocity
-    if velocity < 3:  # Minimum velocity threshold
-        return False
-        
-    # Left goal (Team B defends)
-    if player_team == "Team A" and dx < -2:  # Moving toward left goal
-        # Distance to left goal center
-        distance_to_goal = np.sqrt((x - 32)**2 + (y - 176)**2)
-        # Check if ball is heading toward goal within a reasonable angle and distance
-        if distance_to_goal < 150 and abs(dy) < abs(dx) * 0.8:  # Angle constraint
-            print(f"Frame {frame_idx}: Shot detected from Team A toward left goal")
-            return True
-    
-    # Right goal (Team A defends)
-    if player_team == "Team B" and dx > 2:  # Moving toward right goal
-        # Distance to right goal center
-        distance_to_goal = np.sqrt((x - 495)**2 + (y - 176)**2)
-        # Check if ball is heading toward goal within a reasonable angle and distance
-        if distance_to_goal < 150 and abs(dy) < abs(dx) * 0.8:  # Angle constraint
-            print(f"Frame {frame_idx}: Shot detected from Team B toward right goal")
-            return True
-    
-    return False
+    if keypoint_cache is None:
+        keypoint_inputs = [cv2.resize(f, keypoint_detection_resolution, interpolation=cv2.INTER_AREA) for f in frames]
+        return kp_tracker.detect_batch(keypoint_inputs)
+
+    keypoints_list = [None] * len(frames)
+    for i, frame_idx in enumerate(frame_indices):
+        cached = keypoint_cache.get(frame_idx)
+        if cached is not None:
+            keypoints_list[i] = arrays_to_keypoints(cached)
+    missing = [i for i, keypoints in enumerate(keypoints_list) if keypoints is None]
+    if missing:
+        keypoint_inputs = [cv2.resize(frames[i], keypoint_detection_resolution, interpolation=cv2.INTER_AREA) for i in missing]
+        try:
+            keypoint_outputs = kp_tracker.detect_batch(keypoint_inputs, raise_errors=True)
+        except Exception as e:
+            print(f"Error in KeypointsTracker.detect_batch: {e}")
+            keypoint_outputs = None
+        for position, i in enumerate(missing):
+            keypoints_list[i] = keypoint_outputs[position] if keypoint_outputs is not None else []
+            if keypoint_outputs is not None:
+                keypoint_cache.put(frame_indices[i], keypoints_to_arrays(keypoints_list[i]))
+    return keypoints_list
+
+def detect_objects(frames, player_model, player_detection_resolution, conf_threshold, ball_class_id,
+                   frame_indices=None, object_cache=None):
+    """
+    Run the player model once on a micro-batch of frames, reading through the object cache.
+
+    Args:
+        frames: Frames at the processing resolution
+        player_model: YOLO model for players, ball, goalkeepers and referees
+        player_detection_resolution: Input resolution of the player model
+        conf_threshold: Confidence threshold for player detections
+        ball_class_id: Class ID for the ball
+        frame_indices: Frame index of each frame, required with a cache
+        object_cache: DetectionCache of player model outputs; failed model calls are not cached
+
+    Returns:
+        List[sv.Detections]: Detections per frame in player-model coordinates
+    """
+    detections_list = [None] * len(frames)
+    if object_cache is not None:
+        for i, frame_idx in enumerate(frame_indices):
+            cached = object_cache.get(frame_idx)
+            if cached is not None:
+                detections_list[i] = arrays_to_detections(cached)
+    missing = [i for i, detections in enumerate(detections_list) if detections is None]
+    if missing:
+        player_inputs = [cv2.resize(frames[i], player_detection_resolution, interpolation=cv2.INTER_AREA) for i in missing]
+        for i, (detections, _, source) in zip(missing, detect_players_and_ball_batch(player_inputs, player_model, conf_threshold, ball_class_id)):
+            detections_list[i] = detections
+            if object_cache is not None and source != "none":
+                object_cache.put(frame_indices[i], detections_to_arrays(detections))
+    return detections_list
+
+def infer_batch(
+    frames,
+    player_model,
+    kp_tracker,
+    player_detection_resolution,
+    keypoint_detection_resolution,
+    conf_threshold,
+    ball_class_id,
+    frame_indices=None,
+    object_cache=None,
+    keypoint_cache=None,
+    keypoint_scheduler=None,
+    detection_scheduler=None,
+    ball_roi_detector=None,
+    source_frames=None
+):
+    """
+    Run the player and keypoint models once on a micro-batch of frames.
+
+    With caches, frames found in them skip inference (and the resize to the model input)
+    and new outputs are added to them; failed model calls are not cached. With a keypoint
+    scheduler, the keypoint model only runs on the frames the scheduler picks and the
+    keypoints of the other frames are propagated by the camera motion. Likewise, with a
+    detection scheduler the player model only runs on keyframes and the boxes of the other
+    frames are propagated by optical flow. With a ball ROI detector, frames still without a
+    confident ball are searched again in a crop of the native-resolution frame.
+
+    Args:
+        frames: Frames at the processing resolution
+        player_model: YOLO model for players, ball, goalkeepers and referees
+        kp_tracker: KeypointsTracker for pitch keypoints
+        player_detection_resolution: Input resolution of the player model
+        keypoint_detection_resolution: Input resolution of the keypoint model
+        conf_threshold: Confidence threshold for player detections
+        ball_class_id: Class ID for the ball
+        frame_indices: Frame index of each frame, required with caches and the ball ROI detector
+        object_cache: DetectionCache of player model outputs
+        keypoint_cache: DetectionCache of keypoint model outputs
+        keypoint_scheduler: KeypointScheduler choosing the frames to run keypoint detection on
+        detection_scheduler: DetectionScheduler choosing the keyframes to run the player model on
+        ball_roi_detector: BallRoiDetector searching the ball where the full-frame pass missed it
+        source_frames: The frames at native resolution, required with the ball ROI detector
+
+    Returns:
+        List[Tuple]: Per frame, (detections, ball_detections, keypoint detections) with detections
+            still in player-model coordinates and keypoints in keypoint-model coordinates
+    """
+    camera_motions = None
+    if keypoint_scheduler is None:
+        keypoints_list = detect_keypoints(frames, kp_tracker, keypoint_detection_resolution, frame_indices, keypoint_cache)
+    else:
+        selected = [i for i, detect in enumerate(keypoint_scheduler.plan(frames)) if detect]
+        camera_motions = keypoint_scheduler.frame_motions
+        detected = detect_keypoints(
+            [frames[i] for i in selected], kp_tracker, keypoint_detection_resolution,
+            [frame_indices[i] for i in selected] if frame_indices is not None else None, keypoint_cache
+        )
+        keypoints_list = keypoint_scheduler.resolve(detected)
+
+    keyframes = None
+    if detection_scheduler is None:
+        detections_list = detect_objects(frames, player_model, player_detection_resolution, conf_threshold,
+                                         ball_class_id, frame_indices, object_cache)
+    else:
+        keyframes = detection_scheduler.plan(frames, camera_motions)
+        selected = [i for i, detect in enumerate(keyframes) if detect]
+        detected = detect_objects(
+            [frames[i] for i in selected], player_model, player_detection_resolution, conf_threshold, ball_class_id,
+            [frame_indices[i] for i in selected] if frame_indices is not None else None, object_cache
+        )
+        detections_list = detection_scheduler.resolve(detected)
+    if ball_roi_detector is not None:
+        detections_list = ball_roi_detector.refine(detections_list, source_frames, frame_indices, player_detection_resolution,
+                                                   keyframes=keyframes)
+
+    return [(detections, detections[detections.class_id == ball_class_id], kp_detections)
+            for detections, kp_detections in zip(detections_list, keypoints_list)]
+
+def reconcile_record_teams(record, team_by_tracker, team_colors):
+    """
+    Apply reconciled track teams to one object tracks record.
+
+    Args:
+        record: Object tracks of one frame, keyed by class name and tracker ID
+        team_by_tracker: New team ID per tracker ID
+        team_colors: Colors for Team A and Team B
+
+    Returns:
+        Dict: The updated record
+    """
+    for class_name in ['player', 'goalkeeper']:
+        for tracker_id, info in record.get(class_name, {}).items():
+            team_id = team_by_tracker.get(int(tracker_id))
+            if team_id is not None:
+                info['team_id'] = team_id
+                info['team'] = 'Team A' if team_id == 0 else 'Team B'
+                info['club_color'] = list(team_colors[team_id])
+    return record
+
+def collect_team_crops(
+    input_video_path,
+    sampling_model,
+    team_samples_dir,
+    player_detection_resolution,
+    team_classification_stride,
+    player_class_id,
+    sampling_mode='auto',
+    time_budget=None,
+    target_crops=None,
+    min_sample_frames=1,
+    end_frame=None,
+    conf_threshold=0.3,
+    target_resolution=None,
+    detection_cache=None
+):
+    """
+    Collect player crops from every ``team_classification_stride``-th frame for team classification.
+
+    Skipped frames are never decoded into images (see FrameSampler). Collection stops early
+    once ``target_crops`` crops from at least ``min_sample_frames`` different frames are
+    collected, or when the time budget runs out. In 'seek' mode samples come in coarse-to-fine
+    order, so an early stop still covers the whole video; in 'grab' mode it covers a prefix.
+    ``end_frame`` limits sampling to the start of the video.
+
+    With a ``target_resolution`` frames go through the processing resolution before the
+    detection resolution, as in the main pass, so the detections can be shared with it
+    through ``detection_cache``.
+
+    Returns:
+        Tuple[List[np.ndarray], Dict]: Player crops and the sampler statistics
+    """
+    sampler = FrameSampler(input_video_path, team_classification_stride, mode=sampling_mode, time_budget=time_budget,
+                           end_frame=end_frame)
+    crops = []
+    frames_with_crops = 0
+    print("Collecting player crops for team classification...")
+    for frame_idx, frame in sampler:
+        crops_before = len(crops)
+        try:
+            cached = detection_cache.get(frame_idx) if detection_cache is not None else None
+            if cached is not None:
+                detections = arrays_to_detections(cached)
+            else:
+                frame_for_detection = frame
+                if target_resolution is not None:
+                    frame_for_detection = cv2.resize(frame_for_detection, target_resolution, interpolation=cv2.INTER_AREA)
+                frame_for_detection = cv2.resize(frame_for_detection, player_detection_resolution, interpolation=cv2.INTER_AREA)
+                results = sampling_model.predict(frame_for_detection, conf=conf_threshold)
+                detections = sv.Detections.from_ultralytics(results[0])
+                if detection_cache is not None:
+                    detection_cache.put(frame_idx, detections_to_arrays(detections))
+            if len(detections) > 0:
+                players_detections = detections[detections.class_id == player_class_id]
+                scale_x = frame.shape[1] / player_detection_resolution[0]
+                scale_y = frame.shape[0] / player_detection_resolution[1]
+                players_detections.xyxy = players_detections.xyxy * np.array([scale_x, scale_y, scale_x, scale_y])
+                for i, xyxy in enumerate(players_detections.xyxy):
+                    crop = sv.crop_image(frame, xyxy)
+                    if crop is not None and crop.size > 0 and crop.shape[0] >= 15 and crop.shape[1] >= 15:
+                        crops.append(crop)
+                        if len(crops) <= 50:
+                            cv2.imwrite(os.path.join(team_samples_dir, f"player_crop_{len(crops)}.jpg"), crop)
+        except Exception as e:
+            print(f"Error processing frame {frame_idx} for team classification: {e}")
+        if len(crops) > crops_before:
+            frames_with_crops += 1
+        if target_crops is not None and len(crops) >= target_crops and frames_with_crops >= min_sample_frames:
+            sampler.stop()
+    stats = sampler.summary()
+    if stats['stop_reason'] == 'stopped':
+        stats['stop_reason'] = 'enough_crops'
+    stats['frames_with_crops'] = frames_with_crops
+    return crops, stats
 
 def main_processing(
     input_video_path,
@@ -80,15 +346,55 @@ def main_processing(
     max_history=30,
     possession_distance_threshold=50,
     min_confidence_threshold=0.4,
-    smoothing_window=3,
     team_classification_stride=30,
+    team_classification_mode='online',
+    team_bootstrap_seconds=15,
+    team_track_cache=True,
+    team_sampling_mode='auto',
+    team_sampling_time_budget=120.0,
+    team_sampling_target_crops=1500,
+    team_sampling_min_frames=40,
+    team_profile=None,
+    team_profile_mode='reuse',
+    team_profile_path=None,
     target_resolution=(1920, 1280),
     player_detection_resolution=(1280, 736),
     keypoint_detection_resolution=(1280, 1280),
     canvas_width=1920,
     canvas_height=1280,
     goal_overlay_duration=30,
-    max_exit_frames=5
+    max_exit_frames=5,
+    homography_mode='full',
+    homography_motion_threshold=1.5,
+    homography_max_reuse_frames=10,
+    keypoint_schedule='every_frame',
+    keypoint_max_interval=10,
+    keypoint_motion_threshold=4.0,
+    keypoint_error_threshold=3.0,
+    detection_schedule='every_frame',
+    detection_max_stride=3,
+    detection_motion_threshold=8.0,
+    detection_min_iou=0.6,
+    ball_roi_detection=True,
+    ball_roi_size=(640, 640),
+    ball_roi_max_gap=15,
+    scene_gate=True,
+    scene_min_green_ratio=0.35,
+    scene_min_switch_frames=5,
+    stream_tracks=True,
+    legacy_track_json=True,
+    track_store_dir=None,
+    track_store_chunk_rows=8192,
+    events_dir=None,
+    model_precision="fp32",
+    inference_batch_size=4,
+    pipeline_queue_size=8,
+    render_workers=2,
+    outputs=OUTPUT_KINDS,
+    analysis_params=None,
+    detection_cache_dir=None,
+    video_hash=None,
+    run_stats=None
 ):
     """
     Main processing function that can be called from Django views.
@@ -108,8 +414,23 @@ def main_processing(
         max_history: Maximum history length for tracking
         possession_distance_threshold: Threshold for determining ball possession
         min_confidence_threshold: Minimum confidence for detections
-        smoothing_window: Window size for smoothing positions
         team_classification_stride: Stride for team classification sampling
+        team_classification_mode: 'offline' fits the team classifier on crops sampled from the whole
+            video before the main pass; 'online' bootstraps it from the first team_bootstrap_seconds
+            and refines it during the main pass, then reconciles each stored track to its majority team
+        team_bootstrap_seconds: Length of the video start the online team classifier is bootstrapped from
+        team_track_cache: Classify each track at a few sample frames and keep a confidence-weighted
+            vote per tracker ID instead of classifying every player on every frame
+        team_sampling_mode: How the team classification pre-pass reaches sampled frames: 'grab'
+            (sequential, skipped frames are not decoded into images), 'seek' (timestamp seeks in
+            coarse-to-fine order) or 'auto'
+        team_sampling_time_budget: Seconds after which the pre-pass stops sampling (None for no limit)
+        team_sampling_target_crops: Stop the pre-pass once this many player crops are collected (None to sample all)
+        team_sampling_min_frames: Minimum number of sampled frames the target crops must come from
+        team_profile: Stored kit profile (TeamClassifier.to_profile) of the two teams
+        team_profile_mode: 'reuse' classifies with team_profile and skips fitting and the crop
+            pre-pass; 'seed' starts fitting from team_profile and keeps its clusters if the kits match
+        team_profile_path: Path to write the kit profile of the fitted classifier to (None to skip)
         target_resolution: Target resolution for processing
         player_detection_resolution: Resolution for player detection
         keypoint_detection_resolution: Resolution for keypoint detection
@@ -117,46 +438,86 @@ def main_processing(
         canvas_height: Height of the output canvas
         goal_overlay_duration: Duration of goal overlay in frames
         max_exit_frames: Maximum frames to exit goal detection state
+        homography_mode: 'full' solves the pitch homography from the keypoints of every frame;
+            'incremental' carries it over by the camera motion estimated with sparse optical flow
+            while the camera is nearly static
+        homography_motion_threshold: Per-frame camera motion, in pixels at the processing resolution,
+            above which the homography is re-solved
+        homography_max_reuse_frames: Re-solve the homography at least every this many frames
+        keypoint_schedule: 'every_frame' runs keypoint detection on every frame; 'adaptive' runs it
+            at most keypoint_max_interval frames apart and propagates the keypoints by the camera
+            motion in between
+        keypoint_max_interval: Largest number of frames between keypoint detections
+        keypoint_motion_threshold: Per-frame camera motion, in pixels at the processing resolution,
+            that forces a keypoint detection
+        keypoint_error_threshold: Reprojection error of propagated keypoints, in pixels at the processing
+            resolution, above which keypoint detection runs more often
+        detection_schedule: 'every_frame' runs the player model on every frame; 'adaptive' runs it on
+            keyframes at most detection_max_stride frames apart and feeds the tracker boxes propagated
+            by optical flow in between
+        detection_max_stride: Largest number of frames between player-model keyframes
+        detection_motion_threshold: Per-frame camera or box motion, in pixels at the processing
+            resolution, that forces a keyframe
+        detection_min_iou: Mean IoU between keyframe detections and propagated boxes below which
+            keyframes become more frequent; the tolerance of the adaptive schedule
+        ball_roi_detection: When the full-frame pass finds no confident ball, search it again in a
+            crop of the native-resolution frame around its predicted position
+        ball_roi_size: (width, height) of the ball search crop in native pixels
+        ball_roi_max_gap: Frames since the ball was last seen after which it is no longer searched
+        scene_gate: Skip detection, tracking and analysis on frames that do not show the pitch
+            (replays, close-ups, crowd shots); they are copied to the output video unannotated and
+            the pitch and non-pitch segments are recorded in the summary and the track store
+        scene_min_green_ratio: Smallest share of pitch-green pixels of a frame showing the pitch
+        scene_min_switch_frames: Consecutive frames that must disagree with the current shot type
+            before the gate switches, unless a scene cut is detected
+        stream_tracks: Append tracks to newline-delimited files with a frame offset index
+        legacy_track_json: Also convert the track streams to the legacy JSON arrays at the end
+        track_store_dir: Directory for the columnar track store (defaults next to the object tracks)
+        track_store_chunk_rows: Rows buffered in memory before the track store is flushed to disk
+        events_dir: Directory for this video's event frames (cleared first; defaults to output_dir/events)
+        model_precision: 'fp32' or 'fp16' inference (fp16 only applies on CUDA)
+        inference_batch_size: Number of frames per micro-batch for the player and keypoint models
+        pipeline_queue_size: Capacity of the bounded queues between the decode, infer, analyze, render and encode stages
+        render_workers: Number of threads drawing annotated frames
+        outputs: Artifacts to produce, any of 'summary' (match summary and event frames), 'tracks'
+            (track files and track store) and 'video' (annotated video). Without 'video' the render
+            and encode stages are not run at all.
+        analysis_params: Overrides of the event and statistics thresholds (see DEFAULT_ANALYSIS_PARAMS);
+            the effective set is stored with the track store so offline re-analysis starts from it
+        detection_cache_dir: Directory of the on-disk detection cache; raw player and keypoint model
+            outputs are read from it and added to it, so reprocessing the same video with the same
+            models and resolutions skips inference (None disables the cache)
+        video_hash: Content hash of the input video, computed when the cache needs it and it is not given
+        run_stats: Optional dict filled with the pipeline report and the scheduler statistics of the run
     
     Returns:
         bool: True if processing was successful, False otherwise
     """
-    # Class IDs
-    BALL_CLASS_ID = 0
-    GOALKEEPER_ID = 1
-    PLAYER_ID = 2
-    REFEREE_ID = 3
+    outputs = set(outputs)
+    unknown_outputs = outputs - set(OUTPUT_KINDS)
+    if not outputs or unknown_outputs:
+        raise ValueError(f"outputs must be a non-empty subset of {OUTPUT_KINDS}, got {sorted(outputs)}")
+    write_summary = 'summary' in outputs
+    write_tracks = 'tracks' in outputs
+    render_video = 'video' in outputs
+    print(f"Producing outputs: {', '.join(kind for kind in OUTPUT_KINDS if kind in outputs)}")
 
     # Set device for GPU acceleration
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     print(f"Using device: {device}")
     
-    # Check if output directory exists and remove it if it does
-    if os.path.exists(output_dir):
-       try:
-        shutil.rmtree(output_dir)
-        print(f"Removed existing output directory: {output_dir}")
-       except Exception as e:
-        print(f"Warning: Could not remove output directory: {e}")
-
-
+    # The output directory is shared by every video, so only this job's event frames are cleared
     os.makedirs(output_dir, exist_ok=True)
     os.makedirs(team_samples_dir, exist_ok=True)
     tracks_dir = os.path.dirname(object_tracks_path)
-    events_dir = os.path.join(output_dir, "events")
+    if events_dir is None:
+        events_dir = os.path.join(output_dir, "events")
+    elif os.path.exists(events_dir):
+        shutil.rmtree(events_dir, ignore_errors=True)
     os.makedirs(tracks_dir, exist_ok=True)
     os.makedirs(events_dir, exist_ok=True)
     print(f"Created output directories: {output_dir}, {team_samples_dir}, {tracks_dir}, {events_dir}")
 
-    # Initialize JsonWriter
-    json_writer = JsonWriter(
-        save_dir=tracks_dir,
-        summary_dir=output_dir,
-        object_fname=os.path.splitext(os.path.basename(object_tracks_path))[0],
-        keypoints_fname=os.path.splitext(os.path.basename(keypoint_tracks_path))[0],
-        summary_fname=os.path.splitext(os.path.basename(summary_json_path))[0]
-    )
-
     # Verify model and field image files exist
     for path in [player_model_path, keypoints_model_path, field_image_path]:
         if not os.path.exists(path):
@@ -181,20 +542,18 @@ def main_processing(
         [210, 176], [317, 176]
     ], dtype=np.float32)
 
-    # Initialize models and trackers
-    try:
-        player_model = YOLO(player_model_path).to(device)
-        keypoints_model = YOLO(keypoints_model_path).to(device)
-    except Exception as e:
-        raise RuntimeError(f"Failed to load models: {e}")
-    tracker = sv.ByteTrack(frame_rate=30)
-    kp_tracker = KeypointsTracker(
-        model_path=keypoints_model_path,
-        conf=0.3,
-        kp_conf=0.7
-    )
-    position_mapper = ObjectPositionMapper(top_down_keypoints=top_down_keypoints, alpha=0.9)
-    projection_annotator = ProjectionAnnotator()
+    if team_classification_mode not in ('online', 'offline'):
+        raise ValueError(f"Unknown team classification mode '{team_classification_mode}' (expected 'online' or 'offline')")
+    online_teams = team_classification_mode == 'online'
+    if keypoint_schedule not in ('every_frame', 'adaptive'):
+        raise ValueError(f"Unknown keypoint schedule '{keypoint_schedule}' (expected 'every_frame' or 'adaptive')")
+    if detection_schedule not in ('every_frame', 'adaptive'):
+        raise ValueError(f"Unknown detection schedule '{detection_schedule}' (expected 'every_frame' or 'adaptive')")
+    if homography_mode not in ('full', 'incremental'):
+        raise ValueError(f"Unknown homography mode '{homography_mode}' (expected 'full' or 'incremental')")
+    if team_profile_mode not in ('reuse', 'seed'):
+        raise ValueError(f"Unknown team profile mode '{team_profile_mode}' (expected 'reuse' or 'seed')")
+
     # Verify input video
     if not os.path.exists(input_video_path):
         raise FileNotFoundError(f"Input video not found at {input_video_path}")
@@ -205,618 +564,728 @@ def main_processing(
     frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     fps = cap.get(cv2.CAP_PROP_FPS)
-    time_per_frame = 1 / fps if fps > 0 else 1 / 30
     print(f"Input video has {true_frame_count} frames, resolution: {frame_width}x{frame_height}, FPS: {fps}")
     cap.release()
 
-    # Team classification training phase
-    print("Starting team classification training phase...")
-    cap = cv2.VideoCapture(input_video_path)
-    crops = []
-    frame_count = 0
-    print("Collecting player crops for team classification...")
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frame_for_detection = cv2.resize(frame, player_detection_resolution, interpolation=cv2.INTER_AREA)
-        if frame_count % team_classification_stride == 0:
-            try:
-                results = player_model.predict(frame_for_detection, conf=0.3)
-                result = results[0]
-                if hasattr(result, 'boxes') and result.boxes is not None and len(result.boxes) > 0:
-                    detections = sv.Detections.from_ultralytics(result)
-                    players_detections = detections[detections.class_id == PLAYER_ID]
-                    scale_x = frame.shape[1] / player_detection_resolution[0]
-                    scale_y = frame.shape[0] / player_detection_resolution[1]
-                    players_detections.xyxy = players_detections.xyxy * np.array([scale_x, scale_y, scale_x, scale_y])
-                    for i, xyxy in enumerate(players_detections.xyxy):
-                        crop = sv.crop_image(frame, xyxy)
-                        if crop is not None and crop.size > 0 and crop.shape[0] >= 15 and crop.shape[1] >= 15:
-                            crops.append(crop)
-                            if len(crops) <= 50:
-                                cv2.imwrite(os.path.join(team_samples_dir, f"player_crop_{len(crops)}.jpg"), crop)
-            except Exception as e:
-                print(f"Error processing frame {frame_count} for team classification: {e}")
-        frame_count += 1
-        del frame, frame_for_detection
-        gc.collect()
-    cap.release()
-    print(f"Extracted {len(crops)} player crops from {frame_count} frames")
-    if frame_count != true_frame_count:
-        print(f"Warning: Expected {true_frame_count} frames, but extracted {frame_count} frames")
-
-    team_classifier = TeamClassifier(device="cpu")
-    success = team_classifier.fit(crops, team_samples_dir)
-    if not success:
-        print("Team classification failed. Using default team assignments.")
-        team_classifier.team_avg_colors = [(255, 255, 255), (0, 255, 0)]
-
-    # Set up colors for annotations
-    team_colors = team_classifier.team_avg_colors
-    print(f"Using team colors: Team A: {team_colors[0]}, Team B: {team_colors[1]}")
-
-    # Function to detect if a goal is scored
-    def is_goal_scored(ball_projection, frame_idx):
-        """
-        Check if a goal is scored based on ball position
-        
-        Args:
-            ball_projection: The projected ball position
-            frame_idx: The current frame index
-            
-        Returns:
-            Tuple[bool, str]: (goal detected, scoring team)
-        """
-        if ball_projection is None:
-            return False, None
-        x, y = ball_projection
-        print(f"Frame {frame_idx}: Ball projection = ({x:.2f}, {y:.2f})")
-        # Left goal (Team B scores): beyond [32, 122], [32, 229]
-        if x < 32 and 122 <= y <= 229:
-            print(f"Frame {frame_idx}: Goal detected for Team B (Left goal)")
-            return True, "Team B"
-        # Right goal (Team A scores): beyond [495, 122], [495, 229]
-        if x > 495 and 122 <= y <= 229:
-            print(f"Frame {frame_idx}: Goal detected for Team A (Right goal)")
-            return True, "Team A"
-        return False, None
-
-    # Main processing phase
-    print("Starting main video processing...")
-    cap = cv2.VideoCapture(input_video_path)
-    # Use XVID codec for the temporary output - this is widely supported by OpenCV
-    out_video = cv2.VideoWriter(
-    output_video_path,
-    cv2.VideoWriter_fourcc(*'avc1'),  # More universally supported codec
-    fps,
-    (canvas_width, canvas_height)
-    )
+    # Initialize models; models are shared process-wide and stay loaded between jobs, so
+    # every reference taken here is released in the finally block below
+    acquired_models = []
+    object_cache = keypoint_cache = None
+    json_writer = track_store = None
+    staged_events_dir = tempfile.mkdtemp(prefix='event_frames_', dir=output_dir)
 
-    ball_positions = deque(maxlen=max_history)
-    ball_confidences = deque(maxlen=max_history)
-    last_closest_player = None
-    pass_count = 0
-    player_positions = defaultdict(lambda: deque(maxlen=max_history))
-    player_distances = defaultdict(float)
-    player_speeds = defaultdict(float)
-    team_map = {}
-    all_tracks = {}
-    summary_data = {
-        "passes": [],
-        "shots": [],  # Add shots array to track shots
-        "possessions": [],
-        "player_stats": {},
-        "team_stats": {
-            "Team A": {"possession": 0, "passes": 0, "shots": 0, "possession_percentage": 0},
-            "Team B": {"possession": 0, "passes": 0, "shots": 0, "possession_percentage": 0}
-        },
-        "goals": []
-    }
-
-    # Initialize goal state machine
-    goal_in_progress = False
-    exit_counter = 0
-    goal_overlay_frames = 0
-    display_goal_overlay = False
-    goal_frame_counter = 0
-    
-    # Initialize shot detection variables
-    prev_ball_projection = None
-    last_shot_frame = -100  # To avoid detecting multiple shots for the same action
-    shot_cooldown = 0
+    def abort_outputs():
+        # Close the open writers and remove their partial files, so a failed run neither
+        # leaks file handles in the long-lived worker nor leaves half-written tracks behind
+        if track_store is not None:
+            track_store.abort()
+        if json_writer is not None:
+            json_writer.abort()
+        shutil.rmtree(staged_events_dir, ignore_errors=True)
 
-    frame_idx = 0
-    for _ in tqdm(range(true_frame_count), desc="Processing frames"):
-        ret, frame = cap.read()
-        if not ret:
-            print(f"Reached end of video at frame {frame_idx}")
-            break
-        frame = cv2.resize(frame, target_resolution, interpolation=cv2.INTER_AREA)
-        frame_for_player_detection = cv2.resize(frame, player_detection_resolution, interpolation=cv2.INTER_AREA)
-        frame_for_keypoint_detection = cv2.resize(frame, keypoint_detection_resolution, interpolation=cv2.INTER_AREA)
-
-        # Detect players, ball, goalkeepers, and referees
-        detections, ball_detections, used_model = detect_players_and_ball(
-            frame_for_player_detection, player_model, min_confidence_threshold, BALL_CLASS_ID
+    try:
+        # Initialize JsonWriter
+        json_writer = JsonWriter(
+            save_dir=tracks_dir,
+            summary_dir=output_dir,
+            object_fname=os.path.splitext(os.path.basename(object_tracks_path))[0],
+            keypoints_fname=os.path.splitext(os.path.basename(keypoint_tracks_path))[0],
+            summary_fname=os.path.splitext(os.path.basename(summary_json_path))[0],
+            stream=stream_tracks and write_tracks
         )
-        player_scale_x = target_resolution[0] / player_detection_resolution[0]
-        player_scale_y = target_resolution[1] / player_detection_resolution[1]
-        if len(detections) > 0:
-            detections.xyxy = detections.xyxy * np.array([player_scale_x, player_scale_y, player_scale_x, player_scale_y])
-        if len(ball_detections) > 0:
-            ball_detections.xyxy = ball_detections.xyxy * np.array([player_scale_x, player_scale_y, player_scale_x, player_scale_y])
-
-        # Detect and track keypoints
-        kp_detections = kp_tracker.detect(frame_for_keypoint_detection)
-        kp_tracks = kp_tracker.track(kp_detections, frame_idx)
-        kp_scale_x = target_resolution[0] / keypoint_detection_resolution[0]
-        kp_scale_y = target_resolution[1] / keypoint_detection_resolution[1]
-        for kp_id, kp_info in keypoint_history.get(frame_idx, {}).items():
-            x, y = kp_info['coords']
-            kp_info['coords'] = (x * kp_scale_x, y * kp_scale_y)
-
-        # Update ball positions
-        if len(ball_detections) > 0:
-            valid_balls = ball_detections[ball_detections.confidence >= min_confidence_threshold]
-            if len(valid_balls) > 0:
-                ball_detections = valid_balls
-                top_idx = valid_balls.confidence.argmax()
-                ball_detections.xyxy = ball_detections.xyxy[top_idx:top_idx+1]
-                ball_detections.confidence = ball_detections.confidence[top_idx:top_idx+1]
-                x1, y1, x2, y2 = ball_detections.xyxy[0]
-                cx = int((x1 + x2) / 2)
-                cy = int((y1 + y2) / 2)
-                ball_positions.append((cx, cy))
-                ball_confidences.append(ball_detections.confidence[0])
-            else:
-                ball_positions.append(None)
-                ball_confidences.append(0)
+
+        try:
+            player_model = model_registry.acquire(player_model_path, str(device), model_precision,
+                                                  warmup_imgsz=player_detection_resolution)
+            acquired_models.append(player_model_path)
+            keypoints_model = model_registry.acquire(keypoints_model_path, str(device), model_precision,
+                                                     warmup_imgsz=keypoint_detection_resolution)
+            acquired_models.append(keypoints_model_path)
+        except Exception as e:
+            raise RuntimeError(f"Failed to load models: {e}")
+        tracker = sv.ByteTrack(frame_rate=30)
+        kp_tracker = KeypointsTracker(
+            model=keypoints_model,
+            conf=0.3,
+            kp_conf=0.7
+        )
+        keypoint_scheduler = None
+        if keypoint_schedule == 'adaptive':
+            keypoint_scheduler = KeypointScheduler(
+                CameraMotionEstimator(),
+                coord_scale=(keypoint_detection_resolution[0] / target_resolution[0],
+                             keypoint_detection_resolution[1] / target_resolution[1]),
+                max_interval=keypoint_max_interval,
+                motion_threshold=keypoint_motion_threshold,
+                error_threshold=keypoint_error_threshold
+            )
+        detection_scheduler = None
+        if detection_schedule == 'adaptive':
+            detection_scheduler = DetectionScheduler(
+                BALL_CLASS_ID,
+                coord_scale=(player_detection_resolution[0] / target_resolution[0],
+                             player_detection_resolution[1] / target_resolution[1]),
+                max_stride=detection_max_stride,
+                motion_threshold=detection_motion_threshold,
+                min_iou=detection_min_iou
+            )
+        ball_roi_detector = None
+        if ball_roi_detection:
+            ball_roi_detector = BallRoiDetector(
+                player_model, BALL_CLASS_ID, min_confidence_threshold, roi_size=tuple(ball_roi_size), max_gap=ball_roi_max_gap
+            )
+        position_mapper = ObjectPositionMapper(
+            top_down_keypoints=top_down_keypoints,
+            alpha=0.9,
+            motion_estimator=CameraMotionEstimator() if homography_mode == 'incremental' else None,
+            motion_threshold=homography_motion_threshold,
+            max_reuse_frames=homography_max_reuse_frames
+        )
+        projection_annotator = ProjectionAnnotator()
+        gate = SceneGate(min_green_ratio=scene_min_green_ratio, min_switch_frames=scene_min_switch_frames) if scene_gate else None
+        if detection_cache_dir is not None:
+            object_cache, keypoint_cache = open_detection_caches(
+                detection_cache_dir, video_hash or file_digest(input_video_path), player_model_path, keypoints_model_path,
+                target_resolution, player_detection_resolution, keypoint_detection_resolution,
+                min_confidence_threshold, kp_tracker.conf, kp_tracker.kp_conf
+            )
+
+        if team_profile is not None and team_profile_mode == 'reuse':
+            # A stored kit profile replaces the training phase
+            team_classifier = TeamClassifier.from_profile(team_profile, device="cpu", online=online_teams)
+            print("Using the stored kit profile; skipping team classification training")
         else:
-            ball_positions.append(None)
-            ball_confidences.append(0)
+            # Team classification training phase; the online classifier only needs the start of the video
+            print(f"Starting team classification training phase ({team_classification_mode})...")
+            crops, sampling_stats = collect_team_crops(
+                input_video_path, player_model, team_samples_dir, player_detection_resolution,
+                team_classification_stride, PLAYER_ID,
+                sampling_mode=team_sampling_mode,
+                time_budget=team_sampling_time_budget,
+                target_crops=team_sampling_target_crops,
+                min_sample_frames=team_sampling_min_frames,
+                end_frame=int(team_bootstrap_seconds * (fps or 30)) if online_teams else None,
+                conf_threshold=min_confidence_threshold,
+                target_resolution=target_resolution,
+                detection_cache=object_cache
+            )
+            print(f"Extracted {len(crops)} player crops from {sampling_stats['sampled']} sampled frames "
+                  f"({sampling_stats['mode']} mode, {sampling_stats['seeks']} seeks, {sampling_stats['elapsed_seconds']}s"
+                  f"{', stopped early: ' + sampling_stats['stop_reason'] if sampling_stats['stop_reason'] else ''})")
+
+            team_classifier = TeamClassifier(device="cpu", online=online_teams)
+            success = team_classifier.fit(crops, team_samples_dir, seed_profile=team_profile)
+            if not success:
+                print("Team classification failed. Using default team assignments.")
+                team_classifier.team_avg_colors = [(255, 255, 255), (0, 255, 0)]
+            del crops
+        team_cache = TrackTeamCache(team_classifier) if team_track_cache else None
+
+        # Set up colors for annotations
+        team_colors = team_classifier.team_avg_colors
+        print(f"Using team colors: Team A: {team_colors[0]}, Team B: {team_colors[1]}")
+
+        # Main processing phase
+        print("Starting main video processing...")
+        cap = cv2.VideoCapture(input_video_path)
+        out_video = None
+        if render_video:
+            out_video = cv2.VideoWriter(
+                output_video_path,
+                cv2.VideoWriter_fourcc(*'avc1'),  # More universally supported codec
+                fps,
+                (canvas_width, canvas_height)
+            )
 
-        # Track and assign teams
-        all_detections, goalkeepers_detections, players_detections, referees_detections = track_and_assign_teams(
-            detections, tracker, team_classifier, frame, GOALKEEPER_ID, PLAYER_ID, REFEREE_ID, frame_idx
+        # Only frames in flight are kept in memory; past frames live in the track store
+        track_history.clear()
+        keypoint_history.clear()
+        if track_store_dir is None:
+            track_store_dir = f"{os.path.splitext(object_tracks_path)[0]}_store"
+        match_analyzer = MatchAnalyzer(
+            fps=fps,
+            params={
+                'pixels_per_meter': pixels_per_meter,
+                'possession_distance_threshold': possession_distance_threshold,
+                'max_exit_frames': max_exit_frames,
+                **(analysis_params or {})
+            },
+            max_history=max_history,
+            goal_overlay_duration=goal_overlay_duration
         )
+        # Online team reconciliation works on the track store, so the summary needs one even when
+        # the tracks are not requested; it then goes to a temporary directory
+        track_store = None
+        keep_track_store = write_tracks
+        if write_tracks or (online_teams and write_summary):
+            if not write_tracks:
+                track_store_dir = tempfile.mkdtemp(prefix='track_store_', dir=output_dir)
+            track_store = TrackStoreWriter(
+                track_store_dir,
+                chunk_rows=track_store_chunk_rows,
+                attrs={
+                    'fps': fps,
+                    'resolution': list(target_resolution),
+                    'source_resolution': [frame_width, frame_height],
+                    'team_colors': [list(color) for color in team_colors],
+                    'analysis_params': match_analyzer.params
+                }
+            )
 
-        # Create all_tracks entry for this frame
-        all_tracks[frame_idx] = {
-            'keypoints': {k: v for k, v in keypoint_history.get(frame_idx, {}).items()},
-            'object': {
-                'player': {},
-                'goalkeeper': {},
-                'referee': {},
-                'ball': {}
-            }
-        }
+        player_scale = np.array([
+            target_resolution[0] / player_detection_resolution[0], target_resolution[1] / player_detection_resolution[1],
+            target_resolution[0] / player_detection_resolution[0], target_resolution[1] / player_detection_resolution[1]
+        ])
+        kp_scale_x = target_resolution[0] / keypoint_detection_resolution[0]
+        kp_scale_y = target_resolution[1] / keypoint_detection_resolution[1]
 
-        # Populate object tracks
-        for i, tracker_id in enumerate(all_detections.tracker_id):
-            class_id = all_detections.class_id[i]
-            team_id = all_detections.team_id[i] if hasattr(all_detections, 'team_id') else 2
-            class_name = 'goalkeeper' if class_id == GOALKEEPER_ID else 'player' if class_id == PLAYER_ID else 'referee' if class_id == REFEREE_ID else 'ball'
-            team = 'Team A' if team_id == 0 else 'Team B' if team_id == 1 else 'Referee'
-            club_color = team_colors[0] if team == 'Team A' else team_colors[1] if team == 'Team B' else (0, 0, 0)
-            bbox = all_detections.xyxy[i].tolist()
-            confidence = float(all_detections.confidence[i]) if i < len(all_detections.confidence) else 0.0
-            all_tracks[frame_idx]['object'][class_name][tracker_id] = {
-                'class_id': int(class_id),
-                'bbox': bbox,
-                'confidence': confidence,
-                'club_color': class_name == 'ball' and (0, 255, 255) or club_color,
-                'team': class_name == 'ball' and 'Ball' or team,
-                'team_id': class_name == 'ball' and -1 or int(team_id),
-                'has_ball': False
-            }
+        # Stage functions. Each receives a list of payload dicts in frame order and returns it.
+        infer_state = {'next_pitch_frame': 0}
 
-        # Add ball to object tracks
-        if len(ball_detections) > 0:
-            ball_bbox = ball_detections.xyxy[0].tolist()
-            ball_confidence = float(ball_detections.confidence[0]) if len(ball_detections.confidence) > 0 else 0.0
-            all_tracks[frame_idx]['object']['ball'][1] = {
-                'class_id': BALL_CLASS_ID,
-                'bbox': ball_bbox,
-                'confidence': ball_confidence,
-                'club_color': (0, 255, 255),
-                'team': 'Ball',
-                'team_id': -1,
-                'has_ball': False
-            }
+        def infer_stage(batch):
+            for item in batch:
+                item['on_pitch'] = gate is None or gate.update(item['frame'], item['frame_idx'])
+            # Models run on runs of consecutive pitch frames; the camera motion restarts after a gap
+            runs = []
+            for item in batch:
+                if not item['on_pitch']:
+                    continue
+                if runs and runs[-1][-1]['frame_idx'] == item['frame_idx'] - 1:
+                    runs[-1].append(item)
+                else:
+                    runs.append([item])
+            for run in runs:
+                if run[0]['frame_idx'] != infer_state['next_pitch_frame']:
+                    for scheduler in (keypoint_scheduler, detection_scheduler, ball_roi_detector):
+                        if scheduler is not None:
+                            scheduler.reset()
+                infer_state['next_pitch_frame'] = run[-1]['frame_idx'] + 1
+                outputs = infer_batch(
+                    [item['frame'] for item in run], player_model, kp_tracker, player_detection_resolution,
+                    keypoint_detection_resolution, min_confidence_threshold, BALL_CLASS_ID,
+                    frame_indices=[item['frame_idx'] for item in run], object_cache=object_cache,
+                    keypoint_cache=keypoint_cache, keypoint_scheduler=keypoint_scheduler,
+                    detection_scheduler=detection_scheduler, ball_roi_detector=ball_roi_detector,
+                    source_frames=[item['source_frame'] for item in run] if ball_roi_detector is not None else None
+                )
+                for i, (item, (detections, ball_detections, kp_detections)) in enumerate(zip(run, outputs)):
+                    item['detections'] = detections
+                    item['ball_detections'] = ball_detections
+                    item['kp_detections'] = kp_detections
+                    if keypoint_scheduler is not None:
+                        # The mapper reuses the camera motion instead of estimating it again
+                        item['camera_motion'] = keypoint_scheduler.frame_motions[i]
+            for item in batch:
+                item.pop('source_frame', None)
+            return batch
 
-        # Map object positions to top-down view
-        detection_data = {
-            'keypoints': keypoint_history.get(frame_idx, {}),
-            'object': track_history.get(frame_idx, {})
-        }
-        mapped_data = position_mapper.map(detection_data)
-
-        # Update all_tracks with projections
-        for class_name in ['player', 'goalkeeper', 'referee']:
-            for track_id, track_info in mapped_data.get('object', {}).items():
-                if 'projection' in track_info and track_id in all_tracks[frame_idx]['object'].get(class_name, {}):
-                    all_tracks[frame_idx]['object'][class_name][track_id]['projection'] = track_info['projection']
-
-        # Add ball projection
-        ball_projection = None
-        if len(ball_positions) > 0 and ball_positions[-1] is not None:
-            ball_pos = ball_positions[-1]
-            ball_bbox = ball_detections.xyxy[0].tolist() if len(ball_detections) > 0 else [ball_pos[0]-5, ball_pos[1]-5, ball_pos[0]+5, ball_pos[1]+5]
-            ball_mapped = position_mapper.map({
-                'keypoints': keypoint_history.get(frame_idx, {}),
-                'object': {1: {'bbox': ball_bbox}}
-            })
-            if 'projection' in ball_mapped.get('object', {}).get(1, {}):
-                ball_projection = ball_mapped['object'][1]['projection']
-                all_tracks[frame_idx]['object']['ball'][1]['projection'] = ball_projection
-
-        # Goal detection with state machine
-        goal_detected = False
-        scoring_team = None
-        if ball_projection is not None:
-            goal_detected, scoring_team = is_goal_scored(ball_projection, frame_idx)
-            if goal_detected:
-                if not goal_in_progress:
-                    print(f"Goal scored at frame {frame_idx} for {scoring_team}!")
-                    summary_data["goals"].append({
-                        "frame": frame_idx,
-                        "team": scoring_team,
-                        "player_id": int(closest_player) if closest_player is not None else None
-                    })
-                    event_filename = os.path.join(events_dir, f"goal_{scoring_team}_{frame_idx}.jpg")
-                    cv2.imwrite(event_filename, frame)
-                    print(f"Saved goal event frame to {event_filename}")
-                    
-                    # Mark most recent shot as on target if within last 150 frames
-                    recent_shots = [shot for shot in summary_data["shots"] 
-                                  if shot["team"] == scoring_team and frame_idx - shot["frame"] < 150]
-                    if recent_shots:
-                        recent_shots[-1]["on_target"] = True
-                        
-                    goal_in_progress = True
-                    display_goal_overlay = True
-                    goal_overlay_frames = goal_overlay_duration
-                    goal_frame_counter = 0
-                    
-                exit_counter = 0
-            else:
-                if goal_in_progress:
-                    exit_counter += 1
-                    if exit_counter > max_exit_frames:
-                        goal_in_progress = False
-                        exit_counter = 0
-                        
-        # Shot detection
-        if shot_cooldown > 0:
-            shot_cooldown -= 1
-            
-        if ball_projection is not None and prev_ball_projection is not None and shot_cooldown == 0:
-            if current_possession_team in ["Team A", "Team B"] and closest_player is not None:
-                # Check if this is a shot
-                if is_shot_taken(ball_projection, prev_ball_projection, current_possession_team, frame_idx):
-                    # Calculate ball speed
-                    x1, y1 = ball_projection
-                    px1, py1 = prev_ball_projection
-                    ball_distance = np.sqrt((x1-px1)**2 + (y1-py1)**2)
-                    ball_speed_mps = ball_distance / time_per_frame / pixels_per_meter
-                    ball_speed_kmph = ball_speed_mps * 3.6
-                    
-                    # Record shot
-                    if frame_idx - last_shot_frame > 30:  # Avoid duplicate detections
-                        summary_data["shots"].append({
-                            "frame": frame_idx,
-                            "player_id": int(closest_player),
-                            "team": current_possession_team,
-                            "ball_speed_kmph": round(ball_speed_kmph, 2),
-                            "on_target": False
-                        })
-                        
-                        # Increment team shots counter
-                        summary_data["team_stats"][current_possession_team]["shots"] += 1
-                        
-                        # Save shot frame
-                        event_filename = os.path.join(events_dir, f"shot_{current_possession_team}_{frame_idx}.jpg")
-                        cv2.imwrite(event_filename, frame)
-                        print(f"Saved shot event frame to {event_filename}")
-                        
-                        last_shot_frame = frame_idx
-                        shot_cooldown = 30  # Prevent multiple detections of the same shot
-        
-        # Update previous ball position for the next frame
-        prev_ball_projection = ball_projection
-
-        # Calculate player metrics and update
-        player_speeds_for_frame = {}
-        for i, tracker_id in enumerate(all_detections.tracker_id):
-            if all_detections.class_id[i] in [BALL_CLASS_ID, REFEREE_ID]:
-                continue
-            x1, y1, x2, y2 = all_detections.xyxy[i]
-            cx = int((x1 + x2) / 2)
-            cy = int((y1 + y2) / 2)
-            player_positions[tracker_id].append((cx, cy))
-            if len(player_positions[tracker_id]) >= 2:
-                pos_current = player_positions[tracker_id][-1]
-                pos_prev = player_positions[tracker_id][-2]
-                dx = pos_current[0] - pos_prev[0]
-                dy = pos_current[1] - pos_prev[1]
-                distance_pixels = np.sqrt(dx**2 + dy**2)
-                distance_meters = distance_pixels / pixels_per_meter
-                player_distances[tracker_id] += distance_meters
-                speed_mps = distance_meters / time_per_frame
-                speed_kmph = min(speed_mps * 3.6, 50.0)  # Cap at 50 km/h to avoid outliers
-                player_speeds[tracker_id] = speed_kmph
-                player_speeds_for_frame[tracker_id] = speed_kmph
+        def analyze_stage(batch):
+            for item in batch:
+                analyze_frame(item)
+            if not render_video:
+                progress.update(len(batch))
+            return batch
+
+        skip_state = {'skipping': False}
+
+        def skip_frame(item):
+            # Keep the track streams and the store aligned with the video; the next pitch frame re-solves the homography
+            frame_idx = item['frame_idx']
+            if not skip_state['skipping']:
+                position_mapper.reset()
+                match_analyzer.reset_continuity()
+                skip_state['skipping'] = True
+            if write_tracks:
+                json_writer.write_object_tracks({'player': {}, 'goalkeeper': {}, 'referee': {}, 'ball': {}})
+                json_writer.write_keypoint_tracks({})
+            if track_store is not None:
+                track_store.append_frame(frame_idx, rows_from_frame_tracks(frame_idx, {}))
+            if not render_video:
+                item.pop('frame')
+
+
+        def analyze_frame(item):
+            if not item['on_pitch']:
+                skip_frame(item)
+                return
+            skip_state['skipping'] = False
+            frame_idx = item['frame_idx']
+            frame = item['frame']
+            detections = item.pop('detections')
+            ball_detections = item.pop('ball_detections')
+            if len(detections) > 0:
+                detections.xyxy = detections.xyxy * player_scale
+            if len(ball_detections) > 0:
+                ball_detections.xyxy = ball_detections.xyxy * player_scale
+
+            # Track keypoints
+            kp_tracker.track(item.pop('kp_detections'), frame_idx)
+            for kp_id, kp_info in keypoint_history.get(frame_idx, {}).items():
+                x, y = kp_info['coords']
+                kp_info['coords'] = (x * kp_scale_x, y * kp_scale_y)
+
+            # Select the most confident ball
+            ball_position = None
+            if len(ball_detections) > 0:
+                valid_balls = ball_detections[ball_detections.confidence >= min_confidence_threshold]
+                if len(valid_balls) > 0:
+                    ball_detections = valid_balls
+                    top_idx = valid_balls.confidence.argmax()
+                    ball_detections.xyxy = ball_detections.xyxy[top_idx:top_idx+1]
+                    ball_detections.confidence = ball_detections.confidence[top_idx:top_idx+1]
+                    x1, y1, x2, y2 = ball_detections.xyxy[0]
+                    ball_position = (int((x1 + x2) / 2), int((y1 + y2) / 2))
+
+            # Track and assign teams
+            all_detections, goalkeepers_detections, players_detections, referees_detections = track_and_assign_teams(
+                detections, tracker, team_classifier, frame, GOALKEEPER_ID, PLAYER_ID, REFEREE_ID, frame_idx,
+                team_cache=team_cache
+            )
+            if hasattr(all_detections, 'team_id'):
+                team_ids = all_detections.team_id
             else:
-                player_speeds[tracker_id] = 0
-                player_speeds_for_frame[tracker_id] = 0
-
-        # Assign teams for player stats and possession
-        for i, tracker_id in enumerate(all_detections.tracker_id):
-            class_id = all_detections.class_id[i]
-            team_id = all_detections.team_id[i] if hasattr(all_detections, 'team_id') else 2
-            team = 'Team A' if team_id == 0 else 'Team B' if team_id == 1 else 'Referee'
-            team_map[tracker_id] = team
-            
-            if team != 'Referee':
-                player_id = str(tracker_id)
-                if player_id not in summary_data["player_stats"]:
-                    summary_data["player_stats"][player_id] = {
-                        "team": team,
-                        "total_distance_m": 0,
-                        "max_speed_kmph": 0,
-                        "avg_speed_kmph": 0,
-                        "speed_history": []
-                    }
-                player_stat = summary_data["player_stats"][player_id]
-                player_stat["total_distance_m"] = round(player_distances[tracker_id], 2)
-                player_stat["max_speed_kmph"] = max(player_stat["max_speed_kmph"], round(player_speeds[tracker_id], 2))
-                player_stat["speed_history"].append(round(player_speeds[tracker_id], 2))
-                player_stat["avg_speed_kmph"] = round(sum(player_stat["speed_history"]) / len(player_stat["speed_history"]), 2)
-
-        # Detect passes and calculate possession
-        closest_player = None
-        min_distance = float('inf')
-        current_possession_team = None
-
-        if len(ball_positions) > 0 and ball_positions[-1] is not None:
-            ball_point = np.array(ball_positions[-1], dtype=np.float32)
-            
-            for i, box in enumerate(all_detections.xyxy):
-                if all_detections.class_id[i] == REFEREE_ID:
-                    continue
-                    
-                px = (box[0] + box[2]) / 2
-                py = (box[1] + box[3]) / 2
-                dist = np.linalg.norm(ball_point - np.array([px, py], dtype=np.float32))
-                if dist < min_distance:
-                    min_distance = dist
-                    closest_player = all_detections.tracker_id[i]
-
-            if closest_player is not None and min_distance < possession_distance_threshold:
-                current_possession_team = team_map.get(closest_player, "Unknown")
-                
-                # Mark player as having the ball
+                team_ids = np.full(len(all_detections), 2)
+
+            # Create the tracks entry for this frame
+            frame_tracks = {
+                'keypoints': {k: v for k, v in keypoint_history.get(frame_idx, {}).items()},
+                'object': {
+                    'player': {},
+                    'goalkeeper': {},
+                    'referee': {},
+                    'ball': {}
+                }
+            }
+
+            # Populate object tracks
+            for i, tracker_id in enumerate(all_detections.tracker_id):
+                class_id = all_detections.class_id[i]
+                team_id = team_ids[i]
+                class_name = 'goalkeeper' if class_id == GOALKEEPER_ID else 'player' if class_id == PLAYER_ID else 'referee' if class_id == REFEREE_ID else 'ball'
+                team = 'Team A' if team_id == 0 else 'Team B' if team_id == 1 else 'Referee'
+                club_color = team_colors[0] if team == 'Team A' else team_colors[1] if team == 'Team B' else (0, 0, 0)
+                bbox = all_detections.xyxy[i].tolist()
+                confidence = float(all_detections.confidence[i]) if i < len(all_detections.confidence) else 0.0
+                frame_tracks['object'][class_name][tracker_id] = {
+                    'class_id': int(class_id),
+                    'bbox': bbox,
+                    'confidence': confidence,
+                    'club_color': class_name == 'ball' and (0, 255, 255) or club_color,
+                    'team': class_name == 'ball' and 'Ball' or team,
+                    'team_id': class_name == 'ball' and -1 or int(team_id),
+                    'has_ball': False
+                }
+
+            # Add ball to object tracks
+            if len(ball_detections) > 0:
+                ball_bbox = ball_detections.xyxy[0].tolist()
+                ball_confidence = float(ball_detections.confidence[0]) if len(ball_detections.confidence) > 0 else 0.0
+                frame_tracks['object']['ball'][BALL_TRACKER_ID] = {
+                    'class_id': BALL_CLASS_ID,
+                    'bbox': ball_bbox,
+                    'confidence': ball_confidence,
+                    'club_color': (0, 255, 255),
+                    'team': 'Ball',
+                    'team_id': -1,
+                    'has_ball': False
+                }
+
+            # Project the tracked objects and the selected ball to the top-down view with one homography
+            boxes = all_detections.xyxy.reshape(-1, 4)
+            if ball_position is not None:
+                boxes = np.vstack([boxes, ball_detections.xyxy[:1]])
+            projections = position_mapper.project(keypoint_history.get(frame_idx, {}), boxes, frame=frame,
+                                                  camera_motion=item.pop('camera_motion', None))
+            has_projection = ~np.isnan(projections[:, 0])
+            for i, tracker_id in enumerate(all_detections.tracker_id):
+                if has_projection[i] and all_detections.class_id[i] != BALL_CLASS_ID:
+                    class_name = CLASS_ID_TO_NAME[int(all_detections.class_id[i])]
+                    frame_tracks['object'][class_name][tracker_id]['projection'] = (float(projections[i][0]), float(projections[i][1]))
+            ball_projection = None
+            if ball_position is not None and has_projection[-1]:
+                ball_projection = (float(projections[-1][0]), float(projections[-1][1]))
+                frame_tracks['object']['ball'][BALL_TRACKER_ID]['projection'] = ball_projection
+
+            # Possession, passes, shots, goals and player statistics
+            result = match_analyzer.update(
+                frame_idx, all_detections.tracker_id, all_detections.class_id, team_ids,
+                all_detections.xyxy, ball_position, ball_projection
+            )
+            # Event frames are named from the final summary, which may relabel or drop live events
+            if write_summary and (result['goal'] is not None or result['shot'] is not None):
+                cv2.imwrite(os.path.join(staged_events_dir, f"{frame_idx}.jpg"), frame)
+
+            # Mark player as having the ball
+            if result['possessor'] is not None:
                 for class_name in ['player', 'goalkeeper']:
-                    if closest_player in all_tracks[frame_idx]['object'].get(class_name, {}):
-                        all_tracks[frame_idx]['object'][class_name][closest_player]['has_ball'] = True
-
-                # Update possession stats
-                if current_possession_team in ["Team A", "Team B"]:
-                    summary_data["team_stats"][current_possession_team]["possession"] += 1
-
-                # Detect pass if there's a change in possession
-                if last_closest_player is not None and closest_player != last_closest_player:
-                    from_team = team_map.get(last_closest_player, "Unknown")
-                    to_team = team_map.get(closest_player, "Unknown")
-                    
-                    # Only count as a pass if both players are from the same team
-                    if from_team == to_team and from_team in ["Team A", "Team B"]:
-                        pass_count += 1
-                        
-                        # Calculate ball speed for the pass
-                        ball_speed_kmph = 0
-                        if len(ball_positions) >= 2 and ball_positions[-1] is not None and ball_positions[-2] is not None:
-                            p1 = ball_positions[-1]
-                            p2 = ball_positions[-2]
-                            distance_pixels = np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
-                            distance_meters = distance_pixels / pixels_per_meter
-                            speed_mps = distance_meters / time_per_frame
-                            ball_speed_kmph = speed_mps * 3.6
-                        
-                        # Record the pass
-                        summary_data["passes"].append({
-                            "frame": frame_idx,
-                            "from_player": int(last_closest_player),
-                            "to_player": int(closest_player),
-                            "from_team": from_team,
-                            "to_team": to_team,
-                            "ball_speed_kmph": round(ball_speed_kmph, 2)
-                        })
-                        
-                        # Update team pass stats
-                        summary_data["team_stats"][from_team]["passes"] += 1
-                        
-                        print(f"Frame {frame_idx}: Pass #{pass_count} from Player {last_closest_player} to Player {closest_player}")
-
-                # Update last closest player
-                last_closest_player = closest_player
-            else:
-                # No player close enough to the ball
-                current_possession_team = None
-                last_closest_player = None
+                    if result['possessor'] in frame_tracks['object'].get(class_name, {}):
+                        frame_tracks['object'][class_name][result['possessor']]['has_ball'] = True
+
+            # Save tracking data
+            if write_tracks:
+                json_writer.write_object_tracks(frame_tracks['object'])
+                json_writer.write_keypoint_tracks(frame_tracks['keypoints'])
+            if track_store is not None:
+                track_store.append_frame(frame_idx, rows_from_frame_tracks(frame_idx, frame_tracks['object']))
+
+            track_history.pop(frame_idx, None)
+            keypoint_history.pop(frame_idx, None)
+            if not render_video:
+                item.pop('frame')
+                return
+
+            # Snapshot everything the render stage draws, since analysis moves on to the next frame
+            objects = []
+            for i, tracker_id in enumerate(all_detections.tracker_id):
+                if all_detections.class_id[i] == BALL_CLASS_ID:
+                    continue
+                if tracker_id in goalkeepers_detections.tracker_id:
+                    obj_cls = 'goalkeeper'
+                elif tracker_id in referees_detections.tracker_id:
+                    obj_cls = 'referee'
+                else:
+                    obj_cls = 'player'
+                objects.append((all_detections.xyxy[i], tracker_id, obj_cls, team_ids[i],
+                                match_analyzer.player_speeds[tracker_id], match_analyzer.player_distances[tracker_id]))
+            overlay = match_analyzer.overlay_state()
+            overlay['objects'] = objects
+            overlay['ball_boxes'] = list(ball_detections.xyxy) if len(ball_detections) > 0 else []
+            overlay['object_tracks'] = frame_tracks['object']
+            item['overlay'] = overlay
+
+        def render_stage(batch):
+            for item in batch:
+                if not item['on_pitch']:
+                    item['canvas'] = render_passthrough(item.pop('frame'), canvas_width, canvas_height)
+                    continue
+                item['canvas'] = render_frame(
+                    item.pop('frame'), item.pop('overlay'), team_colors, projection_frame, projection_annotator,
+                    canvas_width, canvas_height, goal_overlay_duration
+                )
+            return batch
+
+        progress = tqdm(total=true_frame_count, desc="Processing frames")
+
+        def encode_stage(batch):
+            for item in batch:
+                out_video.write(item.pop('canvas'))
+                progress.update(1)
+            return batch
+
+        stages = [
+            PipelineStage('infer', infer_stage, batch_size=inference_batch_size),
+            PipelineStage('analyze', analyze_stage),
+        ]
+        if render_video:
+            stages.append(PipelineStage('render', render_stage, workers=render_workers))
+            stages.append(PipelineStage('encode', encode_stage))
+        pipeline = Pipeline(decode_frames(cap, target_resolution, keep_source=ball_roi_detector is not None), stages,
+                            queue_size=pipeline_queue_size)
+        try:
+            pipeline_report = pipeline.run()
+        finally:
+            progress.close()
+            cap.release()
+            if out_video is not None:
+                out_video.release()
+    except BaseException:
+        abort_outputs()
+        raise
+    finally:
+        for path in acquired_models:
+            model_registry.release(path, str(device), model_precision)
+        # Cached outputs stay valid when the job fails, so a retry resumes from them
+        for cache in (object_cache, keypoint_cache):
+            if cache is not None:
+                cache.flush()
+
+    print("Pipeline stages:\n" + format_pipeline_report(pipeline_report))
+    for metrics in model_registry.metrics():
+        print(f"Model metrics: {metrics}")
+    if object_cache is not None:
+        print(f"Detection cache: objects {object_cache.summary()}, keypoints {keypoint_cache.summary()}")
+    if team_cache is not None:
+        print(f"Team cache: {team_cache.summary()}")
+    print(f"Homography: {position_mapper.stats}")
+    if keypoint_scheduler is not None:
+        print(f"Keypoint schedule: {keypoint_scheduler.summary()}")
+    if detection_scheduler is not None:
+        print(f"Detection schedule: {detection_scheduler.summary()}")
+    if ball_roi_detector is not None:
+        print(f"Ball ROI detection: {ball_roi_detector.summary()}")
+    if gate is not None:
+        print(f"Scene gate: {gate.summary()}")
+    if run_stats is not None:
+        run_stats['pipeline'] = pipeline_report
+        run_stats['homography'] = dict(position_mapper.stats)
+        if keypoint_scheduler is not None:
+            run_stats['keypoint_schedule'] = keypoint_scheduler.summary()
+        if detection_scheduler is not None:
+            run_stats['detection_schedule'] = detection_scheduler.summary()
+        if ball_roi_detector is not None:
+            run_stats['ball_roi'] = ball_roi_detector.summary()
+        if gate is not None:
+            run_stats['scene_gate'] = gate.summary()
+    frame_count = pipeline_report['analyze']['items']
+    print(f"✅ Processed {frame_count} frames")
+    if render_video:
+        print(f"🎬 Annotated video saved at '{output_video_path}'")
+
+    # Save match summary and tracks
+    try:
+        summary = match_analyzer.summary() if write_summary else None
+        if gate is not None and write_summary:
+            summary['scene_segments'] = gate.segments
+        object_record_fn = None
+        if track_store is not None:
+            if gate is not None:
+                track_store.attrs['scene_segments'] = gate.segments
+            track_store.close()
+            if online_teams:
+                # Frames emitted before the online classifier converged may carry the other team;
+                # give every track its majority team in the store, the track streams and the summary
+                print(f"Online team classifier ran {team_classifier.online_updates} updates")
+                reconciled_teams = reconcile_track_teams(track_store_dir)
+                if reconciled_teams:
+                    print(f"Reconciled the team of {len(reconciled_teams)} tracks")
+                    object_record_fn = lambda record: reconcile_record_teams(record, reconciled_teams, team_colors)
+                    if write_summary:
+                        summary = analyze_track_store(track_store_dir)
+            if not keep_track_store:
+                shutil.rmtree(track_store_dir, ignore_errors=True)
+        if write_tracks:
+            json_writer.close(legacy_json=legacy_track_json, object_record_fn=object_record_fn)
+            print(f"📄 Object tracks saved to '{object_tracks_path}'")
+            print(f"📄 Keypoint tracks saved to '{keypoint_tracks_path}'")
+            print(f"📄 Track store saved to '{track_store_dir}'")
+        if write_summary:
+            json_writer.write_summary(summary)
+            print(f"📄 Match summary saved to '{summary_json_path}'")
+            save_event_frames(summary, events_dir, staged_events_dir, input_video_path, target_resolution)
+            print(f"📸 Event frames saved to '{events_dir}'")
         else:
-            # No ball detected
-            current_possession_team = None
-            last_closest_player = None
-
-        # Record possession for this frame
-        if current_possession_team in ["Team A", "Team B"]:
-            summary_data["possessions"].append({
-                "frame": frame_idx,
-                "team": current_possession_team
-            })
-
-        # Manage goal overlay display
-        if display_goal_overlay and goal_overlay_frames > 0:
-            goal_overlay_frames -= 1
-            goal_frame_counter += 1
-            if goal_overlay_frames == 0:
-                display_goal_overlay = False
-                goal_frame_counter = 0
-
-        # Save tracking data to JSON
-        json_writer.write_object_tracks(all_tracks[frame_idx]['object'])
-        json_writer.write_keypoint_tracks(all_tracks[frame_idx]['keypoints'])
-
-        # Draw annotations
-        annotated = frame.copy()
-        for i, tracker_id in enumerate(all_detections.tracker_id):
-            class_id = all_detections.class_id[i]
-            if class_id == BALL_CLASS_ID:
-                continue
-                
-            team_id = all_detections.team_id[i] if hasattr(all_detections, 'team_id') else 2
-            if tracker_id in goalkeepers_detections.tracker_id:
-                obj_cls = 'goalkeeper'
-                color = team_colors[0] if team_id == 0 else team_colors[1] if team_id == 1 else (0, 0, 0)
-            elif tracker_id in referees_detections.tracker_id:
-                obj_cls = 'referee'
-                color = (0, 0, 0)
-            else:
-                obj_cls = 'player'
-                color = team_colors[0] if team_id == 0 else team_colors[1] if team_id == 1 else (0, 0, 0)
-
-            xyxy = all_detections.xyxy[i]
-            speed = player_speeds[tracker_id]
-            distance = player_distances[tracker_id]
-            annotated = draw_player_stats(annotated, xyxy, color, tracker_id, speed, distance, obj_cls, team_id)
-
-            # Draw red triangle above closest player
-            if tracker_id == closest_player and obj_cls in ['player', 'goalkeeper']:
-                x1, y1, x2, y2 = map(int, xyxy)
-                cx = (x1 + x2) // 2
-                cy = int(y1)
-                pts = np.array([[cx, cy - 40], [cx - 15, cy - 70], [cx + 15, cy - 70]], np.int32)
-                cv2.fillPoly(annotated, [pts], (0, 0, 255))
-                cv2.polylines(annotated, [pts], True, (0, 0, 0), 1)
-
-        # Draw ball annotations
-        if len(ball_detections) > 0:
-            for xyxy in ball_detections.xyxy:
-                x1, y1, x2, y2 = map(int, xyxy)
-                cx = (x1 + x2) // 2
-                cy = (y1 + y2) // 2
-                cv2.circle(annotated, (cx, cy), 5, (0, 255, 255), -1)
-                cv2.ellipse(annotated, (cx, cy), (20, 10), 0, 0, 360, (255, 255, 0), 2)
-                pts = np.array([[cx, cy - 40], [cx - 15, cy - 70], [cx + 15, cy - 70]], np.int32)
-                cv2.fillPoly(annotated, [pts], (0, 255, 255))
-                cv2.polylines(annotated, [pts], True, (0, 0, 0), 1)
-
-        # Draw ball path
-        cleaned_positions = clean_ball_path(ball_positions)
-        smoothed_positions = smooth_positions(cleaned_positions) if len(cleaned_positions) >= smoothing_window else cleaned_positions
-        for i in range(1, len(smoothed_positions)):
-            alpha = 0.3 + 0.7 * (i / len(smoothed_positions))
-            color = (0, int(255 * alpha), int(255 * alpha))
-            thickness = max(1, int(3 * alpha))
-            cv2.line(annotated, smoothed_positions[i-1], smoothed_positions[i], color, thickness)
-
-        # Calculate and display ball speed
-        speed_kmph = 0
-        if len(smoothed_positions) >= 2:
-            dx = smoothed_positions[-1][0] - smoothed_positions[-2][0]
-            dy = smoothed_positions[-1][1] - smoothed_positions[-2][1]
-            distance_pixels = np.sqrt(dx ** 2 + dy ** 2)
-            distance_meters = distance_pixels / pixels_per_meter
-            speed_mps = distance_meters / time_per_frame
-            speed_kmph = min(speed_mps * 3.6, 50.0)
-            cv2.putText(annotated, f"Ball Speed: {speed_kmph:.1f} km/h", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-
-        # Draw possession bar
-        total_possession = sum(summary_data["team_stats"][team]["possession"] for team in ["Team A", "Team B"])
+            shutil.rmtree(staged_events_dir, ignore_errors=True)
+        print(f"📸 Team sample crops saved to '{team_samples_dir}'")
+        if team_profile_path and team_classifier.is_fitted:
+            # Saved after the main pass so the profile includes the online refinements
+            with open(team_profile_path, 'w') as f:
+                json.dump(team_classifier.to_profile(), f)
+            print(f"📄 Kit profile saved to '{team_profile_path}'")
+    except BaseException:
+        abort_outputs()
+        raise
+
+    return True
+
+def rerender_video(
+    input_video_path,
+    track_store_dir,
+    summary_json_path,
+    output_video_path,
+    field_image_path="media/input_videos/field_2d_v2.png",
+    team_colors=None,
+    show_voronoi=True,
+    pixels_per_meter=10,
+    max_history=30,
+    canvas_width=1920,
+    canvas_height=1280,
+    goal_overlay_duration=30,
+    pipeline_queue_size=8,
+    render_workers=2
+):
+    """
+    Rebuild the annotated video from the stored tracks, the match summary and the source video.
+
+    No model is loaded: player boxes, teams, projections and the ball come from the track
+    store, possession and goals from the summary, and speeds, distances and the ball path
+    are recomputed from the stored boxes. Frames the scene gate skipped are copied
+    unannotated, as in the original output. The frames then go through the same render and
+    encode stages as main_processing.
+
+    Args:
+        input_video_path: Path to the source video
+        track_store_dir: Directory of the video's columnar track store
+        summary_json_path: Path of the match summary JSON
+        output_video_path: Path for the annotated output video
+        field_image_path: Path to the field image for projection view
+        team_colors: Colors for Team A and Team B (defaults to the colors stored with the tracks)
+        show_voronoi: Shade the Voronoi regions in the projection view
+        pixels_per_meter: Conversion ratio from pixels to meters
+        max_history: Maximum history length for tracking
+        canvas_width: Width of the output canvas
+        canvas_height: Height of the output canvas
+        goal_overlay_duration: Duration of goal overlay in frames
+        pipeline_queue_size: Capacity of the bounded queues between the stages
+        render_workers: Number of threads drawing annotated frames
+
+    Returns:
+        bool: True if rendering was successful
+    """
+    for path in [input_video_path, summary_json_path, field_image_path]:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"File not found at {path}")
+    reader = TrackStoreReader(track_store_dir)
+    with open(summary_json_path, 'r') as f:
+        summary_data = json.load(f)
+    projection_frame = cv2.imread(field_image_path)
+    if projection_frame is None:
+        raise RuntimeError(f"Failed to load field image from {field_image_path}")
+
+    fps = reader.attrs.get('fps') or 30
+    target_resolution = tuple(reader.attrs.get('resolution', (1920, 1280)))
+    team_colors = [tuple(int(c) for c in color) for color in (team_colors or reader.attrs.get('team_colors') or [(255, 255, 255), (0, 255, 0)])]
+    print(f"Re-rendering {reader.num_frames} frames at {target_resolution[0]}x{target_resolution[1]} with team colors {team_colors}")
+
+    # Cumulative possession per frame, as counted while processing
+    num_frames = reader.num_frames
+    possession_counts = np.zeros((2, max(num_frames, 1)), dtype=np.int64)
+    for possession in summary_data.get('possessions', []):
+        if possession['team'] in ('Team A', 'Team B') and possession['frame'] < num_frames:
+            possession_counts[0 if possession['team'] == 'Team A' else 1, possession['frame']] += 1
+    possession_counts = np.cumsum(possession_counts, axis=1)
+    goal_frames = {goal['frame'] for goal in summary_data.get('goals', [])}
+    skipped_frames = non_pitch_frames(reader.attrs.get('scene_segments', []), num_frames)
+
+    motion = MatchAnalyzer(fps=fps, params={'pixels_per_meter': pixels_per_meter}, max_history=max_history)
+    store_frames = reader.iter_frames(chunk_frames=256)
+    goal_state = {'frames_left': 0, 'counter': 0}
+    projection_annotator = ProjectionAnnotator(show_voronoi=show_voronoi)
+
+    def replay_frame(item):
+        frame_idx = item['frame_idx']
+        rows = None
+        if frame_idx < num_frames:
+            stored_idx, rows = next(store_frames)
+            if stored_idx != frame_idx:
+                raise RuntimeError(f"Track store is out of step with the video: expected frame {frame_idx}, got frame {stored_idx}")
+            if skipped_frames[frame_idx]:
+                # Frames the scene gate skipped were not analyzed and are copied unannotated
+                if frame_idx == 0 or not skipped_frames[frame_idx - 1]:
+                    motion.reset_continuity()
+                item['overlay'] = None
+                return
+        if rows is None or len(rows['frame']) == 0:
+            tracker_ids = np.zeros(0, dtype=np.int32)
+            class_ids = np.zeros(0, dtype=np.int8)
+            team_ids = np.zeros(0, dtype=np.int8)
+            xyxy = np.zeros((0, 4), dtype=np.float32)
+            projections = np.zeros((0, 2), dtype=np.float32)
+            has_ball = np.zeros(0, dtype=bool)
+        else:
+            tracker_ids, class_ids, team_ids = rows['tracker_id'], rows['class_id'], rows['team_id']
+            xyxy = rows['bbox'].astype(np.float64)
+            projections, has_ball = rows['projection'], rows['has_ball']
+
+        # The selected ball is stored under a fixed tracker ID; other ball rows are ByteTrack tracks
+        ball_rows = np.flatnonzero((class_ids == BALL_CLASS_ID) & (tracker_ids == BALL_TRACKER_ID))
+        ball_position = None
+        ball_boxes = []
+        if len(ball_rows) > 0:
+            x1, y1, x2, y2 = xyxy[ball_rows[0]]
+            ball_position = (int((x1 + x2) / 2), int((y1 + y2) / 2))
+            ball_boxes = [xyxy[ball_rows[0]]]
+        tracked = np.ones(len(tracker_ids), dtype=bool)
+        tracked[ball_rows] = False
+        motion.update_motion(tracker_ids[tracked], class_ids[tracked], xyxy[tracked], ball_position)
+        closest_player, _, _ = motion.closest_to_ball(tracker_ids[tracked], class_ids[tracked], xyxy[tracked])
+
+        # Goal overlay state machine, driven by the goals of the summary
+        if frame_idx in goal_frames:
+            goal_state['frames_left'] = goal_overlay_duration
+            goal_state['counter'] = 0
+        goal_frame_counter = None
+        if goal_state['frames_left'] > 0:
+            goal_state['frames_left'] -= 1
+            goal_state['counter'] += 1
+            goal_frame_counter = goal_state['counter'] if goal_state['frames_left'] > 0 else None
+            if goal_state['frames_left'] == 0:
+                goal_state['counter'] = 0
+
+        team_stats = {team: {"possession_percentage": 0} for team in ("Team A", "Team B")}
+        counts = possession_counts[:, min(frame_idx, possession_counts.shape[1] - 1)]
+        total_possession = int(counts[0] + counts[1])
         if total_possession > 0:
-            for team in ["Team A", "Team B"]:
-                possession_count = summary_data["team_stats"][team]["possession"]
-                summary_data["team_stats"][team]["possession_percentage"] = round(100 * possession_count / total_possession, 1)
-        annotated = draw_possession_bar(annotated, summary_data["team_stats"], team_colors)
-
-        # Apply goal overlay if active
-        if display_goal_overlay:
-            annotated = draw_goal_overlay(annotated, canvas_width, canvas_height, frame_counter=goal_frame_counter, total_duration=goal_overlay_duration)
-        
-        # Annotate projection frame
-        projection_frame_copy = projection_frame.copy()
-        projection_frame_copy = projection_annotator.annotate(projection_frame_copy, all_tracks[frame_idx]['object'])
-
-        # Add projection frame to canvas
-        h_frame, w_frame, _ = annotated.shape
-        h_proj, w_proj, _ = projection_frame.shape
-        scale_proj = 0.8
-        new_w_proj = int(w_proj * scale_proj)
-        new_h_proj = int(h_proj * scale_proj)
-        projection_resized = cv2.resize(projection_frame_copy, (new_w_proj, new_h_proj))
-        combined_frame = np.zeros((canvas_height, canvas_width, 3), dtype=np.uint8)
-        combined_frame[:h_frame, :w_frame] = annotated
-        x_offset = (canvas_width - new_w_proj) // 2
-        y_offset = canvas_height - new_h_proj - 25
-        alpha = 0.75
-        overlay = combined_frame[y_offset:y_offset + new_h_proj, x_offset:x_offset + new_w_proj]
-        cv2.addWeighted(projection_resized, alpha, overlay, 1 - alpha, 0, overlay)
-
-        # Write output video
-        out_video.write(combined_frame)
-
-        # Clean up
-        del frame, frame_for_player_detection, frame_for_keypoint_detection, annotated, combined_frame, projection_frame_copy
-        gc.collect()
-        frame_idx += 1
+            team_stats["Team A"]["possession_percentage"] = round(100 * int(counts[0]) / total_possession, 1)
+            team_stats["Team B"]["possession_percentage"] = round(100 * int(counts[1]) / total_possession, 1)
 
-    cap.release()
-    out_video.release()
-    print(f"✅ Processed {frame_idx} frames and saved video at '{output_video_path}'")
-
-    # Final possession percentages
-    total_possession = sum(summary_data["team_stats"][team]["possession"] for team in ["Team A", "Team B"])
-    if total_possession > 0:
-        for team in ["Team A", "Team B"]:
-            possession_count = summary_data["team_stats"][team]["possession"]
-            summary_data["team_stats"][team]["possession_percentage"] = round(100 * possession_count / total_possession, 1)
-
-    # Player ranking statistics
-    player_stats = summary_data["player_stats"]
-    if player_stats:
-        player_stats_filtered = {pid: stat for pid, stat in player_stats.items() if stat["team"] != "Referee"}
-        top_distance = sorted(player_stats_filtered.items(), key=lambda x: x[1]["total_distance_m"], reverse=True)[:5]
-        top_speed = sorted(player_stats_filtered.items(), key=lambda x: x[1]["max_speed_kmph"], reverse=True)[:5]
-        top_avg_speed = sorted(player_stats_filtered.items(), key=lambda x: x[1]["avg_speed_kmph"], reverse=True)[:5]
-        
-        # Add shots to rankings
-        top_shooters = []
-        for player_id, _ in player_stats_filtered.items():
-            player_shots = [shot for shot in summary_data["shots"] if str(shot["player_id"]) == player_id]
-            if player_shots:
-                team = player_stats_filtered[player_id]["team"]
-                shots_count = len(player_shots)
-                on_target = len([shot for shot in player_shots if shot.get("on_target", False)])
-                top_shooters.append((player_id, shots_count, on_target, team))
-        
-        top_shooters.sort(key=lambda x: x[1], reverse=True)
-        top_shooters = top_shooters[:5]
-        
-        summary_data["rankings"] = {
-            "distance": [{"player_id": int(pid), "distance_m": stat["total_distance_m"], "team": stat["team"]} for pid, stat in top_distance],
-            "max_speed": [{"player_id": int(pid), "speed_kmph": stat["max_speed_kmph"], "team": stat["team"]} for pid, stat in top_speed],
-            "avg_speed": [{"player_id": int(pid), "speed_kmph": stat["avg_speed_kmph"], "team": stat["team"]} for pid, stat in top_avg_speed],
-            "top_shooters": [{"player_id": int(pid), "shots": shots, "on_target": on_target, "team": team} for pid, shots, on_target, team in top_shooters]
+        objects = []
+        object_tracks = {'player': {}, 'goalkeeper': {}, 'referee': {}, 'ball': {}}
+        for i in range(len(tracker_ids)):
+            class_name = CLASS_ID_TO_NAME.get(int(class_ids[i]), 'ball')
+            tracker_id = int(tracker_ids[i])
+            team_id = int(team_ids[i])
+            if class_name == 'ball':
+                club_color = (0, 255, 255)
+            else:
+                club_color = team_colors[0] if team_id == 0 else team_colors[1] if team_id == 1 else (0, 0, 0)
+                if tracked[i]:
+                    objects.append((xyxy[i], tracker_id, class_name, team_id,
+                                    motion.player_speeds[tracker_id], motion.player_distances[tracker_id]))
+            track_info = {'club_color': club_color, 'has_ball': bool(has_ball[i])}
+            if not np.isnan(projections[i]).any():
+                track_info['projection'] = (float(projections[i][0]), float(projections[i][1]))
+            object_tracks[class_name][tracker_id] = track_info
+
+        trail, ball_speed_kmph = motion.ball_trail()
+        item['overlay'] = {
+            'objects': objects,
+            'closest_player': closest_player,
+            'ball_boxes': ball_boxes,
+            'ball_trail': trail,
+            'ball_speed_kmph': ball_speed_kmph,
+            'team_stats': team_stats,
+            'goal_frame_counter': goal_frame_counter,
+            'object_tracks': object_tracks
         }
 
-    # Save match summary and tracks
-    json_writer.write_summary(summary_data)
-    print(f"📄 Match summary saved to '{summary_json_path}'")
-    print(f"📄 Object tracks saved to '{object_tracks_path}'")
-    print(f"📄 Keypoint tracks saved to '{keypoint_tracks_path}'")
-    print(f"📸 Team sample crops saved to '{team_samples_dir}'")
-    print(f"📸 Event frames saved to '{events_dir}'")
-    
-    return True
\ No newline at end of file
+    def replay_stage(batch):
+        for item in batch:
+            replay_frame(item)
+        return batch
+
+    def render_stage(batch):
+        for item in batch:
+            overlay = item.pop('overlay')
+            if overlay is None:
+                item['canvas'] = render_passthrough(item.pop('frame'), canvas_width, canvas_height)
+                continue
+            item['canvas'] = render_frame(
+                item.pop('frame'), overlay, team_colors, projection_frame, projection_annotator,
+                canvas_width, canvas_height, goal_overlay_duration
+            )
+        return batch
+
+    cap = cv2.VideoCapture(input_video_path)
+    out_video = cv2.VideoWriter(
+        output_video_path,
+        cv2.VideoWriter_fourcc(*'avc1'),
+        fps,
+        (canvas_width, canvas_height)
+    )
+    progress = tqdm(total=num_frames, desc="Rendering frames")
+
+    def encode_stage(batch):
+        for item in batch:
+            out_video.write(item.pop('canvas'))
+            progress.update(1)
+        return batch
+
+    pipeline = Pipeline(
+        decode_frames(cap, target_resolution),
+        [
+            PipelineStage('replay', replay_stage),
+            PipelineStage('render', render_stage, workers=render_workers),
+            PipelineStage('encode', encode_stage),
+        ],
+        queue_size=pipeline_queue_size
+    )
+    try:
+        pipeline_report = pipeline.run()
+    finally:
+        progress.close()
+        cap.release()
+        out_video.release()
+
+    print("Pipeline stages:\n" + format_pipeline_report(pipeline_report))
+    print(f"🎬 Re-rendered {pipeline_report['encode']['items']} frames to '{output_video_path}'")
+    return True
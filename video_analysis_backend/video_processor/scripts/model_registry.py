@@ -0,0 +1,187 @@
+import os
+import time
+import threading
+import numpy as np
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from ultralytics import YOLO
+
+try:
+    import psutil
+except ImportError:  # psutil is optional; memory metrics then fall back to parameter sizes only
+    psutil = None
+
+ModelKey = Tuple[str, str, str]
+
+
+def _rss_bytes() -> Optional[int]:
+    """Returns the resident set size of this process, or None without psutil."""
+    if psutil is None:
+        return None
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+class ModelHandle:
+    """A loaded model plus the bookkeeping the registry keeps for it."""
+
+    def __init__(self, key: ModelKey) -> None:
+        self.key = key
+        self.model: Optional[YOLO] = None
+        self.refcount = 0
+        self.uses = 0
+        self.load_seconds = 0.0
+        self.warmup_seconds = 0.0
+        self.param_bytes = 0
+        self.rss_delta_bytes: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def metrics(self) -> Dict:
+        """Returns load-time and memory metrics of the model."""
+        path, device, precision = self.key
+        return {
+            'path': path,
+            'device': device,
+            'precision': precision,
+            'loaded': self.model is not None,
+            'refcount': self.refcount,
+            'uses': self.uses,
+            'load_seconds': round(self.load_seconds, 3),
+            'warmup_seconds': round(self.warmup_seconds, 3),
+            'param_bytes': self.param_bytes,
+            'rss_delta_bytes': self.rss_delta_bytes,
+        }
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of YOLO models keyed by (path, device, precision).
+
+    Models are loaded lazily on first acquire, warmed up with one inference so the
+    predictor setup cost is not paid by the first real frame, and shared by every
+    caller in the process. Reference counts track current users; models with no users
+    stay loaded for the next job until ``evict_idle`` is called.
+    """
+
+    def __init__(self) -> None:
+        self._handles: Dict[ModelKey, ModelHandle] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(path: str, device: str = 'cpu', precision: str = 'fp32') -> ModelKey:
+        """
+        Normalize a (path, device, precision) triple into a registry key.
+
+        fp16 only takes effect on CUDA, so elsewhere it maps to the fp32 key and shares that model.
+        """
+        if precision not in ('fp32', 'fp16'):
+            raise ValueError(f"Unsupported precision '{precision}' (expected 'fp32' or 'fp16')")
+        device = str(device)
+        if not device.startswith('cuda'):
+            precision = 'fp32'
+        return os.path.abspath(path), device, precision
+
+    def _load(self, handle: ModelHandle, warmup_imgsz: Optional[Tuple[int, int]]) -> None:
+        """Load, move and warm up the model of a handle."""
+        path, device, precision = handle.key
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        model = YOLO(path).to(device)
+        if precision == 'fp16':  # Only on CUDA, see make_key
+            model.overrides['half'] = True
+        handle.load_seconds = time.perf_counter() - started
+        handle.param_bytes = int(sum(p.numel() * p.element_size() for p in model.model.parameters()))
+
+        if warmup_imgsz is not None:
+            started = time.perf_counter()
+            try:
+                width, height = warmup_imgsz
+                model.predict(np.zeros((height, width, 3), dtype=np.uint8), verbose=False)
+            except Exception as e:
+                print(f"Warm-up inference failed for {path}: {e}")
+            handle.warmup_seconds = time.perf_counter() - started
+
+        rss_after = _rss_bytes()
+        if rss_before is not None and rss_after is not None:
+            handle.rss_delta_bytes = rss_after - rss_before
+        handle.model = model
+        print(f"Loaded model {path} on {device} ({precision}) in {handle.load_seconds:.2f}s, "
+              f"warm-up {handle.warmup_seconds:.2f}s, {handle.param_bytes / 1e6:.1f} MB of parameters")
+
+    def acquire(
+        self,
+        path: str,
+        device: str = 'cpu',
+        precision: str = 'fp32',
+        warmup_imgsz: Optional[Tuple[int, int]] = None
+    ) -> YOLO:
+        """
+        Get the shared model for a key, loading it on first use, and take a reference.
+
+        Args:
+            path (str): Path to the YOLO weights.
+            device (str): Torch device the model runs on.
+            precision (str): 'fp32' or 'fp16' (fp16 only takes effect on CUDA).
+            warmup_imgsz (Optional[Tuple[int, int]]): (width, height) of the warm-up frame; None skips warm-up.
+
+        Returns:
+            YOLO: The shared model. Pair every acquire with a release.
+        """
+        key = self.make_key(path, device, precision)
+        with self._lock:
+            handle = self._handles.setdefault(key, ModelHandle(key))
+        with handle.lock:
+            if handle.model is None:
+                self._load(handle, warmup_imgsz)
+            handle.refcount += 1
+            handle.uses += 1
+            return handle.model
+
+    def release(self, path: str, device: str = 'cpu', precision: str = 'fp32') -> None:
+        """Drop a reference taken by acquire. The model stays loaded for later users."""
+        key = self.make_key(path, device, precision)
+        handle = self._handles.get(key)
+        if handle is None:
+            return
+        with handle.lock:
+            handle.refcount = max(0, handle.refcount - 1)
+
+    @contextmanager
+    def use(self, path: str, device: str = 'cpu', precision: str = 'fp32', warmup_imgsz: Optional[Tuple[int, int]] = None):
+        """Context manager around acquire/release."""
+        model = self.acquire(path, device, precision, warmup_imgsz)
+        try:
+            yield model
+        finally:
+            self.release(path, device, precision)
+
+    def evict_idle(self) -> int:
+        """
+        Unload every model that currently has no users.
+
+        Returns:
+            int: Number of models unloaded.
+        """
+        evicted = 0
+        with self._lock:
+            for key, handle in list(self._handles.items()):
+                with handle.lock:
+                    if handle.refcount == 0 and handle.model is not None:
+                        handle.model = None
+                        del self._handles[key]
+                        evicted += 1
+        if evicted:
+            try:
+                import torch
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            except ImportError:
+                pass
+        return evicted
+
+    def metrics(self) -> List[Dict]:
+        """Returns load-time and memory metrics for every registered model."""
+        with self._lock:
+            return [handle.metrics() for handle in self._handles.values()]
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,298 @@
+import time
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+_END = object()  # End-of-stream marker passed through the queues
+
+
+class _PipelineStopped(Exception):
+    """Raised inside stage threads when another stage failed and the pipeline is shutting down."""
+
+
+class PipelineStage:
+    """
+    One stage of a Pipeline.
+
+    ``fn`` receives a list of payloads (up to ``batch_size``, consecutive and in frame
+    order) and must return a list of output payloads of the same length. A stage with
+    several workers runs batches concurrently; the next stage restores the order.
+    """
+
+    def __init__(self, name: str, fn: Callable[[List[Any]], List[Any]], batch_size: int = 1, workers: int = 1) -> None:
+        """
+        Initializes the PipelineStage.
+
+        Args:
+            name (str): Stage name used in the occupancy report.
+            fn (Callable[[List[Any]], List[Any]]): Batch function of the stage.
+            batch_size (int): Maximum number of payloads passed to one call of ``fn``.
+            workers (int): Number of threads running ``fn``. Stateful stages must use 1.
+        """
+        self.name = name
+        self.fn = fn
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+
+
+class _StageRunner:
+    """Runtime state of a stage: ordered batched reads from its input queue, workers and statistics."""
+
+    def __init__(self, stage: PipelineStage, in_queue: queue.Queue, out_queue: Optional[queue.Queue], pipeline: 'Pipeline') -> None:
+        self.stage = stage
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.pipeline = pipeline
+        self.lock = threading.Lock()
+        self.pending: Dict[int, Any] = {}  # Reorder buffer for outputs of a multi-worker upstream stage
+        self.next_seq = 0
+        self.ended = False
+        self.active_workers = stage.workers
+        self.stats = {'items': 0, 'batches': 0, 'busy_seconds': 0.0, 'wait_input_seconds': 0.0, 'wait_output_seconds': 0.0}
+
+    def _next_item(self):
+        """Return the next ``(seq, payload)`` in sequence order, or None at end of stream. Caller holds the lock."""
+        while True:
+            if self.next_seq in self.pending:
+                seq = self.next_seq
+                self.next_seq += 1
+                return seq, self.pending.pop(seq)
+            if self.ended:
+                return None
+            started = time.perf_counter()
+            entry = self.pipeline._get(self.in_queue)
+            self.stats['wait_input_seconds'] += time.perf_counter() - started
+            if entry is _END:
+                self.ended = True
+            else:
+                self.pending[entry[0]] = entry[1]
+
+    def _take_batch(self) -> List:
+        with self.lock:
+            batch = []
+            while len(batch) < self.stage.batch_size:
+                item = self._next_item()
+                if item is None:
+                    break
+                batch.append(item)
+            return batch
+
+    def work(self) -> None:
+        try:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                seqs = [seq for seq, _ in batch]
+                started = time.perf_counter()
+                outputs = self.stage.fn([payload for _, payload in batch])
+                elapsed = time.perf_counter() - started
+                if len(outputs) != len(batch):
+                    raise RuntimeError(f"Stage '{self.stage.name}' returned {len(outputs)} outputs for {len(batch)} inputs")
+                with self.lock:
+                    self.stats['busy_seconds'] += elapsed
+                    self.stats['items'] += len(batch)
+                    self.stats['batches'] += 1
+                if self.out_queue is not None:
+                    started = time.perf_counter()
+                    for seq, output in zip(seqs, outputs):
+                        self.pipeline._put(self.out_queue, (seq, output))
+                    with self.lock:
+                        self.stats['wait_output_seconds'] += time.perf_counter() - started
+        except _PipelineStopped:
+            return
+        except BaseException as e:
+            self.pipeline._fail(self.stage.name, e)
+            return
+
+        with self.lock:
+            self.active_workers -= 1
+            last_worker = self.active_workers == 0
+        if last_worker and self.out_queue is not None:
+            try:
+                self.pipeline._put(self.out_queue, _END)
+            except _PipelineStopped:
+                pass
+
+
+class Pipeline:
+    """
+    Runs a source iterator and a chain of stages in threads connected by bounded queues.
+
+    Bounded queues give backpressure: a slow stage fills its input queue and blocks the
+    stages before it instead of letting frames pile up in memory. Payloads carry a
+    sequence number so every stage sees them in source order even behind a multi-worker
+    stage. A monitor thread samples the queue sizes, and ``run`` returns per-stage busy
+    time, wait times and queue occupancy, which shows the stage that limits throughput.
+    """
+
+    def __init__(
+        self,
+        source: Iterable[Any],
+        stages: List[PipelineStage],
+        queue_size: int = 8,
+        source_name: str = 'decode',
+        monitor_interval: float = 0.05
+    ) -> None:
+        """
+        Initializes the Pipeline.
+
+        Args:
+            source (Iterable[Any]): Iterator producing the payloads, run in its own thread.
+            stages (List[PipelineStage]): Stages in processing order; the last one is the sink.
+            queue_size (int): Capacity of each queue between two stages.
+            source_name (str): Name of the source in the report.
+            monitor_interval (float): Seconds between queue occupancy samples.
+        """
+        self.source = source
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.source_name = source_name
+        self.monitor_interval = monitor_interval
+        self._stop_event = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._error_stage: Optional[str] = None
+        self._error_lock = threading.Lock()
+
+    def _fail(self, stage_name: str, error: BaseException) -> None:
+        with self._error_lock:
+            if self._error is None:
+                self._error = error
+                self._error_stage = stage_name
+        self._stop_event.set()
+
+    def _get(self, q: queue.Queue) -> Any:
+        while True:
+            if self._stop_event.is_set():
+                raise _PipelineStopped()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _put(self, q: queue.Queue, item: Any) -> None:
+        while True:
+            if self._stop_event.is_set():
+                raise _PipelineStopped()
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def run(self) -> Dict[str, Dict]:
+        """
+        Run the pipeline to completion.
+
+        Returns:
+            Dict[str, Dict]: Per-stage statistics, in pipeline order.
+
+        Raises:
+            Exception: The first exception raised by the source or any stage.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        runners = [
+            _StageRunner(stage, queues[i], queues[i + 1] if i + 1 < len(self.stages) else None, self)
+            for i, stage in enumerate(self.stages)
+        ]
+        source_stats = {'items': 0, 'busy_seconds': 0.0, 'wait_output_seconds': 0.0}
+        occupancy = [{'samples': 0, 'total': 0, 'max': 0} for _ in queues]
+
+        def produce():
+            try:
+                iterator = iter(self.source)
+                seq = 0
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        payload = next(iterator)
+                    except StopIteration:
+                        break
+                    source_stats['busy_seconds'] += time.perf_counter() - started
+                    started = time.perf_counter()
+                    self._put(queues[0], (seq, payload))
+                    source_stats['wait_output_seconds'] += time.perf_counter() - started
+                    source_stats['items'] += 1
+                    seq += 1
+                self._put(queues[0], _END)
+            except _PipelineStopped:
+                return
+            except BaseException as e:
+                self._fail(self.source_name, e)
+
+        monitor_done = threading.Event()
+
+        def monitor():
+            while not monitor_done.wait(self.monitor_interval):
+                for q, stats in zip(queues, occupancy):
+                    size = q.qsize()
+                    stats['samples'] += 1
+                    stats['total'] += size
+                    stats['max'] = max(stats['max'], size)
+
+        threads = [threading.Thread(target=produce, name=f'pipeline-{self.source_name}', daemon=True)]
+        for runner in runners:
+            for worker_idx in range(runner.stage.workers):
+                threads.append(threading.Thread(target=runner.work, name=f'pipeline-{runner.stage.name}-{worker_idx}', daemon=True))
+        monitor_thread = threading.Thread(target=monitor, name='pipeline-monitor', daemon=True)
+
+        started = time.perf_counter()
+        monitor_thread.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        monitor_done.set()
+        monitor_thread.join()
+        wall_seconds = time.perf_counter() - started
+
+        if self._error is not None:
+            print(f"Pipeline stage '{self._error_stage}' failed: {self._error}")
+            raise self._error
+
+        report = {self.source_name: {
+            'items': source_stats['items'],
+            'workers': 1,
+            'busy_seconds': round(source_stats['busy_seconds'], 3),
+            'utilization': round(source_stats['busy_seconds'] / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+            'wait_output_seconds': round(source_stats['wait_output_seconds'], 3),
+        }}
+        for runner, stats in zip(runners, occupancy):
+            busy = runner.stats['busy_seconds']
+            report[runner.stage.name] = {
+                'items': runner.stats['items'],
+                'batches': runner.stats['batches'],
+                'workers': runner.stage.workers,
+                'busy_seconds': round(busy, 3),
+                'utilization': round(busy / (wall_seconds * runner.stage.workers), 3) if wall_seconds > 0 else 0.0,
+                'wait_input_seconds': round(runner.stats['wait_input_seconds'], 3),
+                'wait_output_seconds': round(runner.stats['wait_output_seconds'], 3),
+                'input_queue_mean': round(stats['total'] / stats['samples'], 2) if stats['samples'] else 0.0,
+                'input_queue_max': stats['max'],
+                'input_queue_capacity': self.queue_size,
+            }
+        report['_total'] = {'wall_seconds': round(wall_seconds, 3)}
+        return report
+
+
+def format_pipeline_report(report: Dict[str, Dict]) -> str:
+    """
+    Format a Pipeline.run report as a table, marking the most utilized stage as the bottleneck.
+
+    Args:
+        report (Dict[str, Dict]): Report returned by Pipeline.run.
+
+    Returns:
+        str: Human-readable table.
+    """
+    stages = {name: stats for name, stats in report.items() if not name.startswith('_')}
+    if not stages:
+        return "Empty pipeline report"
+    bottleneck = max(stages, key=lambda name: stages[name]['utilization'])
+    lines = [f"{'stage':<10} {'items':>7} {'busy s':>8} {'util':>6} {'in-queue mean/max':>18}"]
+    for name, stats in stages.items():
+        queue_info = f"{stats['input_queue_mean']}/{stats['input_queue_max']} of {stats['input_queue_capacity']}" if 'input_queue_mean' in stats else '-'
+        marker = '  <- bottleneck' if name == bottleneck else ''
+        lines.append(f"{name:<10} {stats['items']:>7} {stats['busy_seconds']:>8.2f} {stats['utilization']:>6.2f} {queue_info:>18}{marker}")
+    lines.append(f"wall time {report.get('_total', {}).get('wall_seconds', 0):.2f}s")
+    return "\n".join(lines)
@@ -16,6 +16,15 @@ class ProjectionAnnotator(AbstractAnnotator):
     Class to annotate projections on a projection image, including Voronoi regions for players (and goalkeepers), 
     and different markers for ball, players, referees, and goalkeepers.
     """
+    def __init__(self, show_voronoi: bool = True) -> None:
+        """
+        Initializes the ProjectionAnnotator.
+
+        Args:
+            show_voronoi (bool): Shade the Voronoi regions of players and goalkeepers.
+        """
+        self.show_voronoi = show_voronoi
+
     def _draw_outline(self, frame: np.ndarray, pos: tuple, shape: str = 'circle', size: int = 10, is_dark: bool = True) -> None:
         """
         Draws a white or black outline around the object based on its color and shape.
@@ -154,7 +163,8 @@ class ProjectionAnnotator(AbstractAnnotator):
                 return frame
                 
             # Apply Voronoi diagram
-            frame = self._draw_voronoi(frame, tracks)
+            if self.show_voronoi:
+                frame = self._draw_voronoi(frame, tracks)
 
             # Process each class of object
             for class_name in ['player', 'goalkeeper', 'referee', 'ball']:
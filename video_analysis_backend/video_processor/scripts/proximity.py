@@ -0,0 +1,60 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from typing import Optional, Tuple
+
+# Query/point pairs from which a KD-tree beats the full distance matrix
+KDTREE_MIN_PAIRS = 4096
+
+
+def box_centers(xyxy: np.ndarray) -> np.ndarray:
+    """
+    Centers of bounding boxes.
+
+    Args:
+        xyxy (np.ndarray): Boxes of shape (n, 4).
+
+    Returns:
+        np.ndarray: Centers of shape (n, 2), in the dtype of the boxes.
+    """
+    xyxy = np.asarray(xyxy).reshape(-1, 4)
+    return np.stack([(xyxy[:, 0] + xyxy[:, 2]) / 2, (xyxy[:, 1] + xyxy[:, 3]) / 2], axis=1)
+
+
+def nearest_neighbors(
+    points: np.ndarray,
+    queries: np.ndarray,
+    k: int = 1,
+    use_kdtree: Optional[bool] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rank the points nearest to each query point.
+
+    A frame has a few dozen detections, so by default the distances are computed as one
+    (queries x points) matrix; a KD-tree is built instead when there are many query/point pairs.
+
+    Args:
+        points (np.ndarray): Candidate points of shape (n, 2).
+        queries (np.ndarray): Query points of shape (m, 2).
+        k (int): Number of neighbors returned per query, at most n.
+        use_kdtree (Optional[bool]): Force or forbid the KD-tree; chosen by size when None.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Distances and point indices of shape (m, min(k, n)), nearest
+            first. Equal distances keep the order of the points.
+    """
+    points = np.asarray(points).reshape(-1, 2)
+    queries = np.asarray(queries).reshape(-1, 2)
+    k = min(k, len(points))
+    if k == 0 or len(queries) == 0:
+        return np.empty((len(queries), 0), dtype=np.float64), np.empty((len(queries), 0), dtype=np.int64)
+
+    if use_kdtree is None:
+        use_kdtree = len(points) * len(queries) >= KDTREE_MIN_PAIRS
+    if use_kdtree:
+        distances, indices = cKDTree(points).query(queries, k=k)
+        return distances.reshape(len(queries), k), indices.reshape(len(queries), k)
+
+    offsets = queries[:, None, :] - points[None, :, :]
+    distances = np.sqrt((offsets ** 2).sum(axis=2))
+    indices = np.argsort(distances, axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(distances, indices, axis=1), indices
@@ -0,0 +1,127 @@
+import cv2
+import numpy as np
+from typing import Dict, List, Tuple
+from .annotation import draw_player_stats, draw_possession_bar, draw_goal_overlay
+from .projection import ProjectionAnnotator
+
+
+def render_frame(
+    frame: np.ndarray,
+    overlay: Dict,
+    team_colors: List[Tuple[int, int, int]],
+    projection_frame: np.ndarray,
+    projection_annotator: ProjectionAnnotator,
+    canvas_width: int,
+    canvas_height: int,
+    goal_overlay_duration: int = 30
+) -> np.ndarray:
+    """
+    Draw the annotations of one frame and compose it with the top-down projection.
+
+    The function only reads its inputs, so frames can be rendered concurrently and
+    independently of the analysis that produced the overlay.
+
+    Args:
+        frame (np.ndarray): Frame at the processing resolution.
+        overlay (Dict): Per-frame drawing state with keys 'objects' (list of
+            (xyxy, tracker_id, obj_cls, team_id, speed, distance)), 'closest_player',
+            'ball_boxes', 'ball_trail', 'ball_speed_kmph' (None hides the label),
+            'team_stats', 'goal_frame_counter' (None hides the goal overlay) and
+            'object_tracks' (tracks dictionary for the projection).
+        team_colors (List[Tuple[int, int, int]]): Colors for Team A and Team B.
+        projection_frame (np.ndarray): Top-down field image.
+        projection_annotator (ProjectionAnnotator): Annotator for the projection view.
+        canvas_width (int): Width of the output canvas.
+        canvas_height (int): Height of the output canvas.
+        goal_overlay_duration (int): Duration of the goal overlay in frames.
+
+    Returns:
+        np.ndarray: The composed output frame.
+    """
+    annotated = frame.copy()
+    closest_player = overlay.get('closest_player')
+    for xyxy, tracker_id, obj_cls, team_id, speed, distance in overlay.get('objects', []):
+        if obj_cls == 'referee':
+            color = (0, 0, 0)
+        else:
+            color = team_colors[0] if team_id == 0 else team_colors[1] if team_id == 1 else (0, 0, 0)
+        annotated = draw_player_stats(annotated, xyxy, color, tracker_id, speed, distance, obj_cls, team_id)
+
+        # Draw red triangle above closest player
+        if tracker_id == closest_player and obj_cls in ['player', 'goalkeeper']:
+            x1, y1, x2, y2 = map(int, xyxy)
+            cx = (x1 + x2) // 2
+            cy = int(y1)
+            pts = np.array([[cx, cy - 40], [cx - 15, cy - 70], [cx + 15, cy - 70]], np.int32)
+            cv2.fillPoly(annotated, [pts], (0, 0, 255))
+            cv2.polylines(annotated, [pts], True, (0, 0, 0), 1)
+
+    # Draw ball annotations
+    for xyxy in overlay.get('ball_boxes', []):
+        x1, y1, x2, y2 = map(int, xyxy)
+        cx = (x1 + x2) // 2
+        cy = (y1 + y2) // 2
+        cv2.circle(annotated, (cx, cy), 5, (0, 255, 255), -1)
+        cv2.ellipse(annotated, (cx, cy), (20, 10), 0, 0, 360, (255, 255, 0), 2)
+        pts = np.array([[cx, cy - 40], [cx - 15, cy - 70], [cx + 15, cy - 70]], np.int32)
+        cv2.fillPoly(annotated, [pts], (0, 255, 255))
+        cv2.polylines(annotated, [pts], True, (0, 0, 0), 1)
+
+    # Draw ball path
+    trail = overlay.get('ball_trail', [])
+    for i in range(1, len(trail)):
+        alpha = 0.3 + 0.7 * (i / len(trail))
+        color = (0, int(255 * alpha), int(255 * alpha))
+        thickness = max(1, int(3 * alpha))
+        cv2.line(annotated, trail[i-1], trail[i], color, thickness)
+
+    # Display ball speed
+    if overlay.get('ball_speed_kmph') is not None:
+        cv2.putText(annotated, f"Ball Speed: {overlay['ball_speed_kmph']:.1f} km/h", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+
+    # Draw possession bar
+    annotated = draw_possession_bar(annotated, overlay['team_stats'], team_colors)
+
+    # Apply goal overlay if active
+    if overlay.get('goal_frame_counter') is not None:
+        annotated = draw_goal_overlay(annotated, canvas_width, canvas_height, frame_counter=overlay['goal_frame_counter'], total_duration=goal_overlay_duration)
+
+    # Annotate projection frame
+    projection_frame_copy = projection_annotator.annotate(projection_frame.copy(), overlay.get('object_tracks', {}))
+
+    # Add projection frame to canvas
+    h_frame, w_frame, _ = annotated.shape
+    h_proj, w_proj, _ = projection_frame.shape
+    scale_proj = 0.8
+    new_w_proj = int(w_proj * scale_proj)
+    new_h_proj = int(h_proj * scale_proj)
+    projection_resized = cv2.resize(projection_frame_copy, (new_w_proj, new_h_proj))
+    combined_frame = np.zeros((canvas_height, canvas_width, 3), dtype=np.uint8)
+    combined_frame[:h_frame, :w_frame] = annotated
+    x_offset = (canvas_width - new_w_proj) // 2
+    y_offset = canvas_height - new_h_proj - 25
+    alpha = 0.75
+    roi = combined_frame[y_offset:y_offset + new_h_proj, x_offset:x_offset + new_w_proj]
+    cv2.addWeighted(projection_resized, alpha, roi, 1 - alpha, 0, roi)
+    return combined_frame
+
+
+def render_passthrough(frame: np.ndarray, canvas_width: int, canvas_height: int) -> np.ndarray:
+    """
+    Place a frame on the output canvas without annotations or projection view.
+
+    Used for frames that were not analyzed (replays, close-ups, crowd shots), so the output
+    video keeps the source's timeline.
+
+    Args:
+        frame (np.ndarray): Frame at the processing resolution.
+        canvas_width (int): Width of the output canvas.
+        canvas_height (int): Height of the output canvas.
+
+    Returns:
+        np.ndarray: The output frame.
+    """
+    combined_frame = np.zeros((canvas_height, canvas_width, 3), dtype=np.uint8)
+    h_frame, w_frame = min(frame.shape[0], canvas_height), min(frame.shape[1], canvas_width)
+    combined_frame[:h_frame, :w_frame] = frame[:h_frame, :w_frame]
+    return combined_frame
@@ -0,0 +1,125 @@
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+
+class SceneGate:
+    """
+    Classifies frames as pitch view or not, so replays, close-ups and crowd shots can skip inference.
+
+    The test is cheap and runs on a thumbnail of the frame: the share of pitch-green pixels
+    (hue, saturation and value inside ``green_hsv_range``) must reach ``min_green_ratio``.
+    To avoid flickering between the two states, the gate only switches after
+    ``min_switch_frames`` consecutive frames disagree with the current state, or immediately
+    when the frame also starts a new shot, detected as a large change of the hue-saturation
+    histogram between consecutive frames.
+
+    Decisions are grouped into ``segments`` of consecutive frames with the same type
+    ('pitch' or 'non_pitch'), with inclusive frame bounds.
+    """
+
+    def __init__(
+        self,
+        min_green_ratio: float = 0.35,
+        min_switch_frames: int = 5,
+        cut_threshold: float = 0.5,
+        thumbnail_size: Tuple[int, int] = (64, 36),
+        green_hsv_range: Tuple[Tuple[int, int, int], Tuple[int, int, int]] = ((35, 40, 40), (85, 255, 255))
+    ) -> None:
+        """
+        Initializes the SceneGate.
+
+        Args:
+            min_green_ratio (float): Smallest share of green pixels of a pitch view.
+            min_switch_frames (int): Consecutive disagreeing frames after which the gate switches.
+            cut_threshold (float): Bhattacharyya distance between consecutive histograms that marks a cut.
+            thumbnail_size (Tuple[int, int]): Size frames are downscaled to before the tests.
+            green_hsv_range (Tuple): Lower and upper HSV bounds of pitch green (OpenCV hue scale 0-179).
+        """
+        self.min_green_ratio = min_green_ratio
+        self.min_switch_frames = max(1, min_switch_frames)
+        self.cut_threshold = cut_threshold
+        self.thumbnail_size = thumbnail_size
+        self.green_lower = np.array(green_hsv_range[0], dtype=np.uint8)
+        self.green_upper = np.array(green_hsv_range[1], dtype=np.uint8)
+        self.segments: List[Dict] = []
+        self.stats = {'frames': 0, 'pitch': 0, 'non_pitch': 0, 'cuts': 0}
+        self._on_pitch: Optional[bool] = None
+        self._disagreeing = 0
+        self._prev_hist = None
+
+    def measure(self, frame: np.ndarray) -> Tuple[float, bool]:
+        """
+        Green ratio of a frame and whether it starts a new shot.
+
+        Args:
+            frame (np.ndarray): BGR frame.
+
+        Returns:
+            Tuple[float, bool]: Share of pitch-green pixels and the cut flag.
+        """
+        small = cv2.resize(frame, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+        green_ratio = float(np.count_nonzero(cv2.inRange(hsv, self.green_lower, self.green_upper))) / (hsv.shape[0] * hsv.shape[1])
+        hist = cv2.calcHist([hsv], [0, 1], None, [16, 8], [0, 180, 0, 256])
+        cv2.normalize(hist, hist)
+        cut = (self._prev_hist is not None
+               and cv2.compareHist(self._prev_hist, hist, cv2.HISTCMP_BHATTACHARYYA) > self.cut_threshold)
+        self._prev_hist = hist
+        return green_ratio, cut
+
+    def update(self, frame: np.ndarray, frame_idx: int) -> bool:
+        """
+        Classify the next frame; frames must arrive in order.
+
+        Args:
+            frame (np.ndarray): BGR frame.
+            frame_idx (int): Index of the frame.
+
+        Returns:
+            bool: True when the frame shows the pitch and should be analyzed.
+        """
+        green_ratio, cut = self.measure(frame)
+        looks_like_pitch = green_ratio >= self.min_green_ratio
+        if cut:
+            self.stats['cuts'] += 1
+        if self._on_pitch is None or looks_like_pitch == self._on_pitch:
+            self._disagreeing = 0
+            if self._on_pitch is None:
+                self._on_pitch = looks_like_pitch
+        else:
+            self._disagreeing += 1
+            if cut or self._disagreeing >= self.min_switch_frames:
+                self._on_pitch = looks_like_pitch
+                self._disagreeing = 0
+
+        shot_type = 'pitch' if self._on_pitch else 'non_pitch'
+        if self.segments and self.segments[-1]['type'] == shot_type and self.segments[-1]['end_frame'] == frame_idx - 1:
+            self.segments[-1]['end_frame'] = frame_idx
+        else:
+            self.segments.append({'start_frame': frame_idx, 'end_frame': frame_idx, 'type': shot_type})
+        self.stats['frames'] += 1
+        self.stats[shot_type] += 1
+        return self._on_pitch
+
+    def summary(self) -> Dict:
+        """Returns the frame counts and the number of segments."""
+        return {**self.stats, 'segments': len(self.segments)}
+
+
+def non_pitch_frames(segments: List[Dict], num_frames: int) -> np.ndarray:
+    """
+    Boolean mask of the frames inside non-pitch segments.
+
+    Args:
+        segments (List[Dict]): Segments as recorded by SceneGate.
+        num_frames (int): Length of the mask.
+
+    Returns:
+        np.ndarray: True for every frame the gate skipped.
+    """
+    mask = np.zeros(num_frames, dtype=bool)
+    for segment in segments:
+        if segment['type'] == 'non_pitch':
+            mask[segment['start_frame']:segment['end_frame'] + 1] = True
+    return mask
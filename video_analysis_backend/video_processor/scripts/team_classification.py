@@ -1,89 +1,147 @@
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 import cv2
-from typing import List, Tuple
+import supervision as sv
+from typing import Dict, List, Optional, Tuple
 import os
 
+# Crops are resized to CROP_SIZE (width, height) and described by the shirt region ROI
+CROP_SIZE = (32, 64)
+ROI_ROWS = slice(16, 48)
+ROI_COLS = slice(8, 24)
+HUE_BINS = 12
+SATURATION_BINS = 3
+VALUE_BINS = 4
+FEATURE_SIZE = HUE_BINS * SATURATION_BINS + VALUE_BINS
+# Stored with kit profiles; a profile only fits features built with the same configuration
+FEATURE_CONFIG = {
+    'descriptor': 'hsv_histogram',
+    'crop_size': list(CROP_SIZE),
+    'roi': [ROI_ROWS.start, ROI_ROWS.stop, ROI_COLS.start, ROI_COLS.stop],
+    'bins': [HUE_BINS, SATURATION_BINS, VALUE_BINS],
+}
+
+
+def is_valid_crop(crop: np.ndarray) -> bool:
+    """Returns True for crops large enough to classify."""
+    return crop is not None and crop.size > 0 and crop.shape[0] >= 15 and crop.shape[1] >= 15
+
+
+def extract_crop_features(crops: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+    """
+    Describe the shirt region of a batch of crops with color histograms.
+
+    All valid crops are resized into one array and converted to HSV with a single
+    cvtColor call. Each crop is described by a normalized joint hue/saturation histogram
+    plus a value histogram (FEATURE_SIZE values), built for the whole batch with one
+    bincount. The dominant color of a crop is the mean ROI color, which is the closed-form
+    solution of a one-cluster k-means.
+
+    Args:
+        crops (List[np.ndarray]): BGR crops; invalid crops are skipped.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, List[int]]: Features (N, FEATURE_SIZE), dominant BGR
+            colors (N, 3) and the indices of the valid crops they belong to.
+    """
+    valid_indices = [i for i, crop in enumerate(crops) if is_valid_crop(crop)]
+    if not valid_indices:
+        return np.zeros((0, FEATURE_SIZE)), np.zeros((0, 3)), []
+
+    rois = np.stack([
+        cv2.resize(crops[i], CROP_SIZE, interpolation=cv2.INTER_AREA)[ROI_ROWS, ROI_COLS] for i in valid_indices
+    ])
+    count, roi_h, roi_w, _ = rois.shape
+    hsv = cv2.cvtColor(rois.reshape(count * roi_h, roi_w, 3), cv2.COLOR_BGR2HSV).reshape(count, roi_h * roi_w, 3)
+    pixels = roi_h * roi_w
+
+    hue_bin = hsv[..., 0].astype(np.int64) * HUE_BINS // 180
+    saturation_bin = hsv[..., 1].astype(np.int64) * SATURATION_BINS // 256
+    value_bin = hsv[..., 2].astype(np.int64) * VALUE_BINS // 256
+    crop_offset = np.arange(count)[:, None]
+    hue_saturation = np.bincount(
+        (crop_offset * (HUE_BINS * SATURATION_BINS) + hue_bin * SATURATION_BINS + saturation_bin).ravel(),
+        minlength=count * HUE_BINS * SATURATION_BINS
+    ).reshape(count, HUE_BINS * SATURATION_BINS)
+    value = np.bincount((crop_offset * VALUE_BINS + value_bin).ravel(), minlength=count * VALUE_BINS).reshape(count, VALUE_BINS)
+    features = np.hstack([hue_saturation, value]).astype(np.float64) / pixels
+
+    dominant_colors = rois.reshape(count, pixels, 3).mean(axis=1)
+    return features, dominant_colors, valid_indices
+
 class TeamClassifier:
-    def __init__(self, device: str = "cpu"):
+    """
+    Splits player crops into two teams by clustering the colors of the shirt region.
+
+    In offline mode ``fit`` sees crops sampled from the whole video before the main pass.
+    In online mode ``fit`` only bootstraps the clusters from the start of the video, and
+    every ``predict`` call also feeds its features into mini-batch k-means updates, so the
+    clusters keep adapting during the main pass. The clusters found by ``fit`` are kept as
+    anchors and refined clusters are mapped back onto them, so Team A and Team B cannot
+    swap labels mid-match.
+
+    A fitted classifier can be saved with ``to_profile`` as a kit profile and restored with
+    ``from_profile`` to skip fitting when the same kits play again, or passed to ``fit`` as a
+    seed so the clusters start from the known kits and keep their team labels.
+    """
+
+    def __init__(self, device: str = "cpu", online: bool = False, update_batch_size: int = 256):
         """
         Initializes the TeamClassifier.
 
         Args:
             device (str): Device to run the classifier on ('cpu' or 'cuda').
+            online (bool): Refine the clusters incrementally with the crops passed to predict.
+            update_batch_size (int): Number of buffered features per mini-batch update in online mode.
         """
         self.device = device
+        self.online = online
+        self.update_batch_size = max(2, update_batch_size)
         self.kmeans = None
+        self.cluster_centers = None
         self.is_fitted = False
         self.team_colors = []
         self.team_avg_colors = [(255, 255, 255), (0, 255, 0)]  # Default: white, green
+        self.anchor_centers = None
+        self.label_map = np.array([0, 1])
+        self.online_updates = 0
+        self._pending_features = []
+        self._pending_count = 0
 
-    def fit(self, crops: List[np.ndarray], output_dir: str) -> bool:
+    def fit(self, crops: List[np.ndarray], output_dir: str, seed_profile: Optional[Dict] = None, max_seed_shift: float = 0.5) -> bool:
         """
         Fit the classifier by clustering player crops into two teams based on color.
 
         Args:
             crops (List[np.ndarray]): List of player crop images.
             output_dir (str): Directory to save sample crops.
+            seed_profile (Optional[Dict]): Kit profile whose clusters start the clustering. It is
+                kept, with its team order, when the fitted clusters stay within ``max_seed_shift``
+                of it; otherwise the crops are clustered from scratch.
+            max_seed_shift (float): Largest L1 distance a seeded cluster center may move.
 
         Returns:
             bool: True if fitting was successful, False otherwise.
         """
         print(f"Fitting team classifier on {len(crops)} player crops")
-        valid_crops = [crop for crop in crops if crop is not None and crop.size > 0 and crop.shape[0] >= 15 and crop.shape[1] >= 15]
+        valid_crops = [crop for crop in crops if is_valid_crop(crop)]
         print(f"Found {len(valid_crops)} valid crops after filtering")
         if len(valid_crops) < 15:
             print("Not enough valid player crops for team classification (need at least 15)")
             return False
 
-        features = []
-        self.team_colors = []
-        expected_feature_size = 32 * 16 * 3  # ROI: hsv[16:48, 8:24]
-        for i, crop in enumerate(valid_crops):
-            try:
-                resized = cv2.resize(crop, (32, 64), interpolation=cv2.INTER_AREA)
-                if resized.shape != (64, 32, 3):
-                    print(f"Warning: Crop {i} has unexpected shape after resize: {resized.shape}")
-                    continue
-
-                hsv = cv2.cvtColor(resized, cv2.COLOR_BGR2HSV)
-                roi = hsv[16:48, 8:24]
-                if roi.shape != (32, 16, 3):
-                    print(f"Warning: Crop {i} ROI has unexpected shape: {roi.shape}")
-                    continue
-
-                feature = roi.reshape(-1)
-                if feature.shape[0] != expected_feature_size:
-                    print(f"Warning: Crop {i} feature vector has unexpected size: {feature.shape[0]}")
-                    continue
-
-                features.append(feature)
-
-                rgb_crop = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-                pixels = rgb_crop[16:48, 8:24].reshape(-1, 3)
-                kmeans_color = KMeans(n_clusters=1, random_state=0, n_init=10).fit(pixels)
-                dominant_color = kmeans_color.cluster_centers_[0].astype(int)
-                dominant_color_bgr = (int(dominant_color[2]), int(dominant_color[1]), int(dominant_color[0]))
-                self.team_colors.append(dominant_color_bgr)
-
-                if i < 50:
-                    sample_path = os.path.join(output_dir, f"sample_crop_{i}.jpg")
-                    cv2.imwrite(sample_path, crop)
-
-            except Exception as e:
-                print(f"Error processing crop {i}: {e}")
-                continue
-
-        if len(features) < 15:
-            print(f"Not enough valid features for team classification (got {len(features)})")
-            return False
-
-        print(f"Collected {len(features)} valid features with shape {features[0].shape}")
-        features_array = np.array(features)
-        print(f"Features array shape: {features_array.shape}")
+        features_array, dominant_colors, _ = extract_crop_features(valid_crops)
+        self.team_colors = [tuple(int(c) for c in color) for color in dominant_colors.astype(int)]
+        for i, crop in enumerate(valid_crops[:50]):
+            cv2.imwrite(os.path.join(output_dir, f"sample_crop_{i}.jpg"), crop)
+        print(f"Extracted features with shape {features_array.shape}")
 
         try:
-            self.kmeans = KMeans(n_clusters=2, random_state=0, n_init=10).fit(features_array)
+            self.kmeans = None
+            if seed_profile is not None:
+                self.kmeans = self._fit_seeded(features_array, seed_profile, max_seed_shift)
+            if self.kmeans is None:
+                self.kmeans = KMeans(n_clusters=2, random_state=0, n_init=10).fit(features_array)
         except Exception as e:
             print(f"KMeans clustering failed: {e}")
             return False
@@ -94,36 +152,128 @@ class TeamClassifier:
             print("Clustering did not find two distinct teams (need at least 3 samples per cluster)")
             return False
 
-        team_0_indices = [i for i, label in enumerate(self.kmeans.labels_) if label == 0]
-        team_1_indices = [i for i, label in enumerate(self.kmeans.labels_) if label == 1]
-
-        team_0_colors = [self.team_colors[i] for i in team_0_indices if i < len(self.team_colors)]
-        team_1_colors = [self.team_colors[i] for i in team_1_indices if i < len(self.team_colors)]
+        labels = self.kmeans.labels_
+        for team in (0, 1):
+            self.team_avg_colors[team] = tuple(int(c) for c in dominant_colors[labels == team].mean(axis=0).astype(int))
 
-        if team_0_colors:
-            team_0_colors = [color for color in team_0_colors if color is not None]
-            if team_0_colors:
-                team_0_avg_color = np.mean(team_0_colors, axis=0).astype(int)
-                self.team_avg_colors[0] = tuple(int(c) for c in team_0_avg_color)
-        if team_1_colors:
-            team_1_colors = [color for color in team_1_colors if color is not None]
-            if team_1_colors:
-                team_1_avg_color = np.mean(team_1_colors, axis=0).astype(int)
-                self.team_avg_colors[1] = tuple(int(c) for c in team_1_avg_color)
-
-        print(f"Team classification complete: Team A: {len(team_0_indices)} players, Team B: {len(team_1_indices)} players")
+        print(f"Team classification complete: Team A: {int((labels == 0).sum())} players, Team B: {int((labels == 1).sum())} players")
         print(f"Team A color (BGR): {self.team_avg_colors[0]}, Team B color (BGR): {self.team_avg_colors[1]}")
 
-        for i, label in enumerate(self.kmeans.labels_[:50]):
-            if i < len(valid_crops):
-                crop = valid_crops[i]
-                team = "Team A" if label == 0 else "Team B"
-                labeled_path = os.path.join(output_dir, f"labeled_crop_{i}_team_{team}.jpg")
-                cv2.imwrite(labeled_path, crop)
+        for i, label in enumerate(labels[:50]):
+            team = "Team A" if label == 0 else "Team B"
+            labeled_path = os.path.join(output_dir, f"labeled_crop_{i}_team_{team}.jpg")
+            cv2.imwrite(labeled_path, valid_crops[i])
+
+        self.cluster_centers = self.kmeans.cluster_centers_.copy()
+        self.anchor_centers = self.cluster_centers.copy()
+        self.label_map = np.array([0, 1])
+        if self.online:
+            # The bootstrap features set the per-cluster counts of the mini-batch model, so
+            # later batches refine the clusters instead of replacing them
+            self._online_update(features_array)
 
         self.is_fitted = True
         return True
 
+    def _fit_seeded(self, features: np.ndarray, seed_profile: Dict, max_seed_shift: float) -> Optional[KMeans]:
+        """Cluster starting from a kit profile; returns None when the kits differ too much from it."""
+        seed_centers = self._profile_centers(seed_profile)
+        kmeans = KMeans(n_clusters=2, init=seed_centers, n_init=1).fit(features)
+        shift = float(np.abs(kmeans.cluster_centers_ - seed_centers).sum(axis=1).max())
+        if shift > max_seed_shift:
+            print(f"Kits differ from the seed profile (center shift {shift:.2f} > {max_seed_shift}); clustering from scratch")
+            return None
+        print(f"Seeded team clusters from the kit profile (center shift {shift:.2f})")
+        return kmeans
+
+    @staticmethod
+    def _profile_centers(profile: Dict) -> np.ndarray:
+        """Validate a kit profile against the current feature configuration and return its centers."""
+        if profile.get('feature_config') != FEATURE_CONFIG:
+            raise ValueError("Kit profile was built with a different feature configuration")
+        centers = np.asarray(profile.get('cluster_centers'), dtype=np.float64)
+        if centers.shape != (2, FEATURE_SIZE):
+            raise ValueError(f"Kit profile has cluster centers of shape {centers.shape}, expected (2, {FEATURE_SIZE})")
+        return centers
+
+    def to_profile(self) -> Dict:
+        """
+        Serialize the fitted state as a kit profile.
+
+        Returns:
+            Dict: JSON-serializable profile with the feature configuration, the cluster
+                centers in team order (Team A first) and the average team colors.
+        """
+        if not self.is_fitted or self.cluster_centers is None:
+            raise ValueError("TeamClassifier is not fitted")
+        return {
+            'feature_config': FEATURE_CONFIG,
+            'cluster_centers': self.cluster_centers[np.argsort(self.label_map)].tolist(),
+            'team_avg_colors': [list(color) for color in self.team_avg_colors],
+        }
+
+    @classmethod
+    def from_profile(cls, profile: Dict, device: str = "cpu", online: bool = False, update_batch_size: int = 256) -> 'TeamClassifier':
+        """
+        Create a fitted classifier from a kit profile, without any crops.
+
+        Args:
+            profile (Dict): Profile returned by to_profile.
+            device (str): Device to run the classifier on ('cpu' or 'cuda').
+            online (bool): Refine the profile clusters with the crops passed to predict.
+            update_batch_size (int): Number of buffered features per mini-batch update in online mode.
+
+        Returns:
+            TeamClassifier: The fitted classifier.
+
+        Raises:
+            ValueError: If the profile does not match the current feature configuration.
+        """
+        classifier = cls(device=device, online=online, update_batch_size=update_batch_size)
+        classifier.cluster_centers = cls._profile_centers(profile)
+        classifier.anchor_centers = classifier.cluster_centers.copy()
+        classifier.team_avg_colors = [tuple(int(c) for c in color) for color in profile.get('team_avg_colors', classifier.team_avg_colors)]
+        classifier.is_fitted = True
+        return classifier
+
+    def _online_update(self, features: np.ndarray) -> None:
+        """Run one mini-batch k-means update, starting the mini-batch model from the current clusters."""
+        if not isinstance(self.kmeans, MiniBatchKMeans):
+            self.kmeans = MiniBatchKMeans(
+                n_clusters=2, init=self.cluster_centers, n_init=1, batch_size=self.update_batch_size,
+                reassignment_ratio=0.0, random_state=0
+            )
+        self.kmeans.partial_fit(features)
+        self.cluster_centers = self.kmeans.cluster_centers_.copy()
+        self._update_label_map()
+
+    def _observe(self, features: np.ndarray) -> None:
+        """Buffer features seen during prediction and run a mini-batch update once enough are collected."""
+        self._pending_features.append(features)
+        self._pending_count += len(features)
+        if self._pending_count < self.update_batch_size:
+            return
+        batch = np.vstack(self._pending_features)
+        self._pending_features = []
+        self._pending_count = 0
+        try:
+            self._online_update(batch)
+        except Exception as e:
+            print(f"Online team classifier update failed: {e}")
+            return
+        self.online_updates += 1
+
+    def _update_label_map(self) -> None:
+        """Map the current clusters onto the anchor clusters with the cheaper of the two assignments."""
+        centers = self.cluster_centers
+        anchors = self.anchor_centers
+        keep = np.linalg.norm(centers[0] - anchors[0]) + np.linalg.norm(centers[1] - anchors[1])
+        swap = np.linalg.norm(centers[0] - anchors[1]) + np.linalg.norm(centers[1] - anchors[0])
+        label_map = np.array([1, 0]) if swap < keep else np.array([0, 1])
+        if not np.array_equal(label_map, self.label_map):
+            print(f"Team clusters drifted past each other after {self.online_updates} updates; keeping team labels anchored")
+        self.label_map = label_map
+
     def predict(self, crops: List[np.ndarray]) -> List[int]:
         """
         Predict team IDs for a list of player crops.
@@ -134,43 +284,145 @@ class TeamClassifier:
         Returns:
             List[int]: Predicted team IDs (0 or 1).
         """
-        if not self.is_fitted or self.kmeans is None:
+        return self.predict_with_confidence(crops)[0]
+
+    def predict_with_confidence(self, crops: List[np.ndarray]) -> Tuple[List[int], List[float]]:
+        """
+        Predict team IDs for a list of player crops with a confidence per prediction.
+
+        The confidence is the relative margin between the distances to the two team
+        clusters: 0 for a crop halfway between them (or an unusable crop), close to 1 for a
+        crop right on its cluster.
+
+        Args:
+            crops (List[np.ndarray]): List of player crop images.
+
+        Returns:
+            Tuple[List[int], List[float]]: Predicted team IDs (0 or 1) and confidences.
+        """
+        if not self.is_fitted or self.cluster_centers is None:
             print("Warning: TeamClassifier not fitted, returning default team assignments")
-            return [0] * len(crops)
-
-        features = []
-        valid_indices = []
-        expected_feature_size = 32 * 16 * 3  # ROI: hsv[16:48, 8:24]
-        for i, crop in enumerate(crops):
-            if crop is None or crop.size == 0 or crop.shape[0] < 15 or crop.shape[1] < 15:
-                continue
-            try:
-                resized = cv2.resize(crop, (32, 64), interpolation=cv2.INTER_AREA)
-                hsv = cv2.cvtColor(resized, cv2.COLOR_BGR2HSV)
-                roi = hsv[16:48, 8:24]
-                if roi.shape != (32, 16, 3):
-                    continue
-                feature = roi.reshape(-1)
-                if feature.shape[0] != expected_feature_size:
-                    continue
-                features.append(feature)
-                valid_indices.append(i)
-            except Exception as e:
-                print(f"Error processing crop {i} in predict: {e}")
-                continue
-
-        if not features:
+            return [0] * len(crops), [0.0] * len(crops)
+
+        features_array, _, valid_indices = extract_crop_features(crops)
+        if not valid_indices:
             print("No valid features for prediction")
-            return [0] * len(crops)
+            return [0] * len(crops), [0.0] * len(crops)
 
-        features_array = np.array(features)
         try:
-            predictions = self.kmeans.predict(features_array)
+            # Distances to the clusters in team order
+            distances = np.linalg.norm(features_array[:, None, :] - self.cluster_centers[None, :, :], axis=2)[:, self.label_map]
         except Exception as e:
             print(f"Prediction failed: {e}")
-            return [0] * len(crops)
+            return [0] * len(crops), [0.0] * len(crops)
+        if self.online:
+            self._observe(features_array)
 
+        predictions = distances.argmin(axis=1)
+        near, far = distances.min(axis=1), distances.max(axis=1)
+        confidences = (far - near) / np.maximum(far + near, 1e-9)
         result = [0] * len(crops)
+        result_confidence = [0.0] * len(crops)
         for i, idx in enumerate(valid_indices):
             result[idx] = int(predictions[i])
-        return result
\ No newline at end of file
+            result_confidence[idx] = float(confidences[i])
+        return result, result_confidence
+
+
+class TrackTeamCache:
+    """
+    Per-track team assignment with confidence-weighted voting.
+
+    A tracker ID keeps its team for its whole life, so instead of classifying every player
+    on every frame, each track is classified on its first frame and then at most once per
+    ``sample_interval`` frames until it has ``samples_per_track`` votes. Every vote adds the
+    prediction confidence to its team, and the track takes the team with the larger total.
+    Tracks whose vote margin stays below ``min_margin`` keep being sampled, and a track
+    that reappears after more than ``rebirth_gap`` frames starts a new vote.
+    """
+
+    def __init__(
+        self,
+        classifier: TeamClassifier,
+        samples_per_track: int = 3,
+        sample_interval: int = 10,
+        min_margin: float = 0.2,
+        rebirth_gap: int = 30
+    ) -> None:
+        """
+        Initializes the TrackTeamCache.
+
+        Args:
+            classifier (TeamClassifier): Fitted classifier used for the samples.
+            samples_per_track (int): Number of votes after which a confident track is no longer sampled.
+            sample_interval (int): Minimum number of frames between two samples of a track.
+            min_margin (float): Vote margin, (winner - loser) / total, below which a track is resampled.
+            rebirth_gap (int): Frames a track can be missing before its votes are discarded.
+        """
+        self.classifier = classifier
+        self.samples_per_track = max(1, samples_per_track)
+        self.sample_interval = max(1, sample_interval)
+        self.min_margin = min_margin
+        self.rebirth_gap = rebirth_gap
+        self.tracks: Dict[int, Dict] = {}
+        self.stats = {'frames': 0, 'assignments': 0, 'predictions': 0}
+
+    def _needs_sample(self, entry: Dict, frame_idx: int) -> bool:
+        if frame_idx - entry['last_sample'] < self.sample_interval:
+            return False
+        if entry['samples'] < self.samples_per_track:
+            return True
+        votes = entry['votes']
+        return abs(votes[0] - votes[1]) < self.min_margin * max(votes[0] + votes[1], 1e-9)
+
+    def assign(self, frame: np.ndarray, tracker_ids: np.ndarray, xyxy: np.ndarray, frame_idx: int) -> np.ndarray:
+        """
+        Return the team of every track in a frame, classifying only the tracks that need a sample.
+
+        Args:
+            frame (np.ndarray): Frame the boxes refer to.
+            tracker_ids (np.ndarray): Tracker IDs of the players and goalkeepers.
+            xyxy (np.ndarray): Their bounding boxes.
+            frame_idx (int): Frame index.
+
+        Returns:
+            np.ndarray: Team ID (0 or 1) per track.
+        """
+        sampled = []
+        for i, tracker_id in enumerate(tracker_ids):
+            tracker_id = int(tracker_id)
+            entry = self.tracks.get(tracker_id)
+            if entry is None or frame_idx - entry['last_seen'] > self.rebirth_gap:
+                entry = {'votes': [0.0, 0.0], 'samples': 0, 'last_sample': -self.sample_interval, 'last_seen': frame_idx}
+                self.tracks[tracker_id] = entry
+            entry['last_seen'] = frame_idx
+            if self._needs_sample(entry, frame_idx):
+                sampled.append(i)
+
+        if sampled:
+            crops = [sv.crop_image(frame, xyxy[i]) for i in sampled]
+            teams, confidences = self.classifier.predict_with_confidence(crops)
+            for i, team, confidence in zip(sampled, teams, confidences):
+                entry = self.tracks[int(tracker_ids[i])]
+                entry['votes'][team] += confidence
+                entry['samples'] += 1
+                entry['last_sample'] = frame_idx
+
+        self.stats['frames'] += 1
+        self.stats['assignments'] += len(tracker_ids)
+        self.stats['predictions'] += len(sampled)
+        if frame_idx % 300 == 0:
+            self._prune(frame_idx)
+        return np.array([int(self.tracks[int(tid)]['votes'][1] > self.tracks[int(tid)]['votes'][0]) for tid in tracker_ids], dtype=np.int32)
+
+    def _prune(self, frame_idx: int) -> None:
+        """Forget tracks that would be treated as new if they reappeared."""
+        stale = [tid for tid, entry in self.tracks.items() if frame_idx - entry['last_seen'] > self.rebirth_gap]
+        for tid in stale:
+            del self.tracks[tid]
+
+    def summary(self) -> Dict:
+        """Returns the number of frames, team assignments and classifier predictions."""
+        stats = dict(self.stats)
+        stats['predictions_per_frame'] = round(stats['predictions'] / stats['frames'], 2) if stats['frames'] else 0.0
+        return stats
@@ -0,0 +1,308 @@
+import os
+import json
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Column name -> (dtype, per-row shape). Every column has one row per tracked object per frame.
+TRACK_COLUMNS: Dict[str, Tuple[Any, Tuple[int, ...]]] = {
+    'frame': (np.int32, ()),
+    'tracker_id': (np.int32, ()),
+    'class_id': (np.int8, ()),
+    'team_id': (np.int8, ()),
+    'bbox': (np.float32, (4,)),
+    'confidence': (np.float32, ()),
+    'projection': (np.float32, (2,)),
+    'has_ball': (np.bool_, ()),
+}
+
+CLASS_NAME_TO_ID = {'ball': 0, 'goalkeeper': 1, 'player': 2, 'referee': 3}
+CLASS_ID_TO_NAME = {class_id: name for name, class_id in CLASS_NAME_TO_ID.items()}
+BALL_TRACKER_ID = 1  # Tracker ID under which the selected ball of each frame is stored
+
+META_FNAME = 'meta.json'
+INDEX_FNAME = 'frame_index.bin'
+STORE_VERSION = 1
+
+
+def _column_path(store_dir: str, name: str) -> str:
+    """Returns the raw binary file path of a column."""
+    return os.path.join(store_dir, f'{name}.bin')
+
+
+def rows_from_frame_tracks(frame_idx: int, object_tracks: Dict) -> Dict[str, np.ndarray]:
+    """
+    Convert the per-frame object tracks dictionary into column arrays.
+
+    Args:
+        frame_idx (int): Frame index of the tracks.
+        object_tracks (Dict): Tracks keyed by class name and tracker ID, as written to the object tracks JSON.
+
+    Returns:
+        Dict[str, np.ndarray]: One array per column in TRACK_COLUMNS. Missing projections are NaN.
+    """
+    entries = [
+        (class_name, tracker_id, info)
+        for class_name, tracks in object_tracks.items()
+        for tracker_id, info in tracks.items()
+        if isinstance(info, dict)
+    ]
+    n = len(entries)
+    rows = {name: np.zeros((n,) + shape, dtype=dtype) for name, (dtype, shape) in TRACK_COLUMNS.items()}
+    rows['frame'][:] = frame_idx
+    rows['projection'][:] = np.nan
+    for i, (class_name, tracker_id, info) in enumerate(entries):
+        rows['tracker_id'][i] = int(tracker_id)
+        rows['class_id'][i] = info.get('class_id', CLASS_NAME_TO_ID.get(class_name, -1))
+        rows['team_id'][i] = info.get('team_id', -1)
+        rows['bbox'][i] = info.get('bbox', (np.nan,) * 4)
+        rows['confidence'][i] = info.get('confidence', 0.0)
+        if info.get('projection') is not None:
+            rows['projection'][i] = info['projection'][:2]
+        rows['has_ball'][i] = bool(info.get('has_ball', False))
+    return rows
+
+
+class TrackStoreWriter:
+    """
+    Append-only writer for the columnar track store.
+
+    Rows are buffered in memory and appended to one raw binary file per column every
+    ``chunk_rows`` rows, so resident memory stays bounded regardless of match length.
+    A frame index file holds one ``(first_row, row_count)`` pair per frame.
+    """
+
+    def __init__(self, store_dir: str, chunk_rows: int = 8192, attrs: Optional[Dict] = None) -> None:
+        """
+        Initializes the TrackStoreWriter and truncates any existing store in the directory.
+
+        Args:
+            store_dir (str): Directory holding the store files.
+            chunk_rows (int): Number of buffered rows that triggers a flush to disk.
+            attrs (Optional[Dict]): Free-form JSON metadata stored alongside the columns (fps, resolution, ...).
+        """
+        self.store_dir = store_dir
+        self.chunk_rows = max(1, chunk_rows)
+        self.attrs = dict(attrs or {})
+        os.makedirs(store_dir, exist_ok=True)
+        meta_path = os.path.join(store_dir, META_FNAME)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        self._files = {name: open(_column_path(store_dir, name), 'wb') for name in TRACK_COLUMNS}
+        self._index_file = open(os.path.join(store_dir, INDEX_FNAME), 'wb')
+        self._pending: Dict[str, List[np.ndarray]] = {name: [] for name in TRACK_COLUMNS}
+        self._pending_index: List[Tuple[int, int]] = []
+        self._pending_rows = 0
+        self.num_rows = 0
+        self.num_frames = 0
+
+    def append_frame(self, frame_idx: int, rows: Dict[str, np.ndarray]) -> None:
+        """
+        Append all rows of one frame. Frames must arrive in increasing order; skipped
+        frames are recorded as empty.
+
+        Args:
+            frame_idx (int): Frame index of the rows.
+            rows (Dict[str, np.ndarray]): Column arrays as returned by rows_from_frame_tracks.
+        """
+        if frame_idx < self.num_frames:
+            raise ValueError(f"Frame {frame_idx} already written; track store frames must be appended in order")
+        while self.num_frames < frame_idx:
+            self._pending_index.append((self.num_rows, 0))
+            self.num_frames += 1
+
+        count = len(rows['frame'])
+        for name, (dtype, shape) in TRACK_COLUMNS.items():
+            self._pending[name].append(np.ascontiguousarray(rows[name], dtype=dtype).reshape((count,) + shape))
+        self._pending_index.append((self.num_rows, count))
+        self.num_rows += count
+        self.num_frames += 1
+        self._pending_rows += count
+
+        if self._pending_rows >= self.chunk_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered rows and index entries to disk."""
+        for name in TRACK_COLUMNS:
+            if self._pending[name]:
+                np.concatenate(self._pending[name]).tofile(self._files[name])
+                self._pending[name] = []
+            self._files[name].flush()
+        if self._pending_index:
+            np.asarray(self._pending_index, dtype=np.int64).tofile(self._index_file)
+            self._pending_index = []
+        self._index_file.flush()
+        self._pending_rows = 0
+
+    def close(self) -> None:
+        """Flush remaining rows, close the files and write the store metadata."""
+        self.flush()
+        for handle in self._files.values():
+            handle.close()
+        self._index_file.close()
+        meta = {
+            'version': STORE_VERSION,
+            'num_rows': self.num_rows,
+            'num_frames': self.num_frames,
+            'columns': {
+                name: {'dtype': np.dtype(dtype).str, 'shape': list(shape)}
+                for name, (dtype, shape) in TRACK_COLUMNS.items()
+            },
+            'attrs': self.attrs,
+        }
+        with open(os.path.join(self.store_dir, META_FNAME), 'w') as f:
+            json.dump(meta, f, indent=4)
+        print(f"Wrote track store with {self.num_rows} rows over {self.num_frames} frames to {self.store_dir}")
+
+    def abort(self) -> None:
+        """Close the files and remove the partial store, e.g. after the pipeline failed."""
+        for handle in self._files.values():
+            handle.close()
+        self._index_file.close()
+        for path in [_column_path(self.store_dir, name) for name in TRACK_COLUMNS] + [
+                os.path.join(self.store_dir, INDEX_FNAME), os.path.join(self.store_dir, META_FNAME)]:
+            if os.path.exists(path):
+                os.remove(path)
+        try:
+            os.rmdir(self.store_dir)
+        except OSError:
+            pass  # The directory holds other files
+
+
+class TrackStoreReader:
+    """
+    Memory-mapped reader for the columnar track store.
+
+    Columns are opened with ``np.memmap``, so reading a frame range only pages in the
+    rows of that range.
+    """
+
+    def __init__(self, store_dir: str, mode: str = 'r') -> None:
+        """
+        Initializes the TrackStoreReader.
+
+        Args:
+            store_dir (str): Directory holding the store files.
+            mode (str): Memory-map mode; 'r+' allows in-place updates of column values.
+        """
+        meta_path = os.path.join(store_dir, META_FNAME)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"No track store found at {store_dir}")
+        with open(meta_path, 'r') as f:
+            self.meta = json.load(f)
+        self.store_dir = store_dir
+        self.num_rows = self.meta['num_rows']
+        self.num_frames = self.meta['num_frames']
+        self.attrs = self.meta.get('attrs', {})
+
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, spec in self.meta['columns'].items():
+            shape = (self.num_rows,) + tuple(spec['shape'])
+            dtype = np.dtype(spec['dtype'])
+            if self.num_rows == 0:
+                self.columns[name] = np.zeros(shape, dtype=dtype)
+            else:
+                self.columns[name] = np.memmap(_column_path(store_dir, name), dtype=dtype, mode=mode, shape=shape)
+        if self.num_frames == 0:
+            self.frame_index = np.zeros((0, 2), dtype=np.int64)
+        else:
+            self.frame_index = np.memmap(os.path.join(store_dir, INDEX_FNAME), dtype=np.int64, mode='r',
+                                         shape=(self.num_frames, 2))
+
+    def row_range(self, start: int, end: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Return the row range covering frames ``[start, end)``.
+
+        Args:
+            start (int): First frame.
+            end (Optional[int]): Frame to stop before; defaults to the last frame.
+
+        Returns:
+            Tuple[int, int]: First row and the row to stop before.
+        """
+        end = self.num_frames if end is None else min(end, self.num_frames)
+        start = max(0, start)
+        if start >= end:
+            return 0, 0
+        first_row = int(self.frame_index[start, 0])
+        last_row = int(self.frame_index[end - 1, 0] + self.frame_index[end - 1, 1])
+        return first_row, last_row
+
+    def read(self, start: int = 0, end: Optional[int] = None, columns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Read column views for frames ``[start, end)``.
+
+        Args:
+            start (int): First frame.
+            end (Optional[int]): Frame to stop before; defaults to the last frame.
+            columns (Optional[List[str]]): Columns to return; defaults to all.
+
+        Returns:
+            Dict[str, np.ndarray]: Memory-mapped views, one per column.
+        """
+        first_row, last_row = self.row_range(start, end)
+        names = columns or list(self.columns)
+        return {name: self.columns[name][first_row:last_row] for name in names}
+
+    def read_frame(self, frame_idx: int, columns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Read column views for a single frame."""
+        return self.read(frame_idx, frame_idx + 1, columns)
+
+    def iter_frames(self, start: int = 0, end: Optional[int] = None, chunk_frames: int = 1024) -> Iterator[Tuple[int, Dict[str, np.ndarray]]]:
+        """
+        Iterate over frames in chunks, yielding ``(frame_idx, rows)`` per frame.
+
+        Args:
+            start (int): First frame.
+            end (Optional[int]): Frame to stop before; defaults to the last frame.
+            chunk_frames (int): Number of frames paged in per chunk.
+        """
+        end = self.num_frames if end is None else min(end, self.num_frames)
+        for chunk_start in range(max(0, start), end, chunk_frames):
+            chunk_end = min(chunk_start + chunk_frames, end)
+            base_row, _ = self.row_range(chunk_start, chunk_end)
+            chunk = {name: np.asarray(column) for name, column in self.read(chunk_start, chunk_end).items()}
+            for frame_idx in range(chunk_start, chunk_end):
+                first_row, count = self.frame_index[frame_idx]
+                lo = int(first_row) - base_row
+                yield frame_idx, {name: column[lo:lo + int(count)] for name, column in chunk.items()}
+
+
+def reconcile_track_teams(store_dir: str) -> Dict[int, int]:
+    """
+    Give every player and goalkeeper track the team it was assigned in most of its frames.
+
+    Team labels are predicted per frame, so a track can carry a few frames of the other
+    team, for instance while an online team classifier was still converging. The team_id
+    column is rewritten in place; tracks with a tied vote are left unchanged.
+
+    Args:
+        store_dir (str): Directory holding the store files.
+
+    Returns:
+        Dict[int, int]: New team ID per tracker ID whose rows were changed.
+    """
+    reader = TrackStoreReader(store_dir, mode='r+')
+    if reader.num_rows == 0:
+        return {}
+    class_ids = np.asarray(reader.columns['class_id'])
+    team_ids = reader.columns['team_id']
+    voting = np.flatnonzero(np.isin(class_ids, (CLASS_NAME_TO_ID['player'], CLASS_NAME_TO_ID['goalkeeper']))
+                            & np.isin(team_ids, (0, 1)))
+    if len(voting) == 0:
+        return {}
+    tracks, inverse = np.unique(np.asarray(reader.columns['tracker_id'])[voting], return_inverse=True)
+    votes = np.zeros((len(tracks), 2), dtype=np.int64)
+    np.add.at(votes, (inverse, team_ids[voting].astype(np.int64)), 1)
+    majority = np.where(votes[:, 1] > votes[:, 0], 1, 0)
+    decided = votes[:, 0] != votes[:, 1]
+
+    row_team = majority[inverse]
+    changed = decided[inverse] & (team_ids[voting] != row_team)
+    if not changed.any():
+        return {}
+    team_ids[voting[changed]] = row_team[changed]
+    team_ids.flush()
+    changed_tracks = np.unique(inverse[changed])
+    return {int(tracks[i]): int(majority[i]) for i in changed_tracks}
@@ -1,8 +1,11 @@
+import bisect
+import copy
+import cv2
 import supervision as sv
 from ultralytics import YOLO
 import numpy as np
-from typing import Tuple
-from .team_classification import TeamClassifier
+from typing import Dict, List, Optional, Tuple
+from .team_classification import TeamClassifier, TrackTeamCache
 
 track_history = {}  # Global dictionary to store tracking history
 
@@ -37,6 +40,381 @@ def detect_players_and_ball(
         print(f"Error in detect_players_and_ball: {e}")
         return sv.Detections.empty(), sv.Detections.empty(), "none"
 
+def detect_players_and_ball_batch(
+    frames: List[np.ndarray],
+    player_model: YOLO,
+    conf_threshold: float,
+    ball_class_id: int
+) -> List[Tuple[sv.Detections, sv.Detections, str]]:
+    """
+    Detect players, ball, goalkeepers, and referees in a micro-batch of frames with one model call.
+
+    Args:
+        frames (List[np.ndarray]): Input frames, all at the same resolution.
+        player_model (YOLO): YOLO model for detecting all objects (players, ball, goalkeepers, referees).
+        conf_threshold (float): Confidence threshold for detections.
+        ball_class_id (int): Class ID for the ball.
+
+    Returns:
+        List[Tuple[sv.Detections, sv.Detections, str]]: Per frame, in input order, the same tuple
+            detect_players_and_ball returns.
+    """
+    if not frames:
+        return []
+    try:
+        player_results = player_model.predict(list(frames), conf=conf_threshold)
+        outputs = []
+        for result in player_results:
+            all_detections = sv.Detections.from_ultralytics(result)
+            ball_detections = all_detections[all_detections.class_id == ball_class_id]
+            outputs.append((all_detections, ball_detections, "player_model"))
+        return outputs
+    except Exception as e:
+        print(f"Error in detect_players_and_ball_batch: {e}")
+        return [(sv.Detections.empty(), sv.Detections.empty(), "none") for _ in frames]
+
+class DetectionScheduler:
+    """
+    Decides per frame whether to run the player model or to propagate the boxes of the last
+    frame by sparse optical flow, so detection only runs on keyframes.
+
+    Every box is followed by the Lucas-Kanade flow of its center and the corners found inside it on
+    a downscaled grey frame; points failing the forward-backward check are dropped and a box moves
+    by the median displacement of its remaining points. Players whose points are all lost move
+    with the median of the other boxes; a lost ball is dropped.
+
+    A keyframe is detected at least every ``stride`` frames, and immediately when the camera or the
+    boxes move faster than ``motion_threshold`` pixels per frame or the last propagation lost more
+    than ``max_lost_ratio`` of its boxes. At each keyframe the detections are compared with the boxes
+    propagated to the same frame: a mean IoU below ``min_iou`` halves the stride, otherwise it grows
+    by one frame up to ``max_stride``. Lost boxes also halve the stride.
+
+    Like KeypointScheduler, frames are planned a micro-batch at a time: ``plan`` returns which frames
+    to detect, ``resolve`` takes their detections and returns the detections of every frame.
+    Propagation quality is only known in ``resolve``, so it steers the frames of the next batch.
+    """
+
+    def __init__(
+        self,
+        ball_class_id: int,
+        coord_scale: Tuple[float, float] = (1.0, 1.0),
+        max_stride: int = 3,
+        motion_threshold: float = 8.0,
+        min_iou: float = 0.6,
+        max_lost_ratio: float = 0.3,
+        flow_scale: float = 0.5
+    ) -> None:
+        """
+        Initializes the DetectionScheduler.
+
+        Args:
+            ball_class_id (int): Class ID of the ball.
+            coord_scale (Tuple[float, float]): Player-model coordinates per processing-resolution pixel.
+            max_stride (int): Largest number of frames between keyframes.
+            motion_threshold (float): Per-frame camera or box motion, in processing pixels, that forces a keyframe.
+            min_iou (float): Mean IoU between keyframe detections and propagated boxes below which the stride shrinks.
+            max_lost_ratio (float): Share of boxes lost by the flow above which the next frame is a keyframe.
+            flow_scale (float): Downscaling factor of the frames the flow is computed on.
+        """
+        self.ball_class_id = ball_class_id
+        self.coord_scale = np.array(coord_scale, dtype=np.float64)
+        self.max_stride = max(1, max_stride)
+        self.motion_threshold = motion_threshold
+        self.min_iou = min_iou
+        self.max_lost_ratio = max_lost_ratio
+        self.flow_scale = flow_scale
+        self.stride = self.max_stride
+        self.stats = {'keyframes': 0, 'propagated': 0, 'forced': 0, 'stride_shrinks': 0, 'lost_boxes': 0}
+        self._keyframe_ious = []
+        self._planned = []  # (detect, grey frame) per frame of the planned batch
+        self._prev_grey = None
+        self._last_detections = None
+        self._frames_since_keyframe = None
+        self._force_keyframe = False
+        self._box_motion = 0.0
+
+    def reset(self) -> None:
+        """Forget the last boxes and frame, e.g. after frames were skipped."""
+        self._prev_grey = None
+        self._last_detections = None
+        self._frames_since_keyframe = None
+        self._force_keyframe = False
+        self._box_motion = 0.0
+
+    def plan(self, frames: List[np.ndarray], camera_motions: Optional[List[Tuple]] = None) -> List[bool]:
+        """
+        Choose the keyframes among the next frames.
+
+        Args:
+            frames (List[np.ndarray]): Consecutive frames at the processing resolution.
+            camera_motions (Optional[List[Tuple]]): (motion, magnitude) per frame, e.g. from the
+                keypoint scheduler; large camera motion forces a keyframe.
+
+        Returns:
+            List[bool]: Whether to run the player model, per frame.
+        """
+        self._planned = []
+        detect_flags = []
+        for i, frame in enumerate(frames):
+            small = cv2.resize(frame, None, fx=self.flow_scale, fy=self.flow_scale, interpolation=cv2.INTER_AREA)
+            grey = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            magnitude = camera_motions[i][1] if camera_motions is not None else None
+            fast = (magnitude is not None and magnitude > self.motion_threshold) or self._box_motion > self.motion_threshold
+            forced = fast or self._force_keyframe
+            detect = (self._frames_since_keyframe is None or forced
+                      or self._frames_since_keyframe + 1 >= self.stride)
+            if detect and forced:
+                self.stats['forced'] += 1
+            self._force_keyframe = False
+            self._frames_since_keyframe = 0 if detect else self._frames_since_keyframe + 1
+            self._planned.append((detect, grey))
+            detect_flags.append(detect)
+        return detect_flags
+
+    def _propagate(self, detections: sv.Detections, prev_grey: np.ndarray, grey: np.ndarray) -> Tuple[sv.Detections, float]:
+        """Move boxes from the previous frame to this one; returns the boxes and the share of lost boxes."""
+        if len(detections) == 0:
+            return detections, 0.0
+        to_flow = self.flow_scale / np.tile(self.coord_scale, 2)
+        boxes = detections.xyxy * to_flow
+        is_ball = detections.class_id == self.ball_class_id
+        # Corners inside the boxes, each owned by the smallest box containing it; the center of every box
+        # is tracked as well, so small or untextured boxes (the ball) have at least one point
+        mask = np.zeros_like(prev_grey)
+        for x1, y1, x2, y2 in boxes.astype(int):
+            mask[max(y1, 0):max(y2 + 1, 0), max(x1, 0):max(x2 + 1, 0)] = 255
+        corners = cv2.goodFeaturesToTrack(prev_grey, maxCorners=12 * len(boxes), qualityLevel=0.01, minDistance=2, mask=mask)
+        corners = corners.reshape(-1, 2) if corners is not None else np.zeros((0, 2), dtype=np.float32)
+        inside = ((corners[:, None, 0] >= boxes[None, :, 0]) & (corners[:, None, 0] <= boxes[None, :, 2])
+                  & (corners[:, None, 1] >= boxes[None, :, 1]) & (corners[:, None, 1] <= boxes[None, :, 3]))
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        corner_owner = np.argmin(np.where(inside, areas[None, :], np.inf), axis=1)
+        has_owner = inside.any(axis=1)
+        centers = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+        points = np.concatenate([centers, corners[has_owner]]).astype(np.float32).reshape(-1, 1, 2)
+        owners = np.concatenate([np.arange(len(boxes)), corner_owner[has_owner]])
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_grey, grey, points, None, winSize=(15, 15), maxLevel=2)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(grey, prev_grey, moved, None, winSize=(15, 15), maxLevel=2)
+        valid = (status.ravel() == 1) & (back_status.ravel() == 1) & (np.linalg.norm((back - points).reshape(-1, 2), axis=1) < 1.0)
+        displacement = (moved - points).reshape(-1, 2)
+
+        shifts = np.full((len(detections), 2), np.nan)
+        for i in range(len(detections)):
+            box_points = valid & (owners == i)
+            if box_points.sum() >= (1 if is_ball[i] else 2):
+                shifts[i] = np.median(displacement[box_points], axis=0)
+        lost = np.isnan(shifts[:, 0])
+        keep = ~(lost & is_ball)
+        if (~lost).any():
+            shifts[lost] = np.median(shifts[~lost], axis=0)
+            self._box_motion = float(np.median(np.linalg.norm(shifts[~lost], axis=1))) / self.flow_scale
+        else:
+            shifts[lost] = 0.0
+        propagated = detections[keep]
+        propagated.xyxy = ((boxes[keep] + np.tile(shifts[keep], 2)) / to_flow).astype(np.float32)
+        self.stats['lost_boxes'] += int(lost.sum())
+        return propagated, float(lost.mean())
+
+    def _update_stride(self, detected: sv.Detections, predicted: sv.Detections) -> None:
+        players = detected[detected.class_id != self.ball_class_id]
+        predicted = predicted[predicted.class_id != self.ball_class_id]
+        if len(players) < 2 or len(predicted) == 0:
+            return
+        mean_iou = float(sv.box_iou_batch(players.xyxy, predicted.xyxy).max(axis=1).mean())
+        self._keyframe_ious.append(mean_iou)
+        if mean_iou < self.min_iou:
+            self.stride = max(1, self.stride // 2)
+            self.stats['stride_shrinks'] += 1
+        else:
+            self.stride = min(self.max_stride, self.stride + 1)
+
+    def resolve(self, detections: List[sv.Detections]) -> List[sv.Detections]:
+        """
+        Combine the detections of the keyframes with propagated boxes for the other frames.
+
+        Args:
+            detections (List[sv.Detections]): Detections of the frames plan chose to detect, in order,
+                in player-model coordinates.
+
+        Returns:
+            List[sv.Detections]: Detections of every planned frame, in player-model coordinates.
+        """
+        detections = iter(detections)
+        detections_per_frame = []
+        for detect, grey in self._planned:
+            predicted, lost_ratio = None, 0.0
+            if self._last_detections is not None and self._prev_grey is not None:
+                predicted, lost_ratio = self._propagate(self._last_detections, self._prev_grey, grey)
+            if detect:
+                frame_detections = next(detections)
+                if predicted is not None:
+                    self._update_stride(frame_detections, predicted)
+                self.stats['keyframes'] += 1
+            elif predicted is not None:
+                frame_detections = predicted
+                if lost_ratio > self.max_lost_ratio:
+                    self.stride = max(1, self.stride // 2)
+                    self.stats['stride_shrinks'] += 1
+                    self._force_keyframe = True
+                self.stats['propagated'] += 1
+            else:
+                # No earlier frame to propagate from
+                frame_detections = sv.Detections.empty()
+                self._force_keyframe = True
+            # Callers rescale the returned detections by reassigning xyxy; keep this frame's own copy
+            self._last_detections = copy.copy(frame_detections)
+            self._prev_grey = grey
+            detections_per_frame.append(frame_detections)
+        self._planned = []
+        return detections_per_frame
+
+    def summary(self) -> Dict:
+        """Returns the keyframe statistics, the current stride and the mean keyframe IoU."""
+        mean_iou = round(float(np.mean(self._keyframe_ious)), 3) if self._keyframe_ious else None
+        return {**self.stats, 'stride': self.stride, 'keyframe_iou': mean_iou}
+
+class BallRoiDetector:
+    """
+    Second, high-resolution detection pass for frames where the full-frame pass missed the ball.
+
+    The ball is small, so it is often lost when the whole frame is downscaled to the player-model
+    resolution. For such frames the ball position is predicted from its last two sightings
+    (constant velocity, at most ``max_gap`` frames old), and a ``roi_size`` crop around it is cut
+    from the native-resolution frame and run through the same model. The crops of a micro-batch
+    share one model call, so predictions inside a batch only extrapolate from full-frame sightings.
+    Only balls the model detected count as sightings, not balls the detection scheduler propagated.
+    The most confident ball found in a crop is added to the frame's detections.
+    """
+
+    def __init__(
+        self,
+        player_model: YOLO,
+        ball_class_id: int,
+        conf_threshold: float,
+        roi_size: Tuple[int, int] = (640, 640),
+        max_gap: int = 15
+    ) -> None:
+        """
+        Initializes the BallRoiDetector.
+
+        Args:
+            player_model (YOLO): Model detecting the ball, shared with the full-frame pass.
+            ball_class_id (int): Class ID of the ball.
+            conf_threshold (float): Confidence a ball needs, in the full frame or in a crop.
+            roi_size (Tuple[int, int]): (width, height) of the crop in native pixels.
+            max_gap (int): Frames since the last sighting after which the ball is not searched.
+        """
+        self.player_model = player_model
+        self.ball_class_id = ball_class_id
+        self.conf_threshold = conf_threshold
+        self.roi_size = roi_size
+        self.max_gap = max_gap
+        self.stats = {'searches': 0, 'found': 0}
+        self._sightings = []  # (frame_idx, center in player-model coordinates), in frame order
+
+    def reset(self) -> None:
+        """Forget the ball, e.g. after frames were skipped."""
+        self._sightings = []
+
+    def _observe(self, frame_idx: int, center: np.ndarray) -> None:
+        bisect.insort(self._sightings, (frame_idx, tuple(center)))
+        del self._sightings[:-4]
+
+    def predict(self, frame_idx: int) -> Optional[np.ndarray]:
+        """
+        Predicted ball center at a frame, in player-model coordinates.
+
+        Args:
+            frame_idx (int): Frame to predict.
+
+        Returns:
+            Optional[np.ndarray]: The center, or None without a recent sighting.
+        """
+        earlier = [(idx, center) for idx, center in self._sightings if idx < frame_idx]
+        if not earlier or frame_idx - earlier[-1][0] > self.max_gap:
+            return None
+        last_idx, last = earlier[-1]
+        if len(earlier) < 2:
+            return np.array(last)
+        prev_idx, prev = earlier[-2]
+        velocity = (np.array(last) - np.array(prev)) / (last_idx - prev_idx)
+        return np.array(last) + velocity * (frame_idx - last_idx)
+
+    def _has_ball(self, detections: sv.Detections) -> bool:
+        balls = detections[detections.class_id == self.ball_class_id]
+        return len(balls) > 0 and bool((balls.confidence >= self.conf_threshold).any())
+
+    def refine(
+        self,
+        detections_list: List[sv.Detections],
+        source_frames: List[np.ndarray],
+        frame_indices: List[int],
+        player_resolution: Tuple[int, int],
+        keyframes: Optional[List[bool]] = None
+    ) -> List[sv.Detections]:
+        """
+        Add the ball to the frames of a micro-batch whose full-frame detections miss it.
+
+        Args:
+            detections_list (List[sv.Detections]): Full-frame detections in player-model coordinates.
+            source_frames (List[np.ndarray]): The same frames at native resolution.
+            frame_indices (List[int]): Frame index of each frame.
+            player_resolution (Tuple[int, int]): (width, height) of the player-model coordinates.
+            keyframes (Optional[List[bool]]): Whether the model ran on each frame, as planned by a
+                DetectionScheduler; all frames when None.
+
+        Returns:
+            List[sv.Detections]: The detections, with the balls found in the crops appended.
+        """
+        crops, searched = [], []
+        for i, detections in enumerate(detections_list):
+            if self._has_ball(detections):
+                # A propagated ball only extrapolates earlier sightings and would compound their error
+                if keyframes is None or keyframes[i]:
+                    balls = detections[detections.class_id == self.ball_class_id]
+                    x1, y1, x2, y2 = balls.xyxy[balls.confidence.argmax()]
+                    self._observe(frame_indices[i], np.array([(x1 + x2) / 2, (y1 + y2) / 2]))
+                continue
+            center = self.predict(frame_indices[i])
+            if center is None:
+                continue
+            frame = source_frames[i]
+            native_h, native_w = frame.shape[:2]
+            to_native = np.array([native_w / player_resolution[0], native_h / player_resolution[1]])
+            cx, cy = center * to_native
+            roi_w, roi_h = min(self.roi_size[0], native_w), min(self.roi_size[1], native_h)
+            left = int(np.clip(cx - roi_w / 2, 0, native_w - roi_w))
+            top = int(np.clip(cy - roi_h / 2, 0, native_h - roi_h))
+            crops.append(frame[top:top + roi_h, left:left + roi_w])
+            searched.append((i, np.array([left, top, left, top]), np.tile(1 / to_native, 2)))
+        if not crops:
+            return detections_list
+
+        self.stats['searches'] += len(crops)
+        detections_list = list(detections_list)
+        for (i, offset, to_player), (_, ball_detections, _) in zip(
+                searched, detect_players_and_ball_batch(crops, self.player_model, self.conf_threshold, self.ball_class_id)):
+            ball_detections = ball_detections[ball_detections.confidence >= self.conf_threshold]
+            if len(ball_detections) == 0:
+                continue
+            best = int(ball_detections.confidence.argmax())
+            ball_xyxy = ((ball_detections.xyxy[best] + offset) * to_player).astype(np.float32)
+            # Plain columns: cached and fresh detections carry different extra data
+            frame_detections = detections_list[i]
+            detections_list[i] = sv.Detections(
+                xyxy=np.vstack([frame_detections.xyxy.reshape(-1, 4), ball_xyxy[None]]).astype(np.float32),
+                confidence=np.append(frame_detections.confidence, ball_detections.confidence[best]).astype(np.float32),
+                class_id=np.append(frame_detections.class_id, self.ball_class_id).astype(int)
+            )
+            x1, y1, x2, y2 = ball_xyxy
+            self._observe(frame_indices[i], np.array([(x1 + x2) / 2, (y1 + y2) / 2]))
+            self.stats['found'] += 1
+        return detections_list
+
+    def summary(self) -> Dict:
+        """Returns the number of crops searched and of balls found in them."""
+        return dict(self.stats)
+
 def track_and_assign_teams(
     detections: sv.Detections,
     tracker: sv.ByteTrack,
@@ -45,7 +423,8 @@ def track_and_assign_teams(
     goalkeeper_id: int,
     player_id: int,
     referee_id: int,
-    frame_idx: int
+    frame_idx: int,
+    team_cache: Optional[TrackTeamCache] = None
 ) -> Tuple[sv.Detections, sv.Detections, sv.Detections, sv.Detections]:
     """
     Track detections and assign teams to players and goalkeepers.
@@ -59,6 +438,8 @@ def track_and_assign_teams(
         player_id (int): Class ID for players.
         referee_id (int): Class ID for referees.
         frame_idx (int): Current frame index.
+        team_cache (Optional[TrackTeamCache]): Per-track team cache; without it every player
+            and goalkeeper is classified on every frame.
 
     Returns:
         Tuple[sv.Detections, sv.Detections, sv.Detections, sv.Detections]:
@@ -76,25 +457,16 @@ def track_and_assign_teams(
         # Initialize team_id array
         team_ids = np.zeros(len(tracked_detections), dtype=np.int32)
 
-        # Assign teams to players
-        if len(players) > 0:
-            player_crops = [sv.crop_image(frame, xyxy) for xyxy in players.xyxy]
-            valid_crops = [crop for crop in player_crops if crop is not None and crop.size > 0]
-            if valid_crops:
-                predicted_team_ids = team_classifier.predict(valid_crops)
-                player_indices = np.where(tracked_detections.class_id == player_id)[0]
-                for idx, team_id in zip(player_indices[:len(predicted_team_ids)], predicted_team_ids):
-                    team_ids[idx] = team_id
-
-        # Assign teams to goalkeepers
-        if len(goalkeepers) > 0:
-            goalkeeper_crops = [sv.crop_image(frame, xyxy) for xyxy in goalkeepers.xyxy]
-            valid_crops = [crop for crop in goalkeeper_crops if crop is not None and crop.size > 0]
-            if valid_crops:
-                predicted_team_ids = team_classifier.predict(valid_crops)
-                goalkeeper_indices = np.where(tracked_detections.class_id == goalkeeper_id)[0]
-                for idx, team_id in zip(goalkeeper_indices[:len(predicted_team_ids)], predicted_team_ids):
-                    team_ids[idx] = team_id
+        # Assign teams to players and goalkeepers with one classifier call per frame; the
+        # classifier skips unusable crops itself, so predictions stay aligned with the detections
+        team_indices = np.where(np.isin(tracked_detections.class_id, [player_id, goalkeeper_id]))[0]
+        if len(team_indices) > 0 and team_cache is not None:
+            team_ids[team_indices] = team_cache.assign(
+                frame, tracked_detections.tracker_id[team_indices], tracked_detections.xyxy[team_indices], frame_idx
+            )
+        elif len(team_indices) > 0:
+            crops = [sv.crop_image(frame, tracked_detections.xyxy[idx]) for idx in team_indices]
+            team_ids[team_indices] = team_classifier.predict(crops)
 
         # Referees get a default team_id (e.g., 2 for neutral)
         referee_indices = np.where(tracked_detections.class_id == referee_id)[0]
@@ -117,42 +489,3 @@ def track_and_assign_teams(
     except Exception as e:
         print(f"Error in track_and_assign_teams: {e}")
         return sv.Detections.empty(), sv.Detections.empty(), sv.Detections.empty(), sv.Detections.empty()
-
-def resolve_goalkeepers_team_id(
-    goalkeepers: sv.Detections,
-    players: sv.Detections
-) -> sv.Detections:
-    """
-    Resolve team IDs for goalkeepers based on nearby players.
-
-    Args:
-        goalkeepers (sv.Detections): Goalkeeper detections.
-        players (sv.Detections): Player detections.
-
-    Returns:
-        sv.Detections: Goalkeepers with updated team IDs.
-    """
-    try:
-        if len(goalkeepers) == 0 or len(players) == 0:
-            return goalkeepers
-
-        team_ids = goalkeepers.team_id.copy()
-        for i, gk_box in enumerate(goalkeepers.xyxy):
-            gk_center = np.array([(gk_box[0] + gk_box[2]) / 2, (gk_box[1] + gk_box[3]) / 2])
-            min_dist = float('inf')
-            closest_team = team_ids[i]
-
-            for j, p_box in enumerate(players.xyxy):
-                p_center = np.array([(p_box[0] + p_box[2]) / 2, (p_box[1] + p_box[3]) / 2])
-                dist = np.linalg.norm(gk_center - p_center)
-                if dist < min_dist:
-                    min_dist = dist
-                    closest_team = players.team_id[j]
-
-            team_ids[i] = closest_team
-
-        goalkeepers.team_id = team_ids
-        return goalkeepers
-    except Exception as e:
-        print(f"Error in resolve_goalkeepers_team_id: {e}")
-        return goalkeepers
\ No newline at end of file
@@ -2,7 +2,7 @@
 import logging
 from rest_framework import serializers
 from django.conf import settings
-from .models import Video, EventFrame, ContactSubmission  # Add ContactSubmission import
+from .models import Video, EventFrame, ContactSubmission, TeamKitProfile, VIDEO_OUTPUT_CHOICES  # Add ContactSubmission import
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +25,22 @@ class VideoSerializer(serializers.ModelSerializer):
     object_tracks_json_url = serializers.SerializerMethodField()
     keypoint_tracks_json_url = serializers.SerializerMethodField()
     event_frame_urls = serializers.SerializerMethodField()
+    # Requested artifacts on upload; defaults to all of them
+    outputs = serializers.ListField(
+        child=serializers.ChoiceField(choices=VIDEO_OUTPUT_CHOICES),
+        write_only=True, required=False, allow_empty=False
+    )
+    # Stored kit profile to classify teams with ('reuse') or to start fitting from ('seed')
+    kit_profile = serializers.SlugRelatedField(
+        slug_field='name', queryset=TeamKitProfile.objects.all(), write_only=True, required=False
+    )
+    kit_profile_mode = serializers.ChoiceField(choices=['reuse', 'seed'], write_only=True, default='reuse')
+    # Name to store the fitted kit profile under after processing
+    save_kit_profile = serializers.CharField(max_length=100, write_only=True, required=False)
+    # Team A and, optionally, Team B of the saved kit profile
+    kit_teams = serializers.ListField(
+        child=serializers.CharField(max_length=100), min_length=1, max_length=2, write_only=True, required=False
+    )
 
     class Meta:
         model = Video
@@ -32,8 +48,15 @@ class VideoSerializer(serializers.ModelSerializer):
             'id', 'uploaded_at', 'status', 'video_file',
             'output_video_url', 'summary_json_url',
             'object_tracks_json_url', 'keypoint_tracks_json_url',
-            'event_frame_urls'
+            'event_frame_urls', 'outputs', 'produced_outputs', 'content_hash', 'source_video',
+            'kit_profile', 'kit_profile_mode', 'save_kit_profile', 'kit_teams'
         ]
+        read_only_fields = ['produced_outputs', 'content_hash', 'source_video']
+
+    def validate(self, attrs):
+        if 'save_kit_profile' in attrs and not attrs.get('kit_teams'):
+            raise serializers.ValidationError({'kit_teams': 'Required when saving a kit profile.'})
+        return attrs
 
     def get_output_video_url(self, obj):
         return self._get_absolute_url(obj.output_video)
@@ -64,6 +87,20 @@ class VideoSerializer(serializers.ModelSerializer):
         base_url = getattr(settings, 'SITE_URL', 'http://127.0.0.1:8000')
         return request.build_absolute_uri(file_field.url) if request else f"{base_url}{file_field.url}"
 
+class TeamKitProfileSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TeamKitProfile
+        fields = ['id', 'name', 'team_a', 'team_b', 'source_video', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+class RenderOptionsSerializer(serializers.Serializer):
+    """Options of a re-render job."""
+    team_colors = serializers.ListField(
+        child=serializers.ListField(child=serializers.IntegerField(min_value=0, max_value=255), min_length=3, max_length=3),
+        min_length=2, max_length=2, required=False
+    )
+    show_voronoi = serializers.BooleanField(default=True)
+
 # Add ContactSubmissionSerializer
 class ContactSubmissionSerializer(serializers.ModelSerializer):
     class Meta:
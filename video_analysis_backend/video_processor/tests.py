@@ -1,3 +1,1099 @@
-from django.test import TestCase
+import io
+import os
+import gzip
+import json
+import contextlib
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+import cv2
+import numpy as np
+import supervision as sv
+import torch
+from ultralytics.engine.results import Results
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from django.utils import timezone
+from .models import Video, ProcessingJob, EventFrame
+from .jobs import enqueue_job, claim_next_job, fail_job, complete_job, recover_orphaned_jobs
+from .dedupe import PIPELINE_VERSION, ALL_OUTPUTS, find_reusable_video, link_duplicate, link_pending_duplicates
+from .scripts.json_writer import JsonWriter, TrackStreamReader, stream_path_for, index_path_for
+from .scripts.track_store import TrackStoreWriter, TrackStoreReader, TRACK_COLUMNS, BALL_TRACKER_ID, reconcile_track_teams, rows_from_frame_tracks
+from .scripts.analysis import MatchAnalyzer, BALL_CLASS_ID, _empty_summary, analyze_track_store, compare_summaries, finalize_summary
+from .scripts.model_registry import ModelRegistry
+from .scripts.proximity import nearest_neighbors
+from .scripts.homography_mapper import ObjectPositionMapper
+from .scripts.camera_motion import CameraMotionEstimator
+from .scripts.tracking_detection import BallRoiDetector, DetectionScheduler
+from .scripts.team_classification import TeamClassifier, TrackTeamCache, extract_crop_features
+from .scripts.ball_state import BallStateEstimator, estimate_ball_states
+from .scripts.keypoints_detection import KeypointsTracker, KeypointScheduler, keypoint_history
 
-# Create your tests here.
+
+class TrackStreamTests(SimpleTestCase):
+    """JsonWriter streaming mode read back through TrackStreamReader."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+
+    def make_writer(self, **kwargs):
+        return JsonWriter(save_dir=os.path.join(self.tmp_dir, 'tracks'), summary_dir=self.tmp_dir, stream=True, **kwargs)
+
+    def frame_record(self, frame_idx):
+        return {'player': {frame_idx + 1: {'bbox': [frame_idx, 0.5, 10, 20], 'team_id': frame_idx % 2}}, 'ball': {}}
+
+    def test_round_trip(self):
+        writer = self.make_writer(flush_every=3)
+        for frame_idx in range(10):
+            writer.write_object_tracks(self.frame_record(frame_idx))
+        writer.close()
+
+        reader = TrackStreamReader(writer.get_object_tracks_path())
+        self.assertEqual(reader.num_records, 10)
+        raw = reader.read_raw(0)
+        self.assertEqual(len(raw), 10)
+        for frame_idx, line in enumerate(raw):
+            self.assertEqual(json.loads(line), json.loads(json.dumps(writer._make_serializable(self.frame_record(frame_idx)))))
+        self.assertEqual(reader.read(4, 6), [json.loads(raw[4]), json.loads(raw[5])])
+        with open(writer.get_object_tracks_path()) as f:
+            self.assertEqual(json.load(f), [json.loads(line) for line in raw])
+
+    def test_ranges_are_clamped(self):
+        writer = self.make_writer()
+        for frame_idx in range(3):
+            writer.write_object_tracks(self.frame_record(frame_idx))
+        writer.close(legacy_json=False)
+
+        reader = TrackStreamReader(writer.get_object_tracks_path())
+        self.assertEqual(len(reader.read_raw(-5, 100)), 3)
+        self.assertEqual(reader.read_raw(2, 2), [])
+        self.assertEqual(reader.read_raw(5), [])
+        self.assertFalse(os.path.exists(writer.get_object_tracks_path()))
+
+    def test_record_fn_rewrites_stream_and_index(self):
+        writer = self.make_writer()
+        for frame_idx in range(4):
+            writer.write_object_tracks(self.frame_record(frame_idx))
+        writer.close(object_record_fn=lambda record: {**record, 'rewritten': True})
+
+        records = TrackStreamReader(writer.get_object_tracks_path()).read(0)
+        self.assertEqual(len(records), 4)
+        self.assertTrue(all(record['rewritten'] for record in records))
+        self.assertEqual(records[3]['player'], {'4': {'bbox': [3, 0.5, 10, 20], 'team_id': 1}})
+
+    def test_abort_removes_partial_stream(self):
+        writer = self.make_writer()
+        writer.write_object_tracks(self.frame_record(0))
+        writer.abort()
+
+        obj_path = writer.get_object_tracks_path()
+        for path in [obj_path, stream_path_for(obj_path), index_path_for(obj_path)]:
+            self.assertFalse(os.path.exists(path))
+        with self.assertRaises(FileNotFoundError):
+            TrackStreamReader(obj_path)
+
+
+class TrackStoreTests(SimpleTestCase):
+    """TrackStoreWriter columns read back through TrackStoreReader."""
+
+    def setUp(self):
+        self.store_dir = os.path.join(tempfile.mkdtemp(), 'store')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.store_dir), ignore_errors=True)
+
+    def frame_tracks(self, frame_idx):
+        players = {tracker_id: {'bbox': [frame_idx, tracker_id, frame_idx + 10, tracker_id + 20], 'team_id': tracker_id % 2,
+                                'confidence': 0.5, 'projection': (frame_idx, 2.0 * tracker_id)}
+                   for tracker_id in range(2, 2 + frame_idx % 4)}
+        return {'player': players, 'ball': {1: {'bbox': [0, 0, 4, 4], 'has_ball': False}}}
+
+    def test_round_trip(self):
+        writer = TrackStoreWriter(self.store_dir, chunk_rows=5, attrs={'fps': 25})
+        # Frames 3 and 4 are skipped and must read back empty
+        written = [0, 1, 2, 5, 6, 7, 8]
+        for frame_idx in written:
+            writer.append_frame(frame_idx, rows_from_frame_tracks(frame_idx, self.frame_tracks(frame_idx)))
+        writer.close()
+
+        reader = TrackStoreReader(self.store_dir)
+        self.assertEqual(reader.num_frames, 9)
+        self.assertEqual(reader.attrs, {'fps': 25})
+        frames = dict(reader.iter_frames(chunk_frames=4))
+        self.assertEqual(sorted(frames), list(range(9)))
+        for frame_idx in range(9):
+            rows = frames[frame_idx]
+            if frame_idx not in written:
+                self.assertEqual(len(rows['frame']), 0)
+                continue
+            expected = rows_from_frame_tracks(frame_idx, self.frame_tracks(frame_idx))
+            for name, column in expected.items():
+                np.testing.assert_array_equal(rows[name], column)
+            np.testing.assert_array_equal(reader.read_frame(frame_idx)['tracker_id'], expected['tracker_id'])
+        self.assertEqual(reader.num_rows, sum(len(frames[frame_idx]['frame']) for frame_idx in range(9)))
+        self.assertTrue(np.isnan(reader.read_frame(0)['projection'][-1]).all())  # The ball has no projection
+
+    def test_frames_must_be_appended_in_order(self):
+        writer = TrackStoreWriter(self.store_dir)
+        writer.append_frame(2, rows_from_frame_tracks(2, self.frame_tracks(2)))
+        with self.assertRaises(ValueError):
+            writer.append_frame(1, rows_from_frame_tracks(1, self.frame_tracks(1)))
+        writer.close()
+
+    def test_empty_store(self):
+        TrackStoreWriter(self.store_dir).close()
+        reader = TrackStoreReader(self.store_dir)
+        self.assertEqual((reader.num_frames, reader.num_rows), (0, 0))
+        self.assertEqual(list(reader.iter_frames()), [])
+
+    def test_reconcile_track_teams_by_majority(self):
+        # Track 5 is mostly Team A, track 6 is tied; referees and the ball do not vote
+        player_teams = {5: [0, 1, 0, 0], 6: [0, 1, 1, 0]}
+        writer = TrackStoreWriter(self.store_dir)
+        for frame_idx in range(4):
+            writer.append_frame(frame_idx, rows_from_frame_tracks(frame_idx, {
+                'player': {tracker_id: {'bbox': [0, 0, 10, 20], 'team_id': teams[frame_idx]} for tracker_id, teams in player_teams.items()},
+                'referee': {9: {'bbox': [0, 0, 10, 20], 'team_id': 2}},
+                'ball': {1: {'bbox': [0, 0, 4, 4]}}
+            }))
+        writer.close()
+
+        self.assertEqual(reconcile_track_teams(self.store_dir), {5: 0})
+        columns = TrackStoreReader(self.store_dir).read(columns=['tracker_id', 'team_id'])
+        teams = {tracker_id: columns['team_id'][columns['tracker_id'] == tracker_id].tolist() for tracker_id in (5, 6, 9, 1)}
+        self.assertEqual(teams, {5: [0, 0, 0, 0], 6: [0, 1, 1, 0], 9: [2, 2, 2, 2], 1: [-1, -1, -1, -1]})
+        self.assertEqual(reconcile_track_teams(self.store_dir), {})
+
+    def test_abort_removes_partial_store(self):
+        writer = TrackStoreWriter(self.store_dir, chunk_rows=1)
+        writer.append_frame(0, rows_from_frame_tracks(0, self.frame_tracks(0)))
+        writer.abort()
+        self.assertFalse(os.path.exists(self.store_dir))
+        with self.assertRaises(FileNotFoundError):
+            TrackStoreReader(self.store_dir)
+
+
+@override_settings(VIDEO_JOB_MAX_ATTEMPTS=3, VIDEO_JOB_RETRY_BACKOFF_SECONDS=10, VIDEO_JOB_RETRY_BACKOFF_MAX_SECONDS=15)
+class JobQueueTests(TestCase):
+    """Claiming, retrying and recovering jobs of the database-backed queue."""
+
+    def setUp(self):
+        self.video = Video.objects.create(video_file='input_videos/match.mp4')
+
+    def make_runnable(self, job):
+        ProcessingJob.objects.filter(pk=job.pk).update(available_at=timezone.now() - timedelta(seconds=1))
+
+    def test_claim_takes_oldest_runnable_job_once(self):
+        first = enqueue_job(self.video)
+        second = enqueue_job(self.video)
+        enqueue_job(self.video, delay_seconds=60)
+
+        claimed = claim_next_job('worker-a')
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual((claimed.status, claimed.worker_id, claimed.attempts), ('running', 'worker-a', 1))
+        self.assertIsNotNone(claimed.heartbeat_at)
+        self.assertEqual(claim_next_job('worker-b').pk, second.pk)
+        self.assertIsNone(claim_next_job('worker-c'))  # The third job is not available yet
+
+    def test_claim_skips_job_taken_by_another_worker(self):
+        job = enqueue_job(self.video)
+        # Another worker wins the conditional update between the candidate read and the claim
+        ProcessingJob.objects.filter(pk=job.pk).update(status='running', worker_id='worker-a')
+        self.assertIsNone(claim_next_job('worker-b'))
+
+    def test_failed_attempts_back_off_then_fail(self):
+        duplicate = Video.objects.create(video_file='input_videos/match.mp4', source_video=self.video, status='processing')
+        job = enqueue_job(self.video)
+        delays = []
+        for _ in range(2):
+            self.make_runnable(job)
+            claimed = claim_next_job('worker-a')
+            before = timezone.now()
+            fail_job(claimed, 'boom')
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.worker_id, job.last_error), ('queued', '', 'boom'))
+            delays.append((job.available_at - before).total_seconds())
+            self.video.refresh_from_db()
+            self.assertEqual(self.video.status, 'pending')
+        self.assertAlmostEqual(delays[0], 10, delta=1)
+        self.assertAlmostEqual(delays[1], 15, delta=1)  # 20s capped at the maximum backoff
+
+        self.make_runnable(job)
+        fail_job(claim_next_job('worker-a'), 'boom')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.video.refresh_from_db()
+        duplicate.refresh_from_db()
+        self.assertEqual((self.video.status, duplicate.status), ('failed', 'failed'))
+        self.assertIsNone(claim_next_job('worker-a'))
+
+    def test_failed_render_keeps_video_status(self):
+        self.video.status = 'completed'
+        self.video.save()
+        job = enqueue_job(self.video, job_type='render')
+        job.max_attempts = 1
+        job.save()
+        fail_job(claim_next_job('worker-a'), 'boom')
+        job.refresh_from_db()
+        self.video.refresh_from_db()
+        self.assertEqual((job.status, self.video.status), ('failed', 'completed'))
+
+    def test_complete_job(self):
+        job = enqueue_job(self.video)
+        complete_job(claim_next_job('worker-a'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker_id), ('completed', ''))
+
+    def test_recover_orphaned_jobs(self):
+        self.video.status = 'processing'
+        self.video.save()
+        stale = enqueue_job(self.video)
+        claim_next_job('dead-worker')
+        ProcessingJob.objects.filter(pk=stale.pk).update(heartbeat_at=timezone.now() - timedelta(seconds=600))
+        live_video = Video.objects.create(video_file='input_videos/live.mp4', status='processing')
+        live = enqueue_job(live_video)
+        claim_next_job('live-worker')
+        orphan = Video.objects.create(video_file='input_videos/orphan.mp4', status='pending')
+        # Duplicates wait for their source and never get a job of their own
+        Video.objects.create(video_file='input_videos/match.mp4', source_video=self.video, status='processing')
+
+        self.assertEqual(recover_orphaned_jobs(stale_after_seconds=300), 2)
+        stale.refresh_from_db()
+        live.refresh_from_db()
+        self.assertEqual((stale.status, stale.attempts, stale.worker_id), ('queued', 1, ''))
+        self.assertIn('dead-worker', stale.last_error)
+        self.assertEqual(live.status, 'running')
+        self.assertEqual(list(orphan.jobs.values_list('status', flat=True)), ['queued'])
+        self.assertEqual(ProcessingJob.objects.count(), 3)
+        self.assertEqual(recover_orphaned_jobs(stale_after_seconds=300), 0)
+
+
+class UploadDedupeTests(TestCase):
+    """Reusing and attaching to earlier uploads of the same content."""
+
+    def make_source(self, status, produced_outputs=(), **kwargs):
+        return Video.objects.create(video_file='input_videos/match.mp4', content_hash='abc', pipeline_version=PIPELINE_VERSION,
+                                    status=status, produced_outputs=list(produced_outputs), **kwargs)
+
+    def complete(self, video, produced_outputs=ALL_OUTPUTS):
+        video.status = 'completed'
+        video.produced_outputs = list(produced_outputs)
+        video.output_video.name = f'output/annotated_output_{video.id}.mp4'
+        video.summary_json.name = f'output/match_summary_{video.id}.json'
+        video.track_store = f'output/tracks/track_store_{video.id}'
+        video.save()
+        EventFrame.objects.create(video=video, frame_image=f'output/events/{video.id}/goal_Team A_12.jpg', frame_number=12)
+
+    def find(self, outputs):
+        with transaction.atomic():
+            return find_reusable_video('abc', outputs)
+
+    def test_completed_video_is_reused(self):
+        source = self.make_source('pending')
+        self.complete(source)
+        self.assertEqual(self.find(['summary', 'video']), source)
+
+        duplicate = Video(video_file=source.video_file.name, content_hash='abc')
+        link_duplicate(duplicate, source)
+        duplicate.refresh_from_db()
+        self.assertEqual((duplicate.status, duplicate.source_video), ('completed', source))
+        self.assertEqual(duplicate.summary_json.name, source.summary_json.name)
+        self.assertEqual(duplicate.track_store, source.track_store)
+        self.assertEqual(duplicate.produced_outputs, ALL_OUTPUTS)
+        self.assertEqual(list(duplicate.event_frames.values_list('frame_number', flat=True)), [12])
+
+    def test_outputs_not_covered_are_not_reused(self):
+        source = self.make_source('pending')
+        self.complete(source, produced_outputs=['summary'])
+        self.assertEqual(self.find(['summary']), source)
+        self.assertIsNone(self.find(['summary', 'tracks']))
+
+        in_flight = self.make_source('processing')
+        enqueue_job(in_flight, options={'outputs': ['summary']})
+        self.assertIsNone(self.find(['video']))
+
+    def test_other_pipeline_version_and_duplicates_are_not_reused(self):
+        self.complete(Video.objects.create(video_file='input_videos/match.mp4', content_hash='abc', pipeline_version='0'))
+        self.assertIsNone(self.find(['summary']))
+        original = self.make_source('pending')
+        self.complete(original)
+        Video.objects.create(video_file='input_videos/match.mp4', content_hash='abc', pipeline_version=PIPELINE_VERSION,
+                             source_video=original, status='completed', produced_outputs=ALL_OUTPUTS)
+        self.assertEqual(self.find(['summary']), original)
+
+    def test_in_flight_video_hands_over_artifacts(self):
+        source = self.make_source('processing')
+        enqueue_job(source)
+        self.assertEqual(self.find(['tracks']), source)
+
+        duplicate = Video(video_file=source.video_file.name, content_hash='abc')
+        with transaction.atomic():
+            link_duplicate(duplicate, find_reusable_video('abc', ['tracks']))
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.status, 'processing')
+
+        self.complete(source)
+        link_pending_duplicates(source)
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.status, 'completed')
+        self.assertEqual(duplicate.output_video.name, source.output_video.name)
+        self.assertEqual(duplicate.event_frames.count(), 1)
+
+    def test_source_completed_while_attaching(self):
+        source = self.make_source('processing')
+        stale_source = Video.objects.get(pk=source.pk)
+        # The worker completes the source after the upload read it as processing
+        self.complete(source)
+        link_pending_duplicates(source)
+
+        duplicate = Video(video_file=source.video_file.name, content_hash='abc')
+        link_duplicate(duplicate, stale_source)
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.status, 'completed')
+        self.assertEqual(duplicate.summary_json.name, source.summary_json.name)
+
+    def test_source_failed_while_attaching(self):
+        source = self.make_source('processing')
+        stale_source = Video.objects.get(pk=source.pk)
+        Video.objects.filter(pk=source.pk).update(status='failed')
+
+        duplicate = Video(video_file=source.video_file.name, content_hash='abc')
+        link_duplicate(duplicate, stale_source)
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.status, 'failed')
+
+
+class SummaryRankingTests(SimpleTestCase):
+    """Player rankings must not depend on the order players were first seen."""
+
+    def summary_with_players(self, player_ids):
+        summary = _empty_summary()
+        for player_id in player_ids:
+            summary["player_stats"][str(player_id)] = {
+                "team": "Team A", "total_distance_m": 10.0, "max_speed_kmph": 20.0, "avg_speed_kmph": 5.0, "speed_history": []
+            }
+        summary["shots"] = [{"frame": 1, "player_id": player_id, "team": "Team A", "on_target": False} for player_id in player_ids]
+        return finalize_summary(summary)
+
+    def test_ties_are_ranked_by_tracker_id(self):
+        first_seen = self.summary_with_players([9, 3, 7, 12, 1, 5])["rankings"]
+        by_id = self.summary_with_players([1, 3, 5, 7, 9, 12])["rankings"]
+        self.assertEqual(first_seen, by_id)
+        for ranking in first_seen.values():
+            self.assertEqual([entry["player_id"] for entry in ranking], [1, 3, 5, 7, 9])
+
+
+class LiveOfflineAnalysisTests(SimpleTestCase):
+    """analyze_track_store must reproduce the summary of MatchAnalyzer fed frame by frame."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+
+    def write_store(self, seed, num_frames=600, scene_segments=None):
+        """Random match: jittering players, a ball held by random players and a field ball that gets shot and scored."""
+        rng = np.random.default_rng(seed)
+        store_dir = os.path.join(self.tmp_dir, f'store_{seed}')
+        attrs = {'fps': 25}
+        if scene_segments:
+            attrs['scene_segments'] = scene_segments
+        skipped = {frame_idx for segment in scene_segments or [] if segment['type'] == 'non_pitch'
+                   for frame_idx in range(segment['start_frame'], segment['end_frame'] + 1)}
+        writer = TrackStoreWriter(store_dir, attrs=attrs)
+        positions = rng.uniform(0, 600, (12, 2))
+        alive = np.ones(12, dtype=bool)
+        ball, projection, velocity = np.array([300.0, 200.0]), np.array([260.0, 176.0]), np.zeros(2)
+        for frame_idx in range(num_frames):
+            positions += rng.normal(0, 4, positions.shape)
+            alive ^= rng.random(12) < 0.02
+            if rng.random() < 0.05:
+                velocity = rng.normal(0, 8, 2)
+            if rng.random() < 0.3:
+                ball = positions[rng.integers(12)] + rng.normal(0, 15, 2)
+            projection = projection + velocity + rng.normal(0, 1, 2)
+            if rng.random() < 0.01:
+                projection = np.array([rng.choice([10.0, 520.0]), rng.uniform(100, 250)])
+            projection = np.clip(projection, -20, 550)
+
+            rows = []
+            for i in np.flatnonzero(alive):
+                class_id = 3 if i == 11 else 1 if i in (0, 6) else 2
+                team_id = 2 if class_id == 3 else (0 if i < 6 else 1)
+                x, y = positions[i]
+                rows.append((i + 5, class_id, team_id, [x - 10, y - 30, x + 10, y + 30], None))
+            if rng.random() < 0.85:
+                rows.append((BALL_TRACKER_ID, BALL_CLASS_ID, -1, [ball[0] - 3, ball[1] - 3, ball[0] + 3, ball[1] + 3],
+                             projection if rng.random() < 0.9 else None))
+            if frame_idx in skipped:
+                rows = []
+            columns = {name: np.zeros((len(rows),) + shape, dtype) for name, (dtype, shape) in TRACK_COLUMNS.items()}
+            columns['frame'][:] = frame_idx
+            columns['projection'][:] = np.nan
+            for j, (tracker_id, class_id, team_id, bbox, row_projection) in enumerate(rows):
+                columns['tracker_id'][j], columns['class_id'][j], columns['team_id'][j], columns['bbox'][j] = tracker_id, class_id, team_id, bbox
+                if row_projection is not None:
+                    columns['projection'][j] = row_projection
+            writer.append_frame(frame_idx, columns)
+        writer.close()
+        return store_dir
+
+    def replay(self, store_dir, params=None):
+        """Feed the stored frames through MatchAnalyzer the way the processing pipeline does."""
+        reader = TrackStoreReader(store_dir)
+        analyzer = MatchAnalyzer(fps=reader.attrs['fps'], params=params)
+        skipped = {frame_idx for segment in reader.attrs.get('scene_segments', []) if segment['type'] == 'non_pitch'
+                   for frame_idx in range(segment['start_frame'], segment['end_frame'] + 1)}
+        with contextlib.redirect_stdout(io.StringIO()):
+            for frame_idx, rows in reader.iter_frames():
+                if frame_idx in skipped:
+                    if frame_idx - 1 not in skipped:
+                        analyzer.reset_continuity()
+                    continue
+                is_ball = (rows['class_id'] == BALL_CLASS_ID) & (rows['tracker_id'] == BALL_TRACKER_ID)
+                ball_position = ball_projection = None
+                if is_ball.any():
+                    x1, y1, x2, y2 = rows['bbox'][is_ball][0]
+                    ball_position = (int((x1 + x2) / 2), int((y1 + y2) / 2))
+                    projection = rows['projection'][is_ball][0]
+                    if not np.isnan(projection).any():
+                        ball_projection = (float(projection[0]), float(projection[1]))
+                tracked = ~is_ball
+                analyzer.update(frame_idx, rows['tracker_id'][tracked], rows['class_id'][tracked], rows['team_id'][tracked],
+                                rows['bbox'][tracked], ball_position, ball_projection)
+        return json.loads(json.dumps(analyzer.summary()))
+
+    def assert_equivalent(self, store_dir, params=None):
+        live = self.replay(store_dir, params)
+        offline = json.loads(json.dumps(analyze_track_store(store_dir, params)))
+        for key in ('passes', 'shots', 'goals', 'possessions'):
+            self.assertTrue(live[key], key)  # The store exercises every event type
+        deviations = {name: metric['deviation'] for name, metric in compare_summaries(live, offline).items()}
+        self.assertEqual(deviations, dict.fromkeys(deviations, 0))
+        scene_segments = offline.pop('scene_segments', None)  # Added to the live summary by the pipeline
+        self.assertEqual(live, offline)
+        return scene_segments
+
+    def test_default_params(self):
+        for seed in (0, 1):
+            self.assert_equivalent(self.write_store(seed))
+
+    def test_overridden_params(self):
+        store_dir = self.write_store(seed=2)
+        # Loose shot rules make the cooldown and dedupe decide which shots count
+        shot_params = {'possession_distance_threshold': 80, 'shot_min_velocity': 2, 'shot_max_goal_distance': 300,
+                       'shot_max_angle_ratio': 2}
+        for params in (shot_params, {**shot_params, 'shot_cooldown_frames': 5, 'shot_dedupe_frames': 2}, {'max_exit_frames': 2}):
+            with self.subTest(params=params):
+                self.assert_equivalent(store_dir, params)
+
+    def test_possession_hysteresis(self):
+        store_dir = self.write_store(seed=3)
+        params = {'possession_distance_threshold': 80, 'possession_switch_margin': 15, 'shot_min_velocity': 2,
+                  'shot_max_goal_distance': 300, 'shot_max_angle_ratio': 2}
+        self.assert_equivalent(store_dir, params)
+        # The margin must change who holds the ball, or the hysteresis path was not exercised
+        self.assertNotEqual(self.replay(store_dir, params)['passes'],
+                            self.replay(store_dir, {**params, 'possession_switch_margin': 0})['passes'])
+
+    def test_non_pitch_segments_break_continuity(self):
+        segments = [
+            {'start_frame': 0, 'end_frame': 139, 'type': 'pitch'},
+            {'start_frame': 140, 'end_frame': 143, 'type': 'non_pitch'},
+            {'start_frame': 144, 'end_frame': 299, 'type': 'pitch'},
+            {'start_frame': 300, 'end_frame': 339, 'type': 'non_pitch'},
+            {'start_frame': 340, 'end_frame': 599, 'type': 'pitch'},
+        ]
+        store_dir = self.write_store(seed=0, scene_segments=segments)
+        params = {'possession_distance_threshold': 80, 'shot_min_velocity': 2, 'shot_max_goal_distance': 300, 'shot_max_angle_ratio': 2}
+        self.assertEqual(self.assert_equivalent(store_dir, params), segments)
+
+
+class IncrementalHomographyTests(SimpleTestCase):
+    """ObjectPositionMapper carrying the homography over by the camera motion."""
+
+    # Frame pixels of the keypoints and the top-down field points they map to
+    FRAME_POINTS = np.array([[100, 100], [500, 120], [520, 380], [80, 360], [300, 240]], dtype=np.float64)
+    FIELD_POINTS = np.array([[0, 0], [400, 0], [400, 300], [0, 300], [200, 150]], dtype=np.float64)
+    BOXES = np.array([[290, 200, 310, 260], [140, 150, 160, 220]], dtype=np.float64)
+
+    def make_mapper(self, **kwargs):
+        # No smoothing, so each projection shows the homography of its own frame
+        return ObjectPositionMapper(self.FIELD_POINTS, alpha=1.0, motion_estimator=CameraMotionEstimator(), **kwargs)
+
+    def keypoints(self, offset=(0, 0)):
+        return {i: {'coords': list(point + offset)} for i, point in enumerate(self.FRAME_POINTS)}
+
+    def shift(self, dx):
+        return np.array([[1, 0, dx], [0, 1, 0], [0, 0, 1]], dtype=np.float64)
+
+    def test_reuses_homography_under_small_motion(self):
+        mapper = self.make_mapper()
+        solved = mapper.project(self.keypoints(), self.BOXES, camera_motion=(None, None))
+        # The camera pans 1 pixel; stale keypoints show the homography was not re-solved
+        carried = mapper.project(self.keypoints(), self.BOXES + [1, 0, 1, 0], camera_motion=(self.shift(1), 1.0))
+        np.testing.assert_allclose(carried, solved, atol=1e-3)
+        self.assertEqual((mapper.stats['resolves'], mapper.stats['propagated']), (1, 1))
+
+    def test_resolves_on_large_motion(self):
+        mapper = self.make_mapper(motion_threshold=1.5)
+        solved = mapper.project(self.keypoints(), self.BOXES, camera_motion=(None, None))
+        # Keypoints and players moved with the camera, so the field positions are unchanged
+        moved = mapper.project(self.keypoints((20, 0)), self.BOXES + [20, 0, 20, 0], camera_motion=(self.shift(20), 20.0))
+        self.assertEqual((mapper.stats['resolves'], mapper.stats['propagated']), (2, 0))
+        np.testing.assert_allclose(moved, solved, atol=1e-2)
+
+    def test_resolves_after_max_reuse_frames(self):
+        mapper = self.make_mapper(max_reuse_frames=3)
+        mapper.project(self.keypoints(), self.BOXES, camera_motion=(None, None))
+        for _ in range(3):
+            mapper.project(self.keypoints(), self.BOXES, camera_motion=(np.eye(3), 0.0))
+        self.assertEqual((mapper.stats['resolves'], mapper.stats['propagated']), (1, 3))
+        mapper.project(self.keypoints(), self.BOXES, camera_motion=(np.eye(3), 0.0))
+        self.assertEqual((mapper.stats['resolves'], mapper.stats['propagated']), (2, 3))
+
+    def test_reset_forces_resolve(self):
+        mapper = self.make_mapper()
+        solved = mapper.project(self.keypoints(), self.BOXES, camera_motion=(None, None))
+        mapper.reset()
+        self.assertIsNone(mapper.homography_smoother.smoothed_H)
+        self.assertIsNotNone(mapper.last_valid_H)
+        # After skipped frames the view may have changed, so even a still camera re-solves
+        projected = mapper.project(self.keypoints((5, 0)), self.BOXES + [5, 0, 5, 0], camera_motion=(np.eye(3), 0.0))
+        self.assertEqual((mapper.stats['resolves'], mapper.stats['propagated']), (2, 0))
+        np.testing.assert_allclose(projected, solved, atol=1e-2)
+
+
+class ScriptedMotionEstimator:
+    """Stands in for CameraMotionEstimator, returning one scripted (motion, magnitude) per frame."""
+
+    def __init__(self, motions):
+        self.motions = iter(motions)
+        self.magnitude = None
+
+    def reset(self):
+        self.magnitude = None
+
+    def update(self, frame):
+        motion, self.magnitude = next(self.motions, (np.eye(3), 0.0))
+        return motion
+
+
+class KeypointScheduleTests(SimpleTestCase):
+    """KeypointScheduler choosing between keypoint detection and propagation."""
+
+    KEYPOINTS = [{'id': i, 'coords': (100.0 + 50 * i, 200.0 - 30 * i), 'confidence': 0.9} for i in range(4)]
+
+    def run_frames(self, scheduler, num_frames, detect_fn=None):
+        """Plan and resolve one frame at a time; returns the detected frames and the keypoints per frame."""
+        detected, keypoints_per_frame = [], []
+        for frame_idx in range(num_frames):
+            [detect] = scheduler.plan([None])
+            if detect:
+                detected.append(frame_idx)
+            detections = [detect_fn(frame_idx) if detect_fn else self.KEYPOINTS] if detect else []
+            keypoints_per_frame.extend(scheduler.resolve(detections))
+        return detected, keypoints_per_frame
+
+    def shifted(self, dx):
+        return [dict(kp, coords=(kp['coords'][0] + dx, kp['coords'][1])) for kp in self.KEYPOINTS]
+
+    def test_interval_grows_while_propagation_matches(self):
+        scheduler = KeypointScheduler(ScriptedMotionEstimator([]), max_interval=4)
+        scheduler.interval = 2
+        detected, _ = self.run_frames(scheduler, 12)
+        self.assertEqual(detected, [0, 2, 5, 9])
+        self.assertEqual(scheduler.interval, 4)  # Capped at max_interval
+
+    def test_interval_shrinks_on_reprojection_error(self):
+        scheduler = KeypointScheduler(ScriptedMotionEstimator([]), max_interval=8, error_threshold=3.0)
+        # The camera pans 10 pixels unnoticed by the motion estimate, so the second detection disagrees
+        detected, _ = self.run_frames(scheduler, 13, lambda frame_idx: self.shifted(10 if frame_idx >= 8 else 0))
+        self.assertEqual(detected, [0, 8, 12])
+        self.assertEqual(scheduler.stats['interval_shrinks'], 1)
+        self.assertEqual(scheduler.interval, 5)  # Halved to 4, then grown by one after a matching detection
+
+    def test_fast_motion_and_lost_tracking_force_detection(self):
+        pan = np.array([[1, 0, 6], [0, 1, 0], [0, 0, 1]], dtype=np.float64)
+        motions = [(None, None), (np.eye(3), 0.0), (pan, 6.0), (np.eye(3), 0.0), (None, None), (np.eye(3), 0.0)]
+        scheduler = KeypointScheduler(ScriptedMotionEstimator(motions), max_interval=10, motion_threshold=4.0)
+        detected, _ = self.run_frames(scheduler, 6)
+        self.assertEqual(detected, [0, 2, 4])
+        self.assertEqual(scheduler.stats['forced_by_motion'], 1)
+
+    def test_keypoints_are_marked_by_source(self):
+        pan = np.array([[1, 0, 2], [0, 1, 0], [0, 0, 1]], dtype=np.float64)
+        scheduler = KeypointScheduler(ScriptedMotionEstimator([(None, None), (pan, 2.0), (pan, 2.0)]), max_interval=10)
+        _, keypoints_per_frame = self.run_frames(scheduler, 3)
+        self.assertEqual([{kp['source'] for kp in keypoints} for keypoints in keypoints_per_frame],
+                         [{'detected'}, {'propagated'}, {'propagated'}])
+        self.assertEqual(keypoints_per_frame[2][0]['coords'], (self.KEYPOINTS[0]['coords'][0] + 4, self.KEYPOINTS[0]['coords'][1]))
+
+        self.addCleanup(keypoint_history.clear)
+        kp_tracker = KeypointsTracker(model=object())
+        for frame_idx, keypoints in enumerate(keypoints_per_frame):
+            kp_tracker.track(keypoints, frame_idx)
+        self.assertEqual(keypoint_history[0][0]['source'], 'detected')
+        self.assertEqual(keypoint_history[1][0]['source'], 'propagated')
+        # Keypoints from plain detection, without a scheduler, count as detected
+        kp_tracker.track([dict(self.KEYPOINTS[0])], 3)
+        self.assertEqual(keypoint_history[3][0]['source'], 'detected')
+
+
+class CropBallModel:
+    """Stands in for the player model, finding one ball at a fixed position in every crop."""
+
+    def __init__(self, ball_xyxy):
+        self.ball_xyxy = ball_xyxy
+        self.crops = []
+
+    def predict(self, frames, conf):
+        self.crops.extend(frames)
+        boxes = torch.tensor([[*self.ball_xyxy, 0.8, 0]], dtype=torch.float32)
+        return [Results(frame, path='crop', names={0: 'ball', 2: 'player'}, boxes=boxes) for frame in frames]
+
+
+class BallRoiDetectorTests(SimpleTestCase):
+    """BallRoiDetector predicting the ball and searching it in native-resolution crops."""
+
+    PLAYER_RESOLUTION = (640, 360)
+
+    def ball_detections(self, center, confidence=0.9):
+        x, y = center
+        return sv.Detections(xyxy=np.array([[x - 2, y - 2, x + 2, y + 2]], dtype=np.float32),
+                             confidence=np.array([confidence], dtype=np.float32), class_id=np.array([0]))
+
+    def native_frame(self):
+        # Each pixel holds its own (x, y), so a crop shows where it was cut
+        ys, xs = np.mgrid[0:720, 0:1280]
+        return np.stack([xs, ys, np.zeros_like(xs)], axis=2).astype(np.int32)
+
+    def test_predict_constant_velocity_and_max_gap(self):
+        detector = BallRoiDetector(CropBallModel([0, 0, 1, 1]), ball_class_id=0, conf_threshold=0.5, max_gap=5)
+        self.assertIsNone(detector.predict(3))
+        detector._observe(10, np.array([100.0, 50.0]))
+        np.testing.assert_allclose(detector.predict(12), [100.0, 50.0])  # One sighting: stays in place
+        detector._observe(12, np.array([110.0, 46.0]))
+        np.testing.assert_allclose(detector.predict(15), [125.0, 40.0])
+        np.testing.assert_allclose(detector.predict(11), [100.0, 50.0])  # Only earlier sightings count
+        self.assertIsNone(detector.predict(18))  # 6 frames since the last sighting
+        detector.reset()
+        self.assertIsNone(detector.predict(13))
+
+    def test_crop_detections_map_back_to_player_coordinates(self):
+        model = CropBallModel([50, 40, 60, 50])
+        detector = BallRoiDetector(model, ball_class_id=0, conf_threshold=0.5, roi_size=(200, 100))
+        frames = [self.native_frame()] * 3
+        refined = detector.refine([self.ball_detections((100, 100)), self.ball_detections((110, 100)), sv.Detections.empty()],
+                                  frames, [0, 1, 2], self.PLAYER_RESOLUTION)
+        # Predicted at (120, 100), i.e. (240, 200) native: the crop starts at (140, 150)
+        [crop] = model.crops
+        self.assertEqual(crop.shape[:2], (100, 200))
+        self.assertEqual(tuple(crop[0, 0, :2]), (140, 150))
+        np.testing.assert_allclose(refined[2].xyxy, [[95, 95, 100, 100]])
+        self.assertEqual(refined[2].class_id.tolist(), [0])
+        self.assertEqual(detector.summary(), {'searches': 1, 'found': 1})
+
+    def test_crop_is_clamped_to_the_frame(self):
+        model = CropBallModel([0, 0, 4, 4])
+        detector = BallRoiDetector(model, ball_class_id=0, conf_threshold=0.5, roi_size=(200, 100))
+        detector.refine([self.ball_detections((5, 355)), sv.Detections.empty()], [self.native_frame()] * 2, [0, 1],
+                        self.PLAYER_RESOLUTION)
+        self.assertEqual(tuple(model.crops[0][0, 0, :2]), (0, 620))
+
+    def test_propagated_balls_are_not_sightings(self):
+        detector = BallRoiDetector(CropBallModel([0, 0, 1, 1]), ball_class_id=0, conf_threshold=0.5)
+        # The second ball was moved along by the detection scheduler, not detected
+        detector.refine([self.ball_detections((100, 100)), self.ball_detections((130, 100))], [self.native_frame()] * 2,
+                        [0, 1], self.PLAYER_RESOLUTION, keyframes=[True, False])
+        np.testing.assert_allclose(detector.predict(2), [100.0, 100.0])
+
+
+class BallStateEstimatorTests(SimpleTestCase):
+    """Kalman filtering of the ball position with outlier gating."""
+
+    def moving_ball(self, estimator, num_frames, start=(100.0, 100.0), velocity=(5.0, 0.0)):
+        for frame_idx in range(num_frames):
+            estimator.update((start[0] + velocity[0] * frame_idx, start[1] + velocity[1] * frame_idx))
+
+    def test_velocity_unknown_until_second_detection(self):
+        estimator = BallStateEstimator()
+        estimator.update(None)
+        self.assertIsNone(estimator.position)
+        estimator.update((100.0, 100.0))
+        self.assertTrue(estimator.measured)
+        np.testing.assert_allclose(estimator.position, [100.0, 100.0])
+        self.assertIsNone(estimator.velocity)
+        self.assertIsNone(estimator.speed(pixels_per_meter=10, time_per_frame=0.04))
+        estimator.update((105.0, 100.0))
+        self.assertGreater(estimator.velocity[0], 0)
+        self.assertIsNotNone(estimator.speed(pixels_per_meter=10, time_per_frame=0.04))
+
+    def test_outlier_is_gated(self):
+        estimator = BallStateEstimator(max_rejections=2)
+        self.moving_ball(estimator, 10)
+        estimator.update((600.0, 400.0))  # A false detection far from the predicted (150, 100)
+        self.assertFalse(estimator.measured)
+        np.testing.assert_allclose(estimator.position, [150.0, 100.0], atol=1.0)
+        estimator.update((155.0, 100.0))
+        self.assertTrue(estimator.measured)
+        self.assertAlmostEqual(estimator.velocity[0], 5.0, delta=0.5)
+
+    def test_track_restarts_after_max_rejections(self):
+        estimator = BallStateEstimator(max_rejections=2)
+        self.moving_ball(estimator, 10)
+        estimator.update((600.0, 400.0))
+        estimator.update((600.0, 400.0))  # Second rejection in a row: the ball really is there
+        self.assertTrue(estimator.measured)
+        np.testing.assert_allclose(estimator.position, [600.0, 400.0])
+        self.assertIsNone(estimator.velocity)
+
+    def test_track_dropped_after_max_gap(self):
+        estimator = BallStateEstimator(max_gap=3)
+        self.moving_ball(estimator, 5)
+        for _ in range(3):
+            estimator.update(None)
+            self.assertIsNotNone(estimator.position)  # Predicted through the gap
+        np.testing.assert_allclose(estimator.position, [135.0, 100.0], atol=1.0)
+        estimator.update(None)
+        self.assertIsNone(estimator.position)
+        self.assertEqual(len(estimator.trail), 9)
+        self.assertEqual(len(estimator.trail_points()), 8)
+
+    def test_estimate_ball_states_honours_analyzed(self):
+        positions = np.array([[100.0 + 5 * i, 100.0] for i in range(12)])
+        present = np.ones(12, dtype=bool)
+        analyzed = np.ones(12, dtype=bool)
+        analyzed[4:6] = False
+        estimated, velocities, measured = estimate_ball_states(positions, present, analyzed)
+        self.assertTrue(np.isnan(estimated[4:6]).all())
+        self.assertFalse(measured[4:6].any())
+        self.assertTrue(measured[analyzed].all())
+        # The filter restarts after the skipped frames, so the velocity is unknown again for one frame
+        self.assertTrue(np.isnan(velocities[[0, 6]]).all())
+        self.assertFalse(np.isnan(velocities[[1, 3, 7, 11]]).any())
+
+        everything, _, _ = estimate_ball_states(positions, present)
+        self.assertFalse(np.isnan(everything).any())
+
+
+class DetectionScheduleTests(SimpleTestCase):
+    """DetectionScheduler choosing keyframes and propagating boxes by optical flow."""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.background = cv2.GaussianBlur(rng.integers(0, 255, (192, 320, 3), dtype=np.uint8), (5, 5), 0)
+
+    def detections(self, dx=0.0):
+        # Two players and the ball, in player-model coordinates (equal to the frame's here)
+        xyxy = np.array([[40, 40, 70, 100], [200, 60, 230, 120], [150, 150, 156, 156]], dtype=np.float32) + [dx, 0, dx, 0]
+        return sv.Detections(xyxy=xyxy, confidence=np.full(3, 0.9, dtype=np.float32), class_id=np.array([2, 2, 0]))
+
+    def run_frames(self, scheduler, frames, detect_fn):
+        """Plan and resolve one frame at a time; returns the keyframes and the detections per frame."""
+        keyframes, detections_per_frame = [], []
+        for frame_idx, frame in enumerate(frames):
+            [detect] = scheduler.plan([frame])
+            if detect:
+                keyframes.append(frame_idx)
+            detections_per_frame.extend(scheduler.resolve([detect_fn(frame_idx)] if detect else []))
+        return keyframes, detections_per_frame
+
+    def test_stride_grows_while_propagation_matches(self):
+        scheduler = DetectionScheduler(ball_class_id=0, max_stride=3)
+        scheduler.stride = 1
+        keyframes, detections_per_frame = self.run_frames(scheduler, [self.background] * 10, lambda _: self.detections())
+        self.assertEqual(keyframes, [0, 1, 3, 6, 9])
+        self.assertEqual(scheduler.stride, 3)
+        np.testing.assert_allclose(detections_per_frame[2].xyxy, self.detections().xyxy, atol=0.5)
+        self.assertEqual(scheduler.summary()['keyframe_iou'], 1.0)
+
+    def test_low_iou_shrinks_stride(self):
+        scheduler = DetectionScheduler(ball_class_id=0, max_stride=4, min_iou=0.6)
+        # The player model disagrees with the propagated boxes at the second keyframe
+        keyframes, _ = self.run_frames(scheduler, [self.background] * 7,
+                                       lambda frame_idx: self.detections(dx=25 if frame_idx >= 4 else 0))
+        self.assertEqual(keyframes, [0, 4, 6])
+        self.assertEqual(scheduler.stats['stride_shrinks'], 1)
+        self.assertEqual(scheduler.stride, 3)  # Halved to 2, then grown by one after a matching keyframe
+
+    def test_camera_motion_forces_keyframe(self):
+        scheduler = DetectionScheduler(ball_class_id=0, max_stride=5, motion_threshold=8.0)
+        scheduler.plan([self.background] * 2)
+        scheduler.resolve([self.detections()])
+        self.assertEqual(scheduler.plan([self.background] * 2, [(np.eye(3), 12.0), (np.eye(3), 1.0)]), [True, False])
+        self.assertEqual(scheduler.stats['forced'], 1)
+
+    def test_forward_backward_check_drops_lost_boxes(self):
+        panned = np.roll(self.background, 2, axis=1)  # The camera pans 2 pixels to the right
+        real_flow = cv2.calcOpticalFlowPyrLK
+        calls = []
+
+        def inconsistent_flow(prev_grey, grey, points, next_points, **kwargs):
+            # The backward flow of points starting inside the ball or the second player misses its origin
+            moved, status, error = real_flow(prev_grey, grey, points, next_points, **kwargs)
+            calls.append(points)
+            if len(calls) % 2 == 0:
+                origin = calls[-2].reshape(-1, 2) / 0.5
+                broken = ((origin[:, 0] >= 150) & (origin[:, 0] <= 156) & (origin[:, 1] >= 150) & (origin[:, 1] <= 156)) | \
+                         ((origin[:, 0] >= 200) & (origin[:, 0] <= 230) & (origin[:, 1] >= 60) & (origin[:, 1] <= 120))
+                moved = moved.copy()
+                moved[broken] += 5
+            return moved, status, error
+
+        scheduler = DetectionScheduler(ball_class_id=0, max_stride=3, max_lost_ratio=0.3)
+        with mock.patch('video_processor.scripts.tracking_detection.cv2.calcOpticalFlowPyrLK', side_effect=inconsistent_flow):
+            scheduler.plan([self.background, panned])
+            _, propagated = scheduler.resolve([self.detections()])
+        # The lost ball is dropped; the lost player moves with the others
+        self.assertEqual(propagated.class_id.tolist(), [2, 2])
+        np.testing.assert_allclose(propagated.xyxy, self.detections(dx=2).xyxy[:2], atol=0.5)
+        self.assertEqual(scheduler.stats['lost_boxes'], 2)
+        # Losing more than max_lost_ratio of the boxes forces the next keyframe
+        self.assertEqual(scheduler.stride, 1)
+        self.assertEqual(scheduler.plan([panned]), [True])
+        self.assertEqual(scheduler.stats['forced'], 1)
+
+
+class ScriptedTeamClassifier:
+    """Stands in for TeamClassifier; a crop's pixel value names the track, whose votes are scripted."""
+
+    def __init__(self, votes):
+        self.votes = {tracker_id: iter(track_votes) for tracker_id, track_votes in votes.items()}
+        self.calls = []
+
+    def predict_with_confidence(self, crops):
+        tracker_ids = [int(crop[0, 0, 0]) for crop in crops]
+        self.calls.append(tracker_ids)
+        teams, confidences = zip(*(next(self.votes[tracker_id]) for tracker_id in tracker_ids))
+        return np.array(teams), np.array(confidences)
+
+
+class TrackTeamCacheTests(SimpleTestCase):
+    """Per-track team voting with TrackTeamCache."""
+
+    def assign(self, cache, tracker_ids, frame_idx):
+        # Each track stands in its own column, filled with its tracker ID
+        frame = np.zeros((40, 20 * (max(tracker_ids) + 1), 3), dtype=np.uint8)
+        xyxy = []
+        for tracker_id in tracker_ids:
+            frame[:, 20 * tracker_id:20 * tracker_id + 20] = tracker_id
+            xyxy.append([20 * tracker_id + 2, 2, 20 * tracker_id + 18, 38])
+        return cache.assign(frame, np.array(tracker_ids), np.array(xyxy, dtype=np.float32), frame_idx).tolist()
+
+    def test_votes_accumulate_until_confident(self):
+        classifier = ScriptedTeamClassifier({1: [(0, 0.9), (1, 0.3), (0, 0.8)], 2: [(1, 0.7), (1, 0.9), (1, 0.8)]})
+        cache = TrackTeamCache(classifier, samples_per_track=3, sample_interval=10, min_margin=0.2)
+        teams = [self.assign(cache, [1, 2], frame_idx) for frame_idx in range(1, 41)]
+        self.assertEqual(classifier.calls, [[1, 2]] * 3)  # Frames 1, 11 and 21; not again once confident
+        self.assertTrue(all(frame_teams == [0, 1] for frame_teams in teams))
+        np.testing.assert_allclose(cache.tracks[1]['votes'], [1.7, 0.3])
+        self.assertEqual(cache.tracks[1]['samples'], 3)
+        self.assertEqual(cache.summary()['predictions'], 6)
+
+    def test_low_margin_keeps_sampling(self):
+        classifier = ScriptedTeamClassifier({1: [(0, 0.5), (1, 0.5), (0, 0.1), (1, 0.9)]})
+        cache = TrackTeamCache(classifier, samples_per_track=3, sample_interval=10, min_margin=0.2)
+        teams = [self.assign(cache, [1], frame_idx)[0] for frame_idx in range(1, 61)]
+        self.assertEqual(len(classifier.calls), 4)  # The fourth sample, at frame 31, settles the vote
+        self.assertEqual(teams[29], 0)
+        self.assertEqual(teams[30], 1)
+
+    def test_track_reborn_after_gap_is_reclassified(self):
+        classifier = ScriptedTeamClassifier({1: [(0, 0.9), (0, 0.9), (0, 0.9), (1, 0.9)]})
+        cache = TrackTeamCache(classifier, samples_per_track=3, sample_interval=10, rebirth_gap=30)
+        for frame_idx in (1, 11, 21):
+            self.assertEqual(self.assign(cache, [1], frame_idx), [0])
+        # Back within rebirth_gap: the confident vote stands
+        self.assertEqual(self.assign(cache, [1], 51), [0])
+        self.assertEqual(len(classifier.calls), 3)
+        # Back after more than rebirth_gap frames: a new player under the old ID
+        self.assertEqual(self.assign(cache, [1], 82), [1])
+        self.assertEqual(len(classifier.calls), 4)
+        self.assertEqual(cache.tracks[1]['samples'], 1)
+
+    def test_stale_tracks_are_pruned(self):
+        classifier = ScriptedTeamClassifier({1: [(0, 0.9)], 2: [(1, 0.9)], 3: [(0, 0.9)]})
+        cache = TrackTeamCache(classifier, rebirth_gap=30)
+        self.assign(cache, [1], 100)
+        self.assign(cache, [2], 280)
+        self.assign(cache, [3], 300)  # Pruning runs every 300 frames
+        self.assertEqual(sorted(cache.tracks), [2, 3])
+
+
+class OnlineTeamClassifierTests(SimpleTestCase):
+    """Team labels of the online classifier staying anchored while its clusters move."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+        rng = np.random.default_rng(0)
+        # Red and blue shirts with some noise
+        self.red = [np.clip(np.full((64, 32, 3), (40, 40, 200)) + rng.normal(0, 20, (64, 32, 3)), 0, 255).astype(np.uint8) for _ in range(10)]
+        self.blue = [np.clip(np.full((64, 32, 3), (200, 60, 40)) + rng.normal(0, 20, (64, 32, 3)), 0, 255).astype(np.uint8) for _ in range(10)]
+
+    def fitted(self):
+        classifier = TeamClassifier(online=True, update_batch_size=8)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(classifier.fit(self.red + self.blue, self.tmp_dir))
+        return classifier
+
+    def teams(self, classifier):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return classifier.predict([self.red[0], self.blue[0]])
+
+    def test_labels_stay_put_without_drift(self):
+        classifier = self.fitted()
+        teams = self.teams(classifier)
+        self.assertEqual(sorted(teams), [0, 1])
+        for _ in range(4):
+            with contextlib.redirect_stdout(io.StringIO()):
+                classifier.predict(self.red[:4] + self.blue[:4])
+        self.assertEqual(classifier.online_updates, 4)
+        self.assertEqual(classifier.label_map.tolist(), [0, 1])
+        self.assertEqual(self.teams(classifier), teams)
+
+    def test_swapped_clusters_keep_team_labels(self):
+        classifier = self.fitted()
+        teams = self.teams(classifier)
+        profile = classifier.to_profile()
+        # The refined clusters drift past each other: cluster 0 now sits on the other team's kit
+        classifier.kmeans.cluster_centers_ = classifier.kmeans.cluster_centers_[::-1].copy()
+        features = np.vstack([extract_crop_features(self.red)[0], extract_crop_features(self.blue)[0]])
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(3):
+                classifier._online_update(features)
+                self.assertEqual(classifier.label_map.tolist(), [1, 0])
+                self.assertEqual(self.teams(classifier), teams)
+        # The kit profile keeps Team A first
+        np.testing.assert_allclose(classifier.to_profile()['cluster_centers'], profile['cluster_centers'], atol=0.05)
+
+
+class VideoTracksViewTests(TestCase):
+    """Frame ranges of the track streams served by /api/videos/<pk>/tracks/."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root, TRACKS_API_MAX_FRAMES=5)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        writer = JsonWriter(save_dir=os.path.join(media_root, 'output', 'tracks'), summary_dir=media_root, stream=True)
+        for frame_idx in range(12):
+            writer.write_object_tracks({
+                'player': {3: {'bbox': [frame_idx, 0, 10, 20], 'team_id': 0}, 4: {'bbox': [0, frame_idx, 10, 20], 'team_id': 1}},
+                'ball': {1: {'bbox': [frame_idx, frame_idx, 4, 4]}}
+            })
+            writer.write_keypoint_tracks({0: {'coords': [frame_idx, 1.0]}})
+        writer.close()
+        self.video = Video.objects.create(
+            video_file='input_videos/match.mp4', status='completed',
+            object_tracks_json=os.path.relpath(writer.get_object_tracks_path(), media_root),
+            keypoint_tracks_json=os.path.relpath(writer.get_keypoints_tracks_path(), media_root)
+        )
+        self.client = APIClient()
+        self.url = f'/api/videos/{self.video.pk}/tracks/'
+
+    def get(self, **params):
+        headers = {key: params.pop(key) for key in list(params) if key.startswith('HTTP_')}
+        return self.client.get(self.url, params, **headers)
+
+    def test_range_is_clamped_to_max_frames(self):
+        for params, frames in [({}, range(0, 5)), ({'start': 2, 'end': 100}, range(2, 7)), ({'start': -3, 'end': 2}, range(0, 2)),
+                               ({'start': 10}, range(10, 12)), ({'start': 20}, range(20, 20))]:
+            with self.subTest(params=params):
+                data = json.loads(self.get(**params).content)
+                self.assertEqual([frame['frame'] for frame in data['frames']], list(frames))
+                self.assertEqual((data['start'], data['end'], data['total_frames']), (frames.start, frames.stop, 12))
+        data = json.loads(self.get(kind='keypoint', start=3, end=4).content)
+        self.assertEqual(data['frames'], [{'frame': 3, 'tracks': {'0': {'coords': [3, 1.0]}}}])
+
+    def test_bad_parameters(self):
+        for params in [{'start': 'abc'}, {'end': '1.5'}, {'kind': 'team'}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.get(**params).status_code, 400)
+        self.assertEqual(self.client.get(f'/api/videos/{self.video.pk + 1}/tracks/').status_code, 404)
+
+    def test_class_and_tracker_filters(self):
+        frame = json.loads(self.get(start=1, end=2, **{'class': 'ball'}).content)['frames'][0]
+        self.assertEqual(frame['tracks'], {'ball': {'1': {'bbox': [1, 1, 4, 4]}}})
+        frame = json.loads(self.get(start=1, end=2, tracker_id='3, 1', **{'class': 'player'}).content)['frames'][0]
+        self.assertEqual(frame['tracks'], {'player': {'3': {'bbox': [1, 0, 10, 20], 'team_id': 0}}})
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.get(start=2)
+        etag = response['ETag']
+        for if_none_match in [etag, f'W/{etag}', f'"other", {etag}', '*']:
+            with self.subTest(if_none_match=if_none_match):
+                not_modified = self.get(start=2, HTTP_IF_NONE_MATCH=if_none_match)
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified['ETag'], etag)
+        self.assertEqual(self.get(start=2, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        self.assertEqual(self.get(start=3, HTTP_IF_NONE_MATCH=etag).status_code, 200)  # Another range, another tag
+
+    def test_gzip_and_identity_have_separate_etags(self):
+        identity = self.get()
+        gzipped = self.get(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertFalse(identity.has_header('Content-Encoding'))
+        self.assertNotEqual(identity['ETag'], gzipped['ETag'])
+        for response in (identity, gzipped):
+            self.assertIn('Accept-Encoding', [field.strip() for field in response['Vary'].split(',')])
+        self.assertEqual(json.loads(gzip.decompress(gzipped.content)), json.loads(identity.content))
+        # A cached gzip body must not validate an identity request, and the reverse
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=gzipped['ETag']).status_code, 200)
+        self.assertEqual(self.get(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=identity['ETag']).status_code, 200)
+        self.assertEqual(self.get(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=gzipped['ETag']).status_code, 304)
+
+
+class PossessionTests(SimpleTestCase):
+    """Ranking players around the ball and choosing the one in possession."""
+
+    def test_nearest_neighbors_kdtree_matches_distance_matrix(self):
+        rng = np.random.default_rng(0)
+        points, queries = rng.uniform(0, 100, (40, 2)), rng.uniform(0, 100, (7, 2))
+        dense_dist, dense_idx = nearest_neighbors(points, queries, k=3, use_kdtree=False)
+        tree_dist, tree_idx = nearest_neighbors(points, queries, k=3, use_kdtree=True)
+        np.testing.assert_allclose(dense_dist, tree_dist)
+        np.testing.assert_array_equal(dense_idx, tree_idx)
+        self.assertEqual(nearest_neighbors(points[:2], queries, k=5)[1].shape, (7, 2))
+        self.assertEqual(nearest_neighbors(points[:0], queries)[1].shape, (7, 0))
+
+    def analyzer(self, margin, ball_position=(100, 100)):
+        analyzer = MatchAnalyzer(fps=25, params={'possession_distance_threshold': 50, 'possession_switch_margin': margin})
+        analyzer.ball_position = ball_position
+        return analyzer
+
+    def test_closest_to_ball_ranks_players_and_goalkeepers(self):
+        tracker_ids = np.array([7, 8, 9, 10])
+        class_ids = np.array([2, 3, 1, 2])  # The referee (8) is nearest but never in possession
+        centers = np.array([[130, 100], [101, 100], [100, 120], [100, 160]])
+        xyxy = np.hstack([centers - [5, 10], centers + [5, 10]]).astype(np.float64)
+        closest, distance, candidates = self.analyzer(0).closest_to_ball(tracker_ids, class_ids, xyxy)
+        self.assertEqual((closest, distance), (9, 20.0))
+        self.assertEqual(candidates, [(9, 20.0), (7, 30.0), (10, 60.0)])
+        self.assertEqual(self.analyzer(0, ball_position=None).closest_to_ball(tracker_ids, class_ids, xyxy), (None, float('inf'), []))
+
+    def test_previous_holder_keeps_contested_ball(self):
+        candidates = [(9, 20.0), (7, 30.0), (10, 45.0)]
+        analyzer = self.analyzer(margin=15)
+        self.assertEqual(analyzer._select_possessor(candidates), 9)  # Nobody held the ball before
+        analyzer.last_closest_player = 7
+        self.assertEqual(analyzer._select_possessor(candidates), 7)  # Within 15 px of the nearest
+        analyzer.last_closest_player = 10
+        self.assertEqual(analyzer._select_possessor(candidates), 9)  # 25 px behind the nearest
+        analyzer = self.analyzer(margin=30)
+        analyzer.last_closest_player = 10
+        self.assertEqual(analyzer._select_possessor([(9, 20.0), (10, 55.0)]), 9)  # Out of reach
+        analyzer = self.analyzer(margin=0)
+        analyzer.last_closest_player = 7
+        self.assertEqual(analyzer._select_possessor(candidates), 9)
+
+
+class ModelRegistryKeyTests(SimpleTestCase):
+    def test_fp16_shares_the_fp32_model_off_cuda(self):
+        self.assertEqual(ModelRegistry.make_key('models/od.pt', 'cpu', 'fp16'), ModelRegistry.make_key('models/od.pt', 'cpu', 'fp32'))
+        self.assertEqual(ModelRegistry.make_key('models/od.pt', 'cuda:0', 'fp16')[2], 'fp16')
+        with self.assertRaises(ValueError):
+            ModelRegistry.make_key('models/od.pt', 'cpu', 'int8')
@@ -1,10 +1,14 @@
 # video_analysis_backend/video_processor/urls.py
 from django.urls import path
-from .views import VideoUploadView, ContactSubmissionView
+from .views import VideoUploadView, VideoTracksView, VideoRenderView, VideoReanalyzeView, TeamKitProfileView, ContactSubmissionView
 
 urlpatterns = [
     # Remove the duplicated 'videos/' from the path
     path('', VideoUploadView.as_view(), name='video-list'),
     path('<int:pk>/', VideoUploadView.as_view(), name='video-detail'),
+    path('<int:pk>/tracks/', VideoTracksView.as_view(), name='video-tracks'),
+    path('<int:pk>/render/', VideoRenderView.as_view(), name='video-render'),
+    path('<int:pk>/reanalyze/', VideoReanalyzeView.as_view(), name='video-reanalyze'),
+    path('kit-profiles/', TeamKitProfileView.as_view(), name='kit-profile-list'),
     path('contact/', ContactSubmissionView.as_view(), name='contact-submission'),
 ]
\ No newline at end of file
@@ -1,27 +1,92 @@
 # video_analysis_backend/video_processor/views.py
 import os
+import json
+import hashlib
 from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.db import IntegrityError, transaction
+from django.utils.http import parse_etags
+from django.utils.text import compress_string
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Video, EventFrame, ContactSubmission
-from .serializers import VideoSerializer, ContactSubmissionSerializer
-import threading
-from .scripts.main import main_processing
+from .models import Video, EventFrame, ContactSubmission, TeamKitProfile
+from .serializers import VideoSerializer, RenderOptionsSerializer, TeamKitProfileSerializer, ContactSubmissionSerializer
+from .jobs import enqueue_job
+from .dedupe import (ContentHashUploadHandler, PIPELINE_VERSION, ALL_OUTPUTS, hash_uploaded_file, find_reusable_video,
+                     link_duplicate)
+from .scripts.json_writer import TrackStreamReader, stream_path_for
+from .scripts.analysis import analyze_track_store
 
 class VideoUploadView(APIView):
     def post(self, request):
+        """
+        Store an upload and queue it for processing.
+
+        An upload whose content was already processed by the current pipeline, with at least the
+        requested outputs, links to those artifacts and is completed immediately; if that content
+        is still being processed, the upload attaches to the running job. Uploads with kit profile
+        options are always processed, since their team assignment can differ.
+        """
+        # Must run before request.data parses the upload
+        hasher = ContentHashUploadHandler(request)
+        request.upload_handlers.insert(0, hasher)
         serializer = VideoSerializer(data=request.data)
         if serializer.is_valid():
-            video_instance = serializer.save(status='pending')
-            threading.Thread(
-                target=process_video,
-                args=(video_instance,),
-                daemon=True
-            ).start()
+            options = {}
+            outputs = serializer.validated_data.pop('outputs', None)
+            if outputs:
+                options['outputs'] = list(dict.fromkeys(outputs))
+            kit_profile = serializer.validated_data.pop('kit_profile', None)
+            kit_profile_mode = serializer.validated_data.pop('kit_profile_mode', 'reuse')
+            if kit_profile is not None:
+                options['kit_profile'] = kit_profile.name
+                options['kit_profile_mode'] = kit_profile_mode
+            save_kit_profile = serializer.validated_data.pop('save_kit_profile', None)
+            kit_teams = serializer.validated_data.pop('kit_teams', None)
+            if save_kit_profile:
+                options['save_kit_profile'] = {
+                    'name': save_kit_profile,
+                    'team_a': kit_teams[0],
+                    'team_b': kit_teams[1] if len(kit_teams) > 1 else ''
+                }
+            content_hash = hasher.hashes.get('video_file') or hash_uploaded_file(serializer.validated_data['video_file'])
+            reusable = 'kit_profile' not in options and 'save_kit_profile' not in options
+            requested_outputs = options.get('outputs', ALL_OUTPUTS)
+            with transaction.atomic():
+                source = find_reusable_video(content_hash, requested_outputs) if reusable else None
+                if source is None:
+                    video_instance = serializer.save(status='pending', content_hash=content_hash)
+                    if reusable:
+                        try:
+                            with transaction.atomic():
+                                Video.objects.filter(pk=video_instance.pk).update(pipeline_version=PIPELINE_VERSION)
+                        except IntegrityError:
+                            # Another upload of this content is in flight: attach to it if it covers
+                            # the requested outputs, otherwise process this one without offering it for reuse
+                            source = find_reusable_video(content_hash, requested_outputs)
+                            if source is not None:
+                                video_instance.video_file.delete(save=False)
+                                video_instance.video_file.name = source.video_file.name
+                                link_duplicate(video_instance, source)
+                    if source is None:
+                        enqueue_job(video_instance, options=options or None)
+                else:
+                    # The duplicate file is not kept; the record points at the original upload
+                    video_instance = Video(video_file=source.video_file.name, content_hash=content_hash)
+                    link_duplicate(video_instance, source)
+            if source is not None:
+                message = (f'Video already processed; reusing the results of video {source.id}' if video_instance.status == 'completed'
+                           else f'Video is already being processed; attached to video {source.id}')
+                return Response({
+                    'id': video_instance.id,
+                    'message': message,
+                    'status': video_instance.status,
+                    'source_video': source.id
+                }, status=status.HTTP_201_CREATED)
             return Response({
                 'id': video_instance.id,
-                'message': 'Video uploaded and processing started',
+                'message': 'Video uploaded and queued for processing',
                 'status': video_instance.status
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -40,6 +105,171 @@ class VideoUploadView(APIView):
         serializer = VideoSerializer(videos, many=True, context={'request': request})
         return Response(serializer.data)
 
+class VideoTracksView(APIView):
+    """
+    Serve a frame range of a video's tracks from the per-video frame offset index.
+
+    Query parameters:
+        start: First frame (default 0).
+        end: Frame to stop before (default start + TRACKS_API_MAX_FRAMES).
+        kind: 'object' (default) or 'keypoint'.
+        class: Comma-separated class names to keep, e.g. 'player,ball' (object tracks only).
+        tracker_id: Comma-separated tracker IDs to keep (object tracks only).
+    """
+    def get(self, request, pk):
+        try:
+            video = Video.objects.get(pk=pk)
+        except Video.DoesNotExist:
+            return Response({'error': 'Video not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        kind = request.query_params.get('kind', 'object')
+        if kind not in ('object', 'keypoint'):
+            return Response({'error': "kind must be 'object' or 'keypoint'"}, status=status.HTTP_400_BAD_REQUEST)
+        track_file = video.object_tracks_json if kind == 'object' else video.keypoint_tracks_json
+        if not track_file or not os.path.exists(stream_path_for(track_file.path)):
+            return Response({'error': 'Track index not available for this video'}, status=status.HTTP_404_NOT_FOUND)
+
+        max_frames = getattr(settings, 'TRACKS_API_MAX_FRAMES', 1500)
+        try:
+            start = max(0, int(request.query_params.get('start', 0)))
+            end = int(request.query_params.get('end', start + max_frames))
+        except ValueError:
+            return Response({'error': 'start and end must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        end = min(end, start + max_frames)
+
+        classes = _split_param(request.query_params.get('class'))
+        tracker_ids = _split_param(request.query_params.get('tracker_id'))
+
+        # The stream is append-only and rewritten only by a new processing run, so its
+        # size and mtime identify the content without reading it
+        data_stat = os.stat(stream_path_for(track_file.path))
+        etag_source = f"{video.pk}:{kind}:{data_stat.st_size}:{data_stat.st_mtime_ns}:{start}:{end}:{sorted(classes)}:{sorted(tracker_ids)}"
+        # The gzip and identity bodies are different representations, so they get different tags
+        accepts_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+        etag = f'"{hashlib.sha1(etag_source.encode()).hexdigest()}{"-gzip" if accepts_gzip else ""}"'
+        if _etag_matches(etag, request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        try:
+            reader = TrackStreamReader(track_file.path)
+            records = reader.read_raw(start, end)
+        except FileNotFoundError:
+            return Response({'error': 'Track index not available for this video'}, status=status.HTTP_404_NOT_FOUND)
+
+        if kind == 'object' and (classes or tracker_ids):
+            records = [json.dumps(_filter_object_record(json.loads(raw), classes, tracker_ids),
+                                  separators=(',', ':')).encode('utf-8') for raw in records]
+
+        # Records are already JSON, so they are spliced into the body without re-encoding
+        body = b''.join([
+            b'{"id":%d,"kind":"%s","start":%d,"end":%d,"total_frames":%d,"frames":[' % (
+                video.pk, kind.encode(), start, start + len(records), reader.num_records),
+            b','.join(b'{"frame":%d,"tracks":%s}' % (start + i, raw) for i, raw in enumerate(records)),
+            b']}'
+        ])
+        response = HttpResponse(content_type='application/json')
+        if accepts_gzip and len(body) > 200:
+            body = compress_string(body)
+            response['Content-Encoding'] = 'gzip'
+        response.content = body
+        response['Vary'] = 'Accept-Encoding'
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=3600'
+        return response
+
+class VideoRenderView(APIView):
+    """
+    Queue a re-render of the annotated video from the stored tracks and summary, without inference.
+
+    Body:
+        team_colors: Optional [[r, g, b], [r, g, b]] for Team A and Team B.
+        show_voronoi: Shade the Voronoi regions in the projection view (default true).
+    """
+    def post(self, request, pk):
+        try:
+            video = Video.objects.get(pk=pk)
+        except Video.DoesNotExist:
+            return Response({'error': 'Video not found'}, status=status.HTTP_404_NOT_FOUND)
+        if not video.track_store or not video.summary_json:
+            return Response({'error': 'Video has no stored tracks and summary to render from'},
+                            status=status.HTTP_409_CONFLICT)
+
+        serializer = RenderOptionsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        job = enqueue_job(video, job_type='render', options=dict(serializer.validated_data))
+        return Response({
+            'id': video.id,
+            'job_id': job.id,
+            'message': 'Video queued for re-rendering',
+            'status': job.status
+        }, status=status.HTTP_202_ACCEPTED)
+
+class VideoReanalyzeView(APIView):
+    """
+    Recompute passes, shots, goals, possession and player statistics from the stored tracks.
+
+    Runs synchronously without inference and returns the new summary; the stored summary
+    is not changed.
+
+    Body:
+        A JSON object of analysis parameter overrides, e.g. {"possession_distance_threshold": 70}.
+    """
+    def post(self, request, pk):
+        try:
+            video = Video.objects.get(pk=pk)
+        except Video.DoesNotExist:
+            return Response({'error': 'Video not found'}, status=status.HTTP_404_NOT_FOUND)
+        if not video.track_store:
+            return Response({'error': 'Video has no stored tracks to analyze'}, status=status.HTTP_409_CONFLICT)
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Expected a JSON object of parameter overrides'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only numpy work on the stored columns, so it runs in the request instead of the job queue
+        try:
+            summary = analyze_track_store(os.path.join(settings.MEDIA_ROOT, video.track_store), dict(request.data))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except FileNotFoundError:
+            return Response({'error': 'Track store not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'id': video.id, 'params': dict(request.data), 'summary': summary})
+
+class TeamKitProfileView(APIView):
+    """List the stored kit profiles that uploads can reuse or seed from."""
+    def get(self, request):
+        profiles = TeamKitProfile.objects.all()
+        team = request.query_params.get('team')
+        if team:
+            profiles = profiles.filter(team_a__iexact=team) | profiles.filter(team_b__iexact=team)
+        return Response(TeamKitProfileSerializer(profiles, many=True).data)
+
+def _etag_matches(etag, if_none_match):
+    """Weak comparison of an ETag against the tags of an If-None-Match header, which may be '*'."""
+    tags = parse_etags(if_none_match)
+    if tags == ['*']:
+        return True
+    opaque_tag = etag.removeprefix('W/')
+    return any(tag.removeprefix('W/') == opaque_tag for tag in tags)
+
+def _split_param(value):
+    """Split a comma-separated query parameter into a set of stripped values."""
+    if not value:
+        return set()
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+def _filter_object_record(record, classes, tracker_ids):
+    """Keep only the requested classes and tracker IDs of one object tracks record."""
+    return {
+        class_name: {
+            tracker_id: info for tracker_id, info in tracks.items()
+            if not tracker_ids or tracker_id in tracker_ids
+        }
+        for class_name, tracks in record.items()
+        if not classes or class_name in classes
+    }
+
 # Add ContactSubmissionView
 class ContactSubmissionView(APIView):
     def post(self, request):
@@ -50,56 +280,4 @@ class ContactSubmissionView(APIView):
                 'message': 'Contact form submitted successfully',
                 'data': serializer.data
             }, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-def process_video(video_instance):
-    try:
-        video_instance.status = 'processing'
-        video_instance.save()
-
-        input_video_path = video_instance.video_file.path
-        output_dir = os.path.join(settings.MEDIA_ROOT, 'output')
-        events_dir = os.path.join(output_dir, 'events')
-        output_video_path = os.path.join(output_dir, f'annotated_output_{video_instance.id}.mp4')
-        summary_json_path = os.path.join(output_dir, f'match_summary_{video_instance.id}.json')
-        object_tracks_path = os.path.join(output_dir, 'tracks', f'object_tracks_{video_instance.id}.json')
-        keypoint_tracks_path = os.path.join(output_dir, 'tracks', f'keypoint_tracks_{video_instance.id}.json')
-        team_samples_dir = os.path.join(output_dir, 'team_samples')
-
-        main_processing(
-            input_video_path=input_video_path,
-            output_dir=output_dir,
-            output_video_path=output_video_path,
-            summary_json_path=summary_json_path,
-            object_tracks_path=object_tracks_path,
-            keypoint_tracks_path=keypoint_tracks_path,
-            team_samples_dir=team_samples_dir
-        )
-
-        video_instance.output_video.name = os.path.relpath(output_video_path, settings.MEDIA_ROOT)
-        video_instance.summary_json.name = os.path.relpath(summary_json_path, settings.MEDIA_ROOT)
-        video_instance.object_tracks_json.name = os.path.relpath(object_tracks_path, settings.MEDIA_ROOT)
-        video_instance.keypoint_tracks_json.name = os.path.relpath(keypoint_tracks_path, settings.MEDIA_ROOT)
-
-        if os.path.exists(events_dir):
-            for filename in os.listdir(events_dir):
-                if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    frame_path = os.path.join(events_dir, filename)
-                    relative_path = os.path.relpath(frame_path, settings.MEDIA_ROOT)
-                    try:
-                        frame_number = int(filename.split('_')[-1].split('.')[0])  # e.g., goal_Team A_164.jpg -> 164
-                    except ValueError:
-                        frame_number = None
-                    EventFrame.objects.create(
-                        video=video_instance,
-                        frame_image=relative_path,
-                        frame_number=frame_number
-                    )
-
-        video_instance.status = 'completed'
-        video_instance.save()
-
-    except Exception as e:
-        video_instance.status = 'failed'
-        video_instance.save()
-        print(f"Error processing video {video_instance.id}: {e}")
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file